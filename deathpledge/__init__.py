@@ -1,12 +1,12 @@
-from os import path, makedirs
+from collections.abc import Mapping
+from os import path
 from sys import platform
-import yaml
 
 PROJ_PATH = path.normpath(path.join(path.dirname(path.realpath(__file__)), '..'))
 CONFIG_PATH = path.join(PROJ_PATH, 'config')
 LISTINGS_DIR = path.join(PROJ_PATH, 'data', 'Processed', 'saved_listings')
 LISTINGS_GLOB = path.join(PROJ_PATH, 'data', 'Processed', 'saved_listings', '*.json')
-SCORECARD_PATH = path.join(PROJ_PATH, 'data', 'scorecard.json')
+SCORECARD_PATH = path.join(PROJ_PATH, 'Data', 'scorecard.json')
 DATABASE_NAME = 'deathpledge_clean_flat'
 RAW_DATABASE_NAME = 'deathpledge_raw_flat'
 TIMEFORMAT = '%Y-%m-%dT%H:%M:%S'
@@ -16,13 +16,43 @@ if platform == 'linux':
 else:
     GECKODRIVER_PATH = path.join(PROJ_PATH, 'deathpledge', 'Drivers', 'geckodriver')
 
-makedirs(LISTINGS_DIR, exist_ok=True)
-
 
 def read_keys_file():
+    import yaml
+
     keys_path = path.join(CONFIG_PATH, 'keys.yaml')
     with open(keys_path, 'r') as f:
         return yaml.safe_load(f)
 
 
-keys = read_keys_file()
+class _LazyKeys(Mapping):
+    """The keys file, read the first time anything is looked up in it.
+
+    Importing the package, or running ``--help``, doesn't need the keys, so
+    this stands in for the dict until then.
+
+    """
+
+    def __init__(self):
+        self._keys = None
+
+    def _load(self):
+        if self._keys is None:
+            self._keys = read_keys_file() or {}
+        return self._keys
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __repr__(self):
+        state = 'unread' if self._keys is None else f'{len(self._keys)} sections'
+        return f'<keys from {CONFIG_PATH}: {state}>'
+
+
+keys = _LazyKeys()
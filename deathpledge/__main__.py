@@ -4,10 +4,24 @@ import argparse
 import logging
 
 import deathpledge
+from deathpledge import metrics, support, tracing
 from deathpledge.logs.log_setup import setup_logging
 from deathpledge.logs import *
-from deathpledge.api_calls import google_sheets as gs, check
-from deathpledge import scrape2, support, database, update_sold
+
+# Imported on first use, so --help doesn't wait for selenium, pandas, scipy and the API clients
+gs = support.lazy_import('deathpledge.api_calls.google_sheets')
+check = support.lazy_import('deathpledge.api_calls.check')
+cache = support.lazy_import('deathpledge.api_calls.cache')
+locations = support.lazy_import('deathpledge.api_calls.locations')
+commute_estimate = support.lazy_import('deathpledge.api_calls.commute_estimate')
+scrape2 = support.lazy_import('deathpledge.scrape2')
+database = support.lazy_import('deathpledge.database')
+update_sold = support.lazy_import('deathpledge.update_sold')
+enrich = support.lazy_import('deathpledge.enrich')
+freshness = support.lazy_import('deathpledge.freshness')
+resilience = support.lazy_import('deathpledge.resilience')
+spatial = support.lazy_import('deathpledge.spatial')
+cleaning = support.lazy_import('deathpledge.cleaning')
 
 logger = logging.getLogger(__name__)
 
@@ -17,19 +31,43 @@ def main():
     args = parse_commandline_arguments()
 
     logging_config = path.join(deathpledge.PROJ_PATH, 'config', 'logging.yaml')
-    setup_logging(config_path=logging_config, verbose=args.verbose)
+    setup_logging(config_path=logging_config, verbose=args.verbose, use_queue=True)
+    tracing.start_run(profile=args.profile)
+    metrics.start_run()
+    success = False
+    try:
+        with tracing.span('main'):
+            run_pipeline(args)
+        success = True
+    finally:
+        tracing.finish_run()
+        cache.record_all_stats()
+        metrics.finish_run(success)
+    return
+
+
+def run_pipeline(args):
+    locations.get_registry()
 
     google_creds = gs.GoogleCreds(
         creds_dict=deathpledge.keys.get('Google_creds')
     ).creds
 
     with database.DatabaseClient() as cloudant:
-        update_sold.update_sold(google_creds=google_creds, db_client=cloudant)
-        check_new_and_active_from_google(google_creds=google_creds, db_client=cloudant, quiet=True)
-        check_and_scrape_homescout(db_client=cloudant, max_pages=args.pages, quiet=True)
-        gs.refresh_url_sheet(google_creds, db_client=cloudant)
-        update_sold.refresh_sold_list(google_creds=google_creds, db_client=cloudant)
-    return
+        with tracing.stage('update_sold'):
+            update_sold.update_sold(google_creds=google_creds, db_client=cloudant)
+        with tracing.stage('check_google_sheet'):
+            check_new_and_active_from_google(google_creds=google_creds, db_client=cloudant,
+                                             force_enrich=args.force_enrich, quiet=True)
+        with tracing.stage('scrape_homescout'):
+            check_and_scrape_homescout(db_client=cloudant, max_pages=args.pages,
+                                       force_enrich=args.force_enrich, quiet=True)
+        with tracing.stage('refresh_sheets'):
+            gs.refresh_url_sheet(google_creds, db_client=cloudant)
+            update_sold.refresh_sold_list(google_creds=google_creds, db_client=cloudant)
+    cache.log_all_stats()
+    commute_estimate.log_stats()
+    resilience.log_quota_usage()
 
 
 def parse_commandline_arguments():
@@ -43,10 +81,14 @@ def parse_commandline_arguments():
                         help='Number of pages of results to scrape')
     parser.add_argument('-v', '--verbose', action='store_true',
                         help='increase output verbosity')
+    parser.add_argument('--force-enrich', action='store_true',
+                        help='redo every enrichment step, even for fields that are still fresh')
+    parser.add_argument('--profile', action='store_true',
+                        help='run each stage under cProfile, saving .prof files next to the trace')
     return parser.parse_args()
 
 
-def check_new_and_active_from_google(google_creds, db_client, **kwargs):
+def check_new_and_active_from_google(google_creds, db_client, force_enrich=False, **kwargs):
     """Go through google sheet to update actives and scrape new URLs."""
     urls = gs.get_url_dataframe(google_creds).head(20)
     to_scrape = urls.loc[urls['next_action'] == 'scrape']
@@ -60,37 +102,79 @@ def check_new_and_active_from_google(google_creds, db_client, **kwargs):
             db_name=deathpledge.RAW_DATABASE_NAME,
             client=db_client
         )
-        process_and_save(scraped_homes, db_client=db_client)
+        process_and_save(scraped_homes, db_client=db_client, force_enrich=force_enrich)
     if not to_check.empty:
         checked = check.check_urls_for_changes(urls=to_check, sign_in=False)
         database.bulk_upload(checked, db_name=deathpledge.DATABASE_NAME, client=db_client)
 
 
-def process_and_save(homes: list, db_client: database.Cloudant.iam):
+def process_and_save(homes: list, db_client: 'database.Cloudant.iam', force_enrich=False):
     """Clean and enrich homes, then push to clean.
 
+    Enriched fields are carried over from each home's existing clean doc, so only
+    missing or stale fields are looked up again. If the Bing quota runs out, the
+    remaining homes are saved without enrichment and filled in on a later run.
+
     Args:
         homes: Scraped listings
         db_client: Cloudant database client for upload
+        force_enrich: Redo every enrichment step
 
     """
+    metrics.counter('deathpledge_homes_processed_total', 'Homes cleaned, enriched and saved').inc(len(homes))
+    if homes and not force_enrich:
+        with tracing.stage('carry_over_enrichment', homes=len(homes)):
+            carry_over_enrichment(homes, db_client=db_client)
+    with tracing.stage('clean', homes=len(homes)):
+        cleaning.clean_batch(homes)
+    quota_exceeded = False
+    with tracing.stage('enrich', homes=len(homes)):
+        for home in homes:
+            if quota_exceeded:
+                continue
+            try:
+                home.enrich(driving=False, tether=False, force=force_enrich)
+            except resilience.QuotaExceeded as e:
+                logger.warning(f'{e}; skipping enrichment for the rest of this run.')
+                quota_exceeded = True
+        enrich.add_tether_batch(homes, force=force_enrich)
+        if not quota_exceeded:
+            try:
+                enrich.add_driving_batch(homes, force=force_enrich)
+            except Exception:
+                logger.exception('Batch driving enrichment failed.')
+    with tracing.stage('index_and_upload', homes=len(homes)):
+        home_index = spatial.get_home_index()
+        for home in homes:
+            support.update_modified_date(home)
+            home_index.update(home)
+        if homes:
+            home_index.save()
+            database.bulk_upload(docs=homes,
+                                 db_name=deathpledge.DATABASE_NAME,
+                                 client=db_client)
+
+
+def carry_over_enrichment(homes: list, db_client: 'database.Cloudant.iam'):
+    """Copy enriched fields from the clean database onto freshly scraped homes."""
+    existing_docs = database.get_bulk_docs(
+        doc_ids=[home.docid for home in homes],
+        db_name=deathpledge.DATABASE_NAME,
+        client=db_client
+    )
     for home in homes:
-        home.clean()
-        home.enrich()
-        support.update_modified_date(home)
-    if homes:
-        database.bulk_upload(docs=homes,
-                             db_name=deathpledge.DATABASE_NAME,
-                             client=db_client)
+        existing_doc = existing_docs.get(home.docid, {}).get('doc')
+        if existing_doc:
+            freshness.carry_over(home, existing_doc)
 
 
-def check_and_scrape_homescout(db_client, **kwargs):
+def check_and_scrape_homescout(db_client, force_enrich=False, **kwargs):
     scraped_homes = scrape2.scrape_from_homescout_gallery(db_client=db_client, **kwargs)
     if scraped_homes:
         database.bulk_upload(
             docs=scraped_homes, client=db_client, db_name=deathpledge.RAW_DATABASE_NAME
         )
-    process_and_save(homes=scraped_homes, db_client=db_client)
+    process_and_save(homes=scraped_homes, db_client=db_client, force_enrich=force_enrich)
 
 
 if __name__ == '__main__':
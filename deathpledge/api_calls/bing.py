@@ -5,31 +5,124 @@ Update properties retrieved with Bing Maps.
 import requests
 import datetime as dt
 import logging
+import math
+import threading
+import time
 from collections import namedtuple
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from deathpledge import keys
-from deathpledge import support
+from deathpledge import support, freshness, resilience, tracing
+from deathpledge.api_calls import cache, metro, commute_estimate
 
 logger = logging.getLogger(__name__)
 
+Commute = namedtuple('Commute', ['commute_time', 'first_leg', 'first_walk'])
+Walk = namedtuple('Walk', 'distance duration')
+Drive = namedtuple('Drive', 'distance duration')
+
+# Root every Bing Maps REST endpoint hangs off of; see set_base_url
+BING_BASE_URL = 'http://dev.virtualearth.net/REST/V1'
+
+# At most this many requests to Bing are in flight at once, across all homes
+MAX_CONCURRENT_CALLS = 4
+
+# Miles around the centerpoint swept for metro stations when seeding the index
+METRO_SWEEP_MILES = 25.0
+
+METERS_PER_MILE = 1609.344
+MILES_PER_DEGREE = math.radians(support.EARTH_RADIUS_MILES)  # of latitude
+
+_base_url = keys.get('Bing', {}).get('base_url', BING_BASE_URL)
+
+_session = None
+_session_lock = threading.Lock()
+_api_slots = threading.BoundedSemaphore(MAX_CONCURRENT_CALLS)
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_CALLS, thread_name_prefix='bing')
+_sweep_lock = threading.Lock()
+
+
+def get_session():
+    """Get the pooled HTTP session shared by every Bing call in this process."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=MAX_CONCURRENT_CALLS, pool_maxsize=MAX_CONCURRENT_CALLS
+            )
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+    return _session
+
+
+def set_base_url(url=None):
+    """Send every Bing API call to another server, such as the offline stand-in.
+
+    Args:
+        url (str, optional): Root URL standing in for ``BING_BASE_URL``, e.g.
+            ``'http://127.0.0.1:8080/REST/V1'``. Pass None to go back to Bing.
+
+    Returns:
+        str: The root URL used before this call, so it can be restored.
+
+    """
+    global _base_url
+    previous = _base_url
+    _base_url = (url or BING_BASE_URL).rstrip('/')
+    return previous
+
+
+def get_base_url():
+    return _base_url
+
 
 class BingFailure(Exception):
     pass
 
 
 class BingMapsAPI(object):
-    """Container for getting data from Bing Maps REST API."""
+    """Container for getting data from Bing Maps REST API.
+
+    Args:
+        geocode_cache (cache.GeocodeCache, optional): Where geocoded addresses are
+            looked up before calling Bing. Defaults to the on-disk cache shared
+            by the whole run.
+        route_cache (cache.RouteCache, optional): Where routes are looked up before
+            calling Bing. Defaults to the on-disk cache shared by the whole run.
+        station_index (metro.MetroStationIndex, optional): Known metro stations.
+            Defaults to the on-disk station table.
+        provider (resilience.Provider, optional): Retries, circuit breaker and quota
+            for requests to Bing. Defaults to the one shared by the whole run.
+        commute_estimator (commute_estimate.CommuteEstimator, optional): Estimates
+            commutes from nearby cached commutes. Defaults to one over *route_cache*.
+
+    """
 
-    def __init__(self):
+    def __init__(self, geocode_cache=None, route_cache=None, station_index=None, provider=None,
+                 commute_estimator=None):
         self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
         self.bingMapsKey = keys['API_keys']['bingMapsKey']
+        if geocode_cache is None:
+            geocode_cache = cache.get_geocode_cache()
+        if route_cache is None:
+            route_cache = cache.get_route_cache()
+        if station_index is None:
+            station_index = metro.get_station_index()
+        self.geocode_cache = geocode_cache
+        self.route_cache = route_cache
+        self.station_index = station_index
+        self.provider = provider or resilience.get_provider('bing')
+        if commute_estimator is None:
+            commute_estimator = commute_estimate.get_commute_estimator(route_cache)
+        self.commute_estimator = commute_estimator
 
-    @lru_cache()
     def get_geocoords(self, geocoder):
         """Geocode a location with the route coordinates of a street address.
-        
-        Args: 
+
+        Addresses already in the geocode cache are returned without calling Bing.
+
+        Args:
             geocoder (BingGeocoderAPICall): URL constructor for this API call, containing
                 the address to be geocoded.
 
@@ -37,6 +130,17 @@ class BingMapsAPI(object):
             Geocoords: latitude and longitude as floats
 
         """
+        address = geocoder.url_args.get('addressLine')
+        zip_code = geocoder.url_args.get('postalCode')
+        cached_coords = self.geocode_cache.get_coords(address, zip_code)
+        if cached_coords is not None:
+            return Geocoords._make(cached_coords)
+
+        geocoords = self._fetch_geocoords(geocoder)
+        self.geocode_cache.set_coords(address, zip_code, geocoords)
+        return geocoords
+
+    def _fetch_geocoords(self, geocoder):
         api_response = self._get_api_response(geocoder)
         coordinates_value = (api_response.get('resourceSets')[0]
                              .get('resources')[0]
@@ -47,6 +151,9 @@ class BingMapsAPI(object):
     def get_commute(self, commute_request):
         """Get commute travel time between two lat/lon tuples from Bing API.
 
+        Commutes already in the route cache are returned without calling Bing, and
+        so are commutes that can be interpolated from enough nearby cached ones.
+
         Args:
             commute_request (BingCommuteAPICall): URL constructor for this API call, containing
                 the start and end coordinates.
@@ -61,6 +168,10 @@ class BingMapsAPI(object):
             KeyError: If JSON from Bing does not match expected structure.
 
         """
+        return self._get_cached_route('transit', commute_request, self._fetch_commute, Commute,
+                                      estimator=self.commute_estimator)
+
+    def _fetch_commute(self, commute_request):
         api_response = self._get_api_response(commute_request)
         try:
             trip = api_response['resourceSets'][0]['resources'][0]
@@ -75,7 +186,6 @@ class BingMapsAPI(object):
             logger.exception('Failed to get first transit leg info.')
             first_leg = {}
 
-        Commute = namedtuple('Commute', ['commute_time', 'first_leg', 'first_walk'])
         commute = Commute(
             commute_time=travel_time_in_min,
             first_leg=first_leg.get('mode'),
@@ -117,13 +227,22 @@ class BingMapsAPI(object):
                 raise ValueError(f"Unknown transit mode from Bing:'{leg_mode}'")
         return first_leg
 
-    def get_nearby_metro(self, metro_request, homecoords):
-        """Get metro stations nearest a location from Bing API.
+    def get_nearby_metro(self, metro_request, homecoords, walker=None):
+        """Get metro stations nearest a location, with walk info to each.
+
+        Stations come from the local station index when it covers the location;
+        otherwise from Bing LocalSearch. The first call seeds an empty index by
+        sweeping LocalSearch over the area (see :meth:`seed_station_index`), so
+        later homes usually need no search. Walk info comes from the route cache when a nearby home has already
+        walked to the same station.
 
         Args:
             metro_request (BingNearbyMetroAPICall): URL constructor for this API call, containing
                 the start coordinates.
             homecoords (Geocoords): Start coordinates for creating the walk time request.
+            walker (optional): Anything with ``get_walk_time``, such as a
+                :class:`~deathpledge.api_calls.providers.ProviderChain`, to route the
+                walks with. Defaults to this API.
 
         Returns:
             dict: {metro station: walk info}
@@ -132,34 +251,113 @@ class BingMapsAPI(object):
             KeyError: If JSON from Bing does not match expected structure.
 
         """
-        api_response = self._get_api_response(metro_request)
+        if not self.station_index.seeded:
+            self.seed_station_index(default_center=homecoords)
+        station_count = int(metro_request.url_args.get('maxResults', 2))
+        stations = self.station_index.nearest(homecoords, k=station_count)
+        if stations is None:
+            stations = self._search_metro_stations(metro_request)
+
+        walker = walker or self
         metro_stations = {}
-        for result in api_response['resourceSets'][0]['resources']:
-            name = result['name']
-            if (len(name) < 6) | (name == 'Metro Rail'):
-                web = result['Website']
-                url_last_slash = web.rfind('/')
-                url_page_extension = web.rfind('.')
-                name = web[url_last_slash + 1:url_page_extension]
-            station_coords = Geocoords._make(result['point']['coordinates'])
+        for name, station_coords in stations:
             walk_request = BingWalkAPICall(
                 startcoords=homecoords,
-                endcoords=station_coords
+                endcoords=Geocoords._make(station_coords)
             )
-            walk_info = self.get_walk_time(walk_request=walk_request)
+            walk_info = walker.get_walk_time(walk_request=walk_request)
             metro_stations.update(
-                {'{}'.format(name.upper()): dict(
-                    distance=walk_info.distance, duration=walk_info.duration
-                )}
+                {name: dict(distance=walk_info.distance, duration=walk_info.duration)}
             )
         sorted_metro_list = sorted(
             metro_stations.items(), key=lambda x: x[1].get('distance')
         )
         return dict(sorted_metro_list)
 
+    def seed_station_index(self, default_center=None):
+        """Seed an empty station index with every station around the centerpoint.
+
+        Sweeps a circle of ``Metro: sweep_radius_miles`` (``METRO_SWEEP_MILES``
+        if unset) around ``Locations: centerpoint`` from the keys file. This is
+        only tried once per index, whether or not it succeeds, and only while
+        the index is empty.
+
+        Args:
+            default_center (Geocoords, optional): Where to sweep around if the
+                keys file has no centerpoint.
+
+        """
+        with _sweep_lock:
+            if self.station_index.sweep_tried or self.station_index.seeded:
+                return
+            self.station_index.sweep_tried = True
+            center = (keys.get('Locations') or {}).get('centerpoint')
+            center = Geocoords(center['lat'], center['lon']) if center else default_center
+            if center is None:
+                return
+            radius = (keys.get('Metro') or {}).get('sweep_radius_miles') or METRO_SWEEP_MILES
+            try:
+                stations = self.sweep_metro_stations(center, float(radius))
+            except (support.BadResponse, resilience.QuotaExceeded) as e:
+                self.logger.warning(f'Metro station sweep failed, using LocalSearch per home: {e}')
+                return
+            self.station_index.seed(stations)
+
+    def sweep_metro_stations(self, center, radius_miles, min_radius_miles=1.0):
+        """Find every metro station in a circle with Bing LocalSearch.
+
+        LocalSearch returns at most ``BingMetroSweepAPICall.max_results``
+        stations, so a circle with that many is split into seven circles of
+        half the radius, one in the middle and six around it, and each of those
+        is searched in turn.
+
+        Args:
+            center (Geocoords): Middle of the circle.
+            radius_miles (float): Radius of the circle.
+            min_radius_miles (float, optional): Circles are not split below
+                this radius.
+
+        Returns:
+            dict: Station name to Geocoords.
+
+        """
+        sweep_request = BingMetroSweepAPICall(center, radius_miles)
+        stations = self._search_metro_stations(sweep_request)
+        if len(stations) < sweep_request.max_results or radius_miles / 2 < min_radius_miles:
+            return dict(stations)
+        self.logger.debug(f'{len(stations)} stations within {radius_miles:.1f} miles of '
+                          f'{center.to_string()}, splitting the circle')
+        found = {}
+        half = radius_miles / 2
+        for sub_center in _split_circle(center, radius_miles):
+            found.update(self.sweep_metro_stations(sub_center, half, min_radius_miles))
+        return found
+
+    def _search_metro_stations(self, metro_request):
+        """Find stations near a location with Bing LocalSearch.
+
+        Returns:
+            list: (station name, Geocoords) tuples.
+
+        """
+        api_response = self._get_api_response(metro_request)
+        stations = []
+        for result in api_response['resourceSets'][0]['resources']:
+            name = result['name']
+            if (len(name) < 6) | (name == 'Metro Rail'):
+                web = result['Website']
+                url_last_slash = web.rfind('/')
+                url_page_extension = web.rfind('.')
+                name = web[url_last_slash + 1:url_page_extension]
+            station_coords = Geocoords._make(result['point']['coordinates'])
+            stations.append(('{}'.format(name.upper()), station_coords))
+        return stations
+
     def get_walk_time(self, walk_request):
         """Retrieves the walking distance and duration between two sets of coords.
 
+        Walks already in the route cache are returned without calling Bing.
+
         Args:
             walk_request (BingWalkAPICall): URL constructor for this API call, containing
                 the start and end coordinates.
@@ -170,10 +368,12 @@ class BingMapsAPI(object):
                 duration (int): Walk time to destination
 
         """
+        return self._get_cached_route('walk', walk_request, self._fetch_walk_time, Walk)
+
+    def _fetch_walk_time(self, walk_request):
         api_response = self._get_api_response(walk_request)
         distance = api_response['resourceSets'][0]['resources'][0]['travelDistance']
         duration = api_response['resourceSets'][0]['resources'][0]['travelDuration']
-        Walk = namedtuple('Walk', 'distance duration')
         walk = Walk(
             distance=round(distance, 2),
             duration='{}'.format(str(dt.timedelta(seconds=duration)))
@@ -181,7 +381,9 @@ class BingMapsAPI(object):
         return walk
 
     def get_driving_info(self, driving_request):
-        """Retrieves the walking distance and duration between two sets of coords.
+        """Retrieves the driving distance and duration between two sets of coords.
+
+        Drives already in the route cache are returned without calling Bing.
 
         Args:
             driving_request (BingDrivingAPICall): URL constructor for this API call, containing
@@ -193,30 +395,123 @@ class BingMapsAPI(object):
                 duration (int): Drive time to destination
 
         """
+        return self._get_cached_route('drive', driving_request, self._fetch_driving_info, Drive)
+
+    def _fetch_driving_info(self, driving_request):
         api_response = self._get_api_response(driving_request)
         distance = api_response['resourceSets'][0]['resources'][0]['travelDistance']
         duration = api_response['resourceSets'][0]['resources'][0]['travelDuration']
-        Drive = namedtuple('Drive', 'distance duration')
         drive = Drive(
             distance='{:.2f} miles'.format(distance),
             duration=str(dt.timedelta(seconds=duration))
         )
         return drive
 
+    def _get_cached_route(self, mode, route_request, fetch, route_type, estimator=None):
+        """Look up a route in the route cache, or fetch it from Bing and cache it.
+
+        Args:
+            mode (str): Travel mode, part of the cache key.
+            route_request (BingAPICall): Request with ``wp.0`` and ``wp.1`` waypoints.
+            fetch (callable): Makes the API call for *route_request* on a miss.
+            route_type (namedtuple): Type of route returned by *fetch*.
+            estimator (commute_estimate.CommuteEstimator, optional): Tried on a cache
+                miss before calling Bing. Estimates are not cached, so only real
+                routes are ever used as neighbors.
+
+        """
+        startcoords = route_request.url_args['wp.0'].split(',')
+        endcoords = route_request.url_args['wp.1'].split(',')
+        slot = self.get_time_slot(route_request)
+        cached_route = self.route_cache.get_route(mode, startcoords, endcoords, slot=slot)
+        if cached_route is not None:
+            return route_type._make(cached_route)
+        if estimator is not None:
+            estimate = estimator.estimate(startcoords, endcoords, slot=slot)
+            if estimate is not None:
+                self.logger.debug(f'Estimated {mode} route from {estimate.neighbors} neighbors, '
+                                  f'within {estimate.uncertainty} min')
+                return route_type._make(estimate.commute)
+
+        start = time.perf_counter()
+        route = fetch(route_request)
+        self.route_cache.set_route(mode, startcoords, endcoords, route, slot=slot,
+                                   latency=time.perf_counter() - start)
+        if estimator is not None:
+            estimator.add(startcoords, endcoords, route, slot=slot)
+        return route
+
+    @staticmethod
+    def get_time_slot(route_request):
+        """Weekday and time of day a route is requested for, like ``'Tue 06:30'``.
+
+        Returns:
+            str: The slot, or None if the request is not for a particular time.
+
+        """
+        url_args = route_request.url_args
+        bing_datetime = url_args.get('dateTime') or url_args.get('datetime')
+        if bing_datetime is not None:
+            route_datetime = dt.datetime.strptime(bing_datetime, '%m/%d/%Y %H:%M:%S')
+        elif url_args.get('startTime') is not None:
+            route_datetime = dt.datetime.fromisoformat(url_args['startTime'])
+        else:
+            return None
+        return route_datetime.strftime('%a %H:%M')
+
+    def get_distance_matrix(self, matrix_request):
+        """Retrieves driving distance and duration for every origin/destination pair.
+
+        Args:
+            matrix_request (BingDistanceMatrixAPICall): URL constructor for this API call,
+                containing the origin and destination coordinates.
+
+        Returns:
+            dict: {(origin index, destination index): Drive}. Pairs that Bing could
+                not route are left out.
+
+        """
+        api_response = self._get_api_response(matrix_request)
+        results = api_response['resourceSets'][0]['resources'][0]['results']
+        drives = {}
+        for cell in results:
+            distance = cell.get('travelDistance', -1)
+            duration = cell.get('travelDuration', -1)
+            if distance < 0 or duration < 0:
+                continue
+            drives[(cell['originIndex'], cell['destinationIndex'])] = Drive(
+                distance='{:.2f} miles'.format(distance),
+                duration=str(dt.timedelta(seconds=round(duration)))
+            )
+        return drives
+
     def _get_api_response(self, api_call) -> dict:
         """Sends HTTP request built from url and parameters.
 
+        Requests reuse pooled connections, and wait for a free slot if
+        ``MAX_CONCURRENT_CALLS`` are already in flight. Transient failures are
+        retried with backoff, and every attempt counts against the Bing quota.
+
         Args:
             api_call (BingAPICall): Baseurl and parameters.
 
         Raises:
-            support.BadResponse: If Bing does not send back 200 response.
+            support.BadResponse: If Bing does not send back 200 response, or is
+                failing so often that it is not being called for now.
+            resilience.QuotaExceeded: If today's Bing quota is used up.
 
         """
         api_call.url_args['key'] = self.bingMapsKey
-        response = requests.get(api_call.baseurl, params=api_call.url_args)
+        with tracing.span(f'bing.{type(api_call).__name__}'):
+            return self.provider.call(self._send_request, api_call, cost=api_call.transactions)
+
+    @staticmethod
+    def _send_request(api_call):
+        with _api_slots:
+            response = get_session().get(api_call.baseurl, params=api_call.url_args)
         if response.status_code != 200:
-            raise support.BadResponse('Response code from bing not 200.')
+            raise support.BadResponse(f'Response code from bing {response.status_code}, not 200.',
+                                      status_code=response.status_code)
         return response.json()
 
 
@@ -230,8 +525,21 @@ class Geocoords(namedtuple('Coordinates', 'lat lon')):
 
 
 class BingAPICall(object):
-    """Abstract class for constructing HTTP API calls."""
-    __slots__ = ('baseurl', 'url_args')
+    """Abstract class for constructing HTTP API calls.
+
+    Attributes:
+        endpoint (str): Path of this call's endpoint under the REST root.
+        transactions (int): Billable Bing transactions the call uses.
+
+    """
+    __slots__ = ('url_args',)
+    endpoint = None
+    transactions = 1
+
+    @property
+    def baseurl(self):
+        """str: Full URL for this call, under the current REST root."""
+        return f'{_base_url}/{self.endpoint}'
 
 
 class BingGeocoderAPICall(BingAPICall):
@@ -248,7 +556,7 @@ class BingGeocoderAPICall(BingAPICall):
         zip_code (Optional): Helps with accuracy of results. Defaults to None.
 
     """
-    baseurl = r"http://dev.virtualearth.net/REST/v1/Locations"
+    endpoint = 'Locations'
 
     def __init__(self, address: str, zip_code: int = None):
         url_args = {
@@ -275,7 +583,7 @@ class BingCommuteAPICall(BingAPICall):
         endcoords (Geocoords): same as startcoords
 
     """
-    baseurl = r"http://dev.virtualearth.net/REST/V1/Routes/Transit"
+    endpoint = 'Routes/Transit'
 
     def __init__(self, startcoords, endcoords):
         url_args = {
@@ -300,7 +608,7 @@ class BingNearbyMetroAPICall(BingAPICall):
         startcoords (Geocoords): a namedtuple of geographic coordinates (lat/lon) as integers
 
     """
-    baseurl = r"http://dev.virtualearth.net/REST/V1/LocalSearch/"
+    endpoint = 'LocalSearch/'
 
     def __init__(self, startcoords):
         url_args = {
@@ -312,6 +620,42 @@ class BingNearbyMetroAPICall(BingAPICall):
         self.url_args = {k: v for k, v in url_args.items() if v is not None}
 
 
+class BingMetroSweepAPICall(BingAPICall):
+    """Constructs URL args for API call to Bing maps for metro stations in a circle.
+
+    Attributes:
+        max_results (int): Most stations Bing returns for one search.
+        url_args (dict): Parameters to be appended to the `baseurl`.
+
+    Args:
+        center (Geocoords): Middle of the circle.
+        radius_miles (float): Radius of the circle.
+
+    """
+    endpoint = 'LocalSearch/'
+    max_results = 25
+
+    def __init__(self, center, radius_miles):
+        url_args = {
+            'query': 'metro station',
+            'userCircularMapView': f'{center.to_string()},{round(radius_miles * METERS_PER_MILE)}',
+            'maxResults': self.max_results,
+            'key': None,  # added by BingMapAPI method
+        }
+        self.url_args = {k: v for k, v in url_args.items() if v is not None}
+
+
+def _split_circle(center, radius_miles):
+    """Centers of seven circles of half the radius that together cover a circle."""
+    yield center
+    distance = radius_miles * math.sqrt(3) / 2
+    for bearing in range(0, 360, 60):
+        dlat = distance * math.cos(math.radians(bearing)) / MILES_PER_DEGREE
+        dlon = (distance * math.sin(math.radians(bearing))
+                / (MILES_PER_DEGREE * math.cos(math.radians(center.lat))))
+        yield Geocoords(center.lat + dlat, center.lon + dlon)
+
+
 class BingWalkAPICall(BingAPICall):
     """Constructs URL args for API call to Bing maps for walk time between two locations.
 
@@ -324,7 +668,7 @@ class BingWalkAPICall(BingAPICall):
         endcoords (Geocoords): same as startcoords
 
     """
-    baseurl = r"http://dev.virtualearth.net/REST/V1/Routes/Walking"
+    endpoint = 'Routes/Walking'
 
     def __init__(self, startcoords, endcoords):
         url_args = {
@@ -351,7 +695,7 @@ class BingDrivingAPICall(BingAPICall):
         hrmin (str): Time of expected driving, as 24-hour clock, e.g. '16:00'
 
     """
-    baseurl = r"http://dev.virtualearth.net/REST/V1/Routes/Driving"
+    endpoint = 'Routes/Driving'
 
     def __init__(self, startcoords, endcoords, dayofweek=None, hrmin=None):
         commute_datetime_args = [x for x in [dayofweek, hrmin] if x is not None]
@@ -366,20 +710,225 @@ class BingDrivingAPICall(BingAPICall):
         self.url_args = {k: v for k, v in url_args.items() if v is not None}
 
 
+class BingDistanceMatrixAPICall(BingAPICall):
+    """Constructs URL args for API call to Bing maps for a many-to-many driving matrix.
+
+    Bing limits the number of cells (origins x destinations) in a single request, and
+    the whole URL has to stay a reasonable length, so callers should chunk origins
+    with :meth:`max_origins_for`.
+
+    Attributes:
+        baseurl (str): URL for this Bing Maps API call.
+        url_args (dict): Parameters to be appended to the `baseurl`.
+
+    Args:
+        origins (list): Geocoords of the starting points.
+        destinations (list): Geocoords of the end points.
+        dayofweek (int): Day of the week of expected driving, where 0 = Monday
+        hrmin (str): Time of expected driving, as 24-hour clock, e.g. '16:00'
+
+    """
+    endpoint = 'Routes/DistanceMatrix'
+    max_cells = 625  # limit for driving requests with a startTime
+    max_origins = 50  # keeps the GET URL well under length limits
+
+    def __init__(self, origins, destinations, dayofweek=None, hrmin=None):
+        commute_datetime_args = [x for x in [dayofweek, hrmin] if x is not None]
+        url_args = {
+            'origins': ';'.join(x.to_string() for x in origins),
+            'destinations': ';'.join(x.to_string() for x in destinations),
+            'travelMode': 'driving',
+            'startTime': support.get_commute_datetime('iso', *commute_datetime_args),
+            'distanceUnit': 'mi',
+            'timeUnit': 'second',
+            'key': None,  # added by BingMapAPI method
+        }
+        self.url_args = {k: v for k, v in url_args.items() if v is not None}
+
+    @property
+    def transactions(self):
+        """int: Bing bills each origin/destination pair as a transaction."""
+        origin_count = self.url_args['origins'].count(';') + 1
+        destination_count = self.url_args['destinations'].count(';') + 1
+        return origin_count * destination_count
+
+    @classmethod
+    def max_origins_for(cls, destination_count):
+        """Largest chunk of origins that fits in one request."""
+        return max(1, min(cls.max_origins, cls.max_cells // max(destination_count, 1)))
+
+
+def add_driving_to_homes(homes, registry, bing_api=None, force=False, drive_router=None):
+    """Route many homes to every favorite place with distance matrix requests.
+
+    Favorite places sharing a day and time are requested together, and homes are
+    chunked to fit Bing's per-request limits. Drives that are already fresh on the
+    home, or in the route cache, are not requested again. Results are written to
+    each home's ``{place}_dist`` and ``{place}_time`` fields, same as
+    :class:`BingDataGetter`.
+
+    Args:
+        homes (list): Homes to enrich. Those without geocoords are skipped.
+        registry (locations.LocationRegistry): Favorite places for this run.
+        bing_api (BingMapsAPI, optional): Defaults to a new instance.
+        force (bool, optional): Route every home even if its drives are fresh.
+        drive_router (optional): Anything with ``get_distance_matrix``, such as a
+            :class:`~deathpledge.routing.roads.RoadRouter`, to route with instead
+            of Bing. Its drives are not put in the route cache, which only holds
+            Bing's.
+
+    Returns:
+        int: Number of matrix requests made.
+
+    """
+    bing_api = bing_api or BingMapsAPI()
+    router = drive_router or bing_api
+    routable = [home for home in homes if home.get('geocoords')]
+
+    departure_groups = {}
+    for destination in registry.favorite_driving.values():
+        departure_groups.setdefault((destination.day, destination.time), []).append(destination)
+
+    request_count = 0
+    for (day, time_of_day), destinations in departure_groups.items():
+        slot = BingMapsAPI.get_time_slot(BingDrivingAPICall(
+            Geocoords(0, 0), Geocoords(0, 0), dayofweek=day, hrmin=time_of_day))
+        pending = []
+        for home in routable:
+            stale = [
+                x for x in destinations
+                if freshness.needs_update(home, f'driving:{x.name}', driving_inputs(home, x), force)
+            ]
+            if not stale:
+                continue
+            cached_drives = [
+                bing_api.route_cache.get_route('drive', home['geocoords'], x.coords, slot=slot)
+                for x in destinations
+            ]
+            if any(x is None for x in cached_drives):
+                pending.append(home)
+                continue
+            for destination, drive in zip(destinations, cached_drives):
+                _update_home_with_drive(home, destination.name, Drive._make(drive))
+                freshness.mark_fresh(home, f'driving:{destination.name}',
+                                     driving_inputs(home, destination))
+
+        chunk_size = BingDistanceMatrixAPICall.max_origins_for(len(destinations))
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            matrix_request = BingDistanceMatrixAPICall(
+                origins=[Geocoords._make(home['geocoords']) for home in chunk],
+                destinations=[x.coords for x in destinations],
+                dayofweek=day,
+                hrmin=time_of_day
+            )
+            request_count += 1
+            request_start = time.perf_counter()
+            try:
+                drives = router.get_distance_matrix(matrix_request)
+            except support.BadResponse:
+                logger.exception('Distance matrix request failed; skipping chunk.')
+                continue
+            latency_per_cell = (time.perf_counter() - request_start) / max(len(drives), 1)
+            for (origin_idx, dest_idx), drive in drives.items():
+                home, destination = chunk[origin_idx], destinations[dest_idx]
+                _update_home_with_drive(home, destination.name, drive)
+                freshness.mark_fresh(home, f'driving:{destination.name}',
+                                     driving_inputs(home, destination))
+                if drive_router is not None:
+                    continue
+                bing_api.route_cache.set_route('drive', home['geocoords'], destination.coords,
+                                               drive, slot=slot, latency=latency_per_cell)
+    logger.info(f'Driving for {len(routable)} homes in {request_count} matrix requests')
+    return request_count
+
+
+def driving_inputs(home, destination):
+    """Values a home's drive to a favorite place depends on."""
+    return (freshness.rounded_coords(home.get('geocoords')), destination.addr,
+            destination.day, destination.time)
+
+
+def _update_home_with_drive(home, place, drive):
+    home.update({
+        f'{place}_dist': drive.distance,
+        f'{place}_time': drive.duration
+    })
+
+
 class BingDataGetter(object):
-    """Adds Bing maps attributes to a home."""
+    """Adds Bing maps attributes to a home.
+
+    Steps whose fields are already present and fresh are skipped; see
+    :mod:`deathpledge.freshness`.
 
-    def __init__(self, home):
+    Args:
+        home (Home): Home being enriched.
+        registry (locations.LocationRegistry): Work and favorite places, already
+            geocoded for this run.
+        force (bool, optional): Run every step even if its fields are fresh.
+        providers (providers.ProviderChain, optional): Geocodes and routes the home
+            with the preferred provider for each, falling back to the next. Defaults
+            to Bing for everything.
+
+    """
+
+    def __init__(self, home, registry, force=False, providers=None):
         self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
         self.home = home
+        self.registry = registry
+        self.force = force
         self.bing_api = BingMapsAPI()
+        self.providers = providers
+
+    @property
+    def maps_api(self):
+        """Where geocodes and routes come from: the provider chain, or else Bing."""
+        return self.providers or self.bing_api
 
-    def add_data_to_home(self):
-        if not self.home.get('geocoords'):
+    @property
+    def geocoords(self):
+        """The home's coordinates as Geocoords, even if carried over from a saved doc as a list."""
+        return Geocoords._make(self.home['geocoords'])
+
+    def add_data_to_home(self, driving=True):
+        """Geocode the home, then add commute, metro and driving info.
+
+        Everything after geocoding depends only on the coordinates, so those
+        steps run concurrently and the home is done when the slowest finishes.
+
+        Args:
+            driving (bool): Whether to route to favorite places one home at a time.
+                Pass False when :func:`add_driving_to_homes` will be run on the batch.
+
+        Raises:
+            Exception: The first exception raised by any step, after all have finished.
+
+        """
+        if freshness.needs_update(self.home, 'geocoords', self._geocode_inputs(), self.force):
             self._get_home_coordinates()
-        self._get_commute()
-        self._get_nearby_metro()
-        self._get_driving()
+        steps = []
+        if freshness.needs_update(self.home, 'commute', self._commute_inputs(), self.force):
+            steps.append(self._get_commute)
+        if freshness.needs_update(self.home, 'nearby_metro', self._metro_inputs(), self.force):
+            steps.append(self._get_nearby_metro)
+        if driving:
+            steps.append(self._get_driving)
+        futures = [_executor.submit(step) for step in steps]
+        wait(futures)
+        for future in futures:
+            future.result()
+
+    def _geocode_inputs(self):
+        zip_code = (self.home.get('parsed_address') or {}).get('ZipCode')
+        return self.home.get('full_address'), zip_code
+
+    def _commute_inputs(self):
+        return (freshness.rounded_coords(self.home.get('geocoords')),
+                list(self.registry.work_coords))
+
+    def _metro_inputs(self):
+        return (freshness.rounded_coords(self.home.get('geocoords')),)
 
     def _get_home_coordinates(self):
         geocoder = BingGeocoderAPICall(
@@ -387,17 +936,18 @@ class BingDataGetter(object):
             zip_code=self.home.get('parsed_address').get('ZipCode')
         )
         try:
-            self.home['geocoords'] = self.bing_api.get_geocoords(geocoder=geocoder)
+            self.home['geocoords'] = self.maps_api.get_geocoords(geocoder=geocoder)
         except support.BadResponse:
             raise BingFailure(f"Could not retrieve geocoords for {self.home['full_address']}")
+        freshness.mark_fresh(self.home, 'geocoords', self._geocode_inputs())
 
     def _get_commute(self):
         commute_request = BingCommuteAPICall(
-            startcoords=self.home['geocoords'],
-            endcoords=Geocoords._make(keys['Locations']['work_coords'].values())
+            startcoords=self.geocoords,
+            endcoords=self.registry.work_coords
         )
         try:
-            commute = self.bing_api.get_commute(commute_request=commute_request)
+            commute = self.maps_api.get_commute(commute_request=commute_request)
         except support.BadResponse:
             self.logger.exception(f"Could not get commute for {self.home['full_address']}")
         else:
@@ -406,33 +956,36 @@ class BingDataGetter(object):
                 'first_leg': commute.first_leg,
                 'first_walk': commute.first_walk
             })
+            freshness.mark_fresh(self.home, 'commute', self._commute_inputs())
 
     def _get_nearby_metro(self):
-        nearby_metro_request = BingNearbyMetroAPICall(startcoords=self.home['geocoords'])
+        nearby_metro_request = BingNearbyMetroAPICall(startcoords=self.geocoords)
         try:
             self.home['nearby_metro'] = self.bing_api.get_nearby_metro(
                 metro_request=nearby_metro_request,
-                homecoords=self.home['geocoords']
+                homecoords=self.geocoords,
+                walker=self.providers
             )
         except support.BadResponse:
             self.logger.exception(f"Could not get nearby metro for {self.home['full_address']}")
+        else:
+            freshness.mark_fresh(self.home, 'nearby_metro', self._metro_inputs())
 
     def _get_driving(self):
-        for place, attribs in keys['Locations']['favorite_driving'].items():
-            place_geocoder = BingGeocoderAPICall(address=attribs['addr'])
-            place_coords = self.bing_api.get_geocoords(geocoder=place_geocoder)
+        for place, destination in self.registry.favorite_driving.items():
+            inputs = driving_inputs(self.home, destination)
+            if not freshness.needs_update(self.home, f'driving:{place}', inputs, self.force):
+                continue
             driving_request = BingDrivingAPICall(
-                startcoords=self.home['geocoords'],
-                endcoords=place_coords,
-                dayofweek=attribs.get('day'),
-                hrmin=attribs.get('time')
+                startcoords=self.geocoords,
+                endcoords=destination.coords,
+                dayofweek=destination.day,
+                hrmin=destination.time
             )
             try:
-                drive = self.bing_api.get_driving_info(driving_request)
+                drive = self.maps_api.get_driving_info(driving_request)
             except support.BadResponse:
                 continue
             else:
-                self.home.update({
-                    f'{place}_dist': drive.distance,
-                    f'{place}_time': drive.duration
-                })
+                _update_home_with_drive(self.home, place, drive)
+                freshness.mark_fresh(self.home, f'driving:{place}', inputs)
@@ -0,0 +1,367 @@
+"""
+Persistent on-disk caches for external API results.
+
+Each cache is a single SQLite table of JSON values keyed by a normalized
+string, so results survive between runs and are shared by every home
+enriched in a run. Hits and misses are counted so the hit rate can be
+reported at the end of a run.
+
+"""
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from os import path, makedirs
+
+import deathpledge
+from deathpledge import support, keys, metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = path.join(deathpledge.PROJ_PATH, 'data', 'cache')
+CACHE_DB_PATH = path.join(CACHE_DIR, 'api_cache.sqlite3')
+
+
+class CacheStats(object):
+    """Hit and miss counters for a single cache."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def lookups(self):
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self):
+        """float: Fraction of lookups served from the cache."""
+        if not self.lookups:
+            return 0.0
+        return self.hits / self.lookups
+
+    def __str__(self):
+        summary = f'{self.hits}/{self.lookups} hits ({self.hit_rate:.1%})'
+        if self.saved_seconds:
+            summary += f', saved {self.hits} calls and {self.saved_seconds:.1f}s'
+        return summary
+
+
+class SQLiteCache(object):
+    """Key-value store of JSON-serializable values in a SQLite table.
+
+    A single connection is shared between threads and guarded by a lock.
+
+    Args:
+        table (str): Name of the table holding this cache's entries.
+        db_path (str, optional): SQLite file. Defaults to ``CACHE_DB_PATH``.
+            Pass ``':memory:'`` for a throwaway cache.
+
+    """
+
+    def __init__(self, table, db_path=CACHE_DB_PATH):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        self.table = table
+        self.db_path = db_path
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        if db_path != ':memory:':
+            makedirs(path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.table} '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL)'
+        )
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            row = self._conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()
+        return row[0]
+
+    def get(self, key):
+        """Look up a value, counting the hit or miss.
+
+        Returns:
+            The cached value, or None if *key* is not cached.
+
+        """
+        value = self.peek(key)
+        with self._lock:
+            if value is None:
+                self.stats.misses += 1
+            else:
+                self.stats.hits += 1
+        return value
+
+    def peek(self, key):
+        """Look up a value without counting it as a hit or miss."""
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT value FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store a value, replacing any existing entry for *key*."""
+        with self._lock:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)',
+                (key, json.dumps(value))
+            )
+            self._conn.commit()
+
+    def set_many(self, items):
+        """Store many (key, value) pairs in one transaction."""
+        with self._lock:
+            self._conn.executemany(
+                f'INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)',
+                [(key, json.dumps(value)) for key, value in items]
+            )
+            self._conn.commit()
+
+    def items(self, prefix=''):
+        """All (key, value) pairs, without counting them as lookups.
+
+        Args:
+            prefix (str, optional): Only return keys starting with this.
+
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT key, value FROM {self.table} WHERE key >= ? AND key < ?',
+                (prefix, prefix + '\uffff')
+            ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def log_stats(self):
+        self.logger.info(f"Cache '{self.table}': {self.stats}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class GeocodeCache(SQLiteCache):
+    """Geocoded coordinates keyed by normalized street address and ZIP code."""
+
+    def __init__(self, db_path=CACHE_DB_PATH):
+        super().__init__(table='geocodes', db_path=db_path)
+
+    @staticmethod
+    def make_key(address, zip_code=None):
+        """Normalize an address so trivially different spellings share a key.
+
+        Examples:
+            >>> GeocodeCache.make_key('5065 7th Rd S #202 Arlington, VA', 22204)
+            '5065 7TH RD S 202 ARLINGTON VA|22204'
+
+        """
+        zip_part = '' if zip_code is None else str(zip_code).strip()
+        return f'{support.clean_address(address)}|{zip_part}'
+
+    def get_coords(self, address, zip_code=None):
+        """Returns:
+            list: [lat, lon], or None if the address has not been geocoded.
+
+        """
+        return self.get(self.make_key(address, zip_code))
+
+    def set_coords(self, address, zip_code, coords):
+        self.set(self.make_key(address, zip_code), list(coords))
+
+
+# Caches holding entries not yet on disk, written out when the process exits
+_buffered_caches = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_buffered_caches():
+    for buffered in list(_buffered_caches):
+        buffered.flush()
+
+
+class AddressCache(SQLiteCache):
+    """Tagged address components, as from ``usaddress``, keyed by the address.
+
+    A parse takes far less time than committing it to disk, so new entries are
+    held in memory and written a batch at a time, and when the process exits.
+
+    """
+    flush_size = 256
+
+    def __init__(self, db_path=CACHE_DB_PATH):
+        super().__init__(table='addresses', db_path=db_path)
+        self._unsaved = {}
+        _buffered_caches.add(self)
+
+    def __len__(self):
+        self.flush()
+        return super().__len__()
+
+    def peek(self, key):
+        value = self._unsaved.get(key)
+        if value is not None:
+            return value
+        return super().peek(key)
+
+    def set(self, key, value):
+        self._unsaved[key] = value
+        if len(self._unsaved) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        """Write entries held in memory to disk."""
+        unsaved, self._unsaved = self._unsaved, {}
+        if unsaved:
+            self.set_many(unsaved.items())
+
+    def close(self):
+        self.flush()
+        _buffered_caches.discard(self)
+        super().close()
+
+    @staticmethod
+    def make_key(full_address):
+        """Collapse whitespace, which the tagger ignores, and nothing else.
+
+        Examples:
+            >>> AddressCache.make_key(' 123 N Maple Dr,  Alexandria VA ')
+            '123 N Maple Dr, Alexandria VA'
+
+        """
+        return ' '.join(full_address.split())
+
+
+class RouteCache(SQLiteCache):
+    """Route results keyed by mode, time slot and rounded start/end coordinates.
+
+    Coordinates are rounded to about 100 meters, so homes in the same building
+    or on the same block share a route. Each entry keeps how long the original
+    call took, so hits can be reported as time saved.
+
+    Args:
+        precision (int, optional): Decimal places kept in coordinates. Defaults to 3.
+        ttl_days (float, optional): Entries older than this are treated as misses.
+            Defaults to None, meaning routes never expire.
+
+    """
+
+    def __init__(self, db_path=CACHE_DB_PATH, precision=3, ttl_days=None):
+        super().__init__(table='routes', db_path=db_path)
+        self.precision = precision
+        self.ttl_days = ttl_days
+
+    def make_key(self, mode, startcoords, endcoords, slot=None):
+        """Build a key like ``'transit|Tue 06:30|38.862,-77.060|38.890,-77.010'``."""
+        start, end = [
+            ','.join(f'{float(x):.{self.precision}f}' for x in coords)
+            for coords in (startcoords, endcoords)
+        ]
+        return f"{mode}|{slot or ''}|{start}|{end}"
+
+    def get_route(self, mode, startcoords, endcoords, slot=None):
+        """Returns:
+            list: The cached route's fields, or None if not cached or expired.
+
+        """
+        entry = self.peek(self.make_key(mode, startcoords, endcoords, slot))
+        expired = (
+            entry is not None and self.ttl_days is not None
+            and time.time() - entry['cached_at'] > self.ttl_days * 86400
+        )
+        with self._lock:
+            if entry is None or expired:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            self.stats.saved_seconds += entry.get('latency', 0)
+        return entry['route']
+
+    def routes_to(self, mode, endcoords, slot=None):
+        """Every unexpired route of a mode and slot that ends at *endcoords*.
+
+        Lookups here aren't counted as hits or misses.
+
+        Returns:
+            list: ((lat, lon) start, route fields) tuples.
+
+        """
+        prefix = f"{mode}|{slot or ''}|"
+        end = self.make_key(mode, endcoords, endcoords, slot).rsplit('|', 1)[1]
+        routes = []
+        for key, entry in self.items(prefix):
+            if not key.endswith(f'|{end}'):
+                continue
+            if self.ttl_days is not None and time.time() - entry['cached_at'] > self.ttl_days * 86400:
+                continue
+            start = key[len(prefix):].split('|')[0]
+            routes.append((tuple(float(x) for x in start.split(',')), entry['route']))
+        return routes
+
+    def set_route(self, mode, startcoords, endcoords, route, slot=None, latency=0.0):
+        """Store a route along with how many seconds the call for it took."""
+        entry = dict(route=list(route), cached_at=time.time(), latency=latency)
+        self.set(self.make_key(mode, startcoords, endcoords, slot), entry)
+
+
+_geocode_cache = None
+_route_cache = None
+_address_cache = None
+_quota_store = None
+
+
+def get_geocode_cache():
+    """Get the geocode cache shared by every caller in this process."""
+    global _geocode_cache
+    if _geocode_cache is None:
+        _geocode_cache = GeocodeCache()
+    return _geocode_cache
+
+
+def get_route_cache():
+    """Get the route cache shared by every caller in this process."""
+    global _route_cache
+    if _route_cache is None:
+        ttl_days = keys.get('Cache', {}).get('route_ttl_days')
+        _route_cache = RouteCache(ttl_days=ttl_days)
+    return _route_cache
+
+
+def get_address_cache():
+    """Get the parsed address cache shared by every caller in this process."""
+    global _address_cache
+    if _address_cache is None:
+        _address_cache = AddressCache()
+    return _address_cache
+
+
+def get_quota_store():
+    """Get the table of daily request counts shared by every provider in this process."""
+    global _quota_store
+    if _quota_store is None:
+        _quota_store = SQLiteCache(table='quotas')
+    return _quota_store
+
+
+def log_all_stats():
+    """Report hit rates for every cache opened during this run."""
+    for cache in [_geocode_cache, _route_cache, _address_cache]:
+        if cache is not None:
+            cache.log_stats()
+
+
+def record_all_stats():
+    """Add hits and misses of every cache opened during this run to the run's metrics."""
+    lookups = metrics.counter('deathpledge_cache_lookups_total', 'Cache lookups, by result',
+                              ['cache', 'result'])
+    for cache in [_geocode_cache, _route_cache, _address_cache]:
+        if cache is not None:
+            lookups.inc(cache.stats.hits, cache=cache.table, result='hit')
+            lookups.inc(cache.stats.misses, cache=cache.table, result='miss')
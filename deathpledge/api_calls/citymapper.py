@@ -1,9 +1,15 @@
 """Fetch things from the citymapper API."""
+import datetime as dt
+import logging
 
 import requests
-import datetime as dt
-from deathpledge.api_calls import keys
-from deathpledge import support
+
+from deathpledge import keys, support, resilience
+from deathpledge.api_calls.bing import Commute
+
+logger = logging.getLogger(__name__)
+
+TRAVEL_TIME_URL = r'https://developer.citymapper.com/api/1/traveltime/'
 
 
 class Sleepytime(Exception):
@@ -13,6 +19,43 @@ class Sleepytime(Exception):
     pass
 
 
+def get_travel_time_minutes(startcoords, endcoords, arrival_time=None):
+    """Get transit travel time in minutes between two lat/lon tuples from Citymapper API.
+
+    Args:
+        startcoords (iterable): Latitude and longitude of the start.
+        endcoords (iterable): Same as *startcoords*.
+        arrival_time (str, optional): ISO datetime with UTC offset to arrive by.
+            Defaults to the work commute time.
+
+    Returns:
+        int: Minutes
+
+    Raises:
+        support.BadResponse: If Citymapper does not send back a travel time.
+
+    """
+    url_args = {
+        'startcoord': support.str_coords(startcoords),
+        'endcoord': support.str_coords(endcoords),
+        'time': arrival_time or support.get_commute_datetime('cm'),
+        'time_type': 'arrival',
+        'key': keys['API_keys']['citymapperKey']
+    }
+    return resilience.get_provider('citymapper').call(_send_request, url_args)
+
+
+def _send_request(url_args):
+    response = requests.get(TRAVEL_TIME_URL, params=url_args, timeout=30)
+    r_dict = response.json()
+    if response.status_code != 200:
+        raise support.BadResponse(r_dict.get('error_message'), status_code=response.status_code)
+    try:
+        return r_dict['travel_time_minutes']
+    except KeyError:
+        raise support.BadResponse('JSON response does not have travel_time_minutes key.')
+
+
 def get_citymapper_commute_time(startcoords, endcoords):
     """Get commute travel time between two lat/lon tuples from Citymapper API.
 
@@ -26,30 +69,32 @@ def get_citymapper_commute_time(startcoords, endcoords):
     -------
     str: time in HH:MM:SS
     """
-    baseurl = r'https://developer.citymapper.com/api/1/traveltime/'
-    url_args = {
-        'startcoord': support.str_coords(startcoords),
-        'endcoord': support.str_coords(endcoords),
-        'time': support.get_commute_datetime('cm'),
-        'time_type': 'arrival',
-        'key': keys.citymapperKey
-    }
-    response = requests.get(baseurl, params=url_args)
-    print(response.url)
-    r_dict = response.json()
-    if response.status_code != 200:
-        print('Could not retrieve commute time for this address.')
-        raise support.BadResponse(r_dict['error_message'])
-    try:
-        travel_time = r_dict['travel_time_minutes']
-    except KeyError as e:
-        print(e)
-        print('Could not retrieve commute time for this address.')
-        raise support.BadResponse('JSON response does not have travel_time_minutes key.')
-    return str(dt.timedelta(minutes=travel_time))
+    return str(dt.timedelta(minutes=get_travel_time_minutes(startcoords, endcoords)))
+
+
+class CitymapperAPI(object):
+    """Transit commutes from Citymapper, answering the same requests as Bing's.
+
+    Citymapper only gives the total travel time, so the first leg and walk
+    are left empty.
+
+    """
+    name = 'citymapper'
+    cache_results = True
+
+    def get_commute(self, commute_request):
+        url_args = commute_request.url_args
+        bing_datetime = url_args.get('dateTime') or url_args.get('datetime')
+        arrival = dt.datetime.strptime(bing_datetime, '%m/%d/%Y %H:%M:%S').replace(tzinfo=support.LOCAL_TIMEZONE)
+        minutes = get_travel_time_minutes(
+            url_args['wp.0'].split(','), url_args['wp.1'].split(','),
+            arrival_time=arrival.isoformat()
+        )
+        return Commute(commute_time=float(minutes), first_leg=None, first_walk=None)
 
 
 if __name__ == '__main__':
     SAMPLE_COORDS = (38.7475034360889, -76.9614514740661)
-    SAMPLE_TIME = get_citymapper_commute_time(SAMPLE_COORDS)
+    WORK_COORDS = tuple(keys['Locations']['work_coords'].values())
+    SAMPLE_TIME = get_citymapper_commute_time(SAMPLE_COORDS, WORK_COORDS)
     print(SAMPLE_TIME)
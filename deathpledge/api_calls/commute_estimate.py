@@ -0,0 +1,214 @@
+"""
+Estimate transit commutes from nearby homes' commutes instead of calling Bing.
+
+Commute time to work changes smoothly across a neighborhood, so once a few
+homes near a new listing have been routed, its commute can be interpolated
+from theirs. The estimate is an inverse-distance weighted average of the
+cached commutes within a small radius. It is only used when there are
+enough neighbors and they agree: the uncertainty bound, the largest
+difference between any neighbor's commute and the estimate, must be within
+a few minutes. Otherwise Bing is called as usual, and the result becomes
+another neighbor for later homes.
+
+"""
+import logging
+import threading
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from deathpledge import keys, spatial
+from deathpledge.api_calls import cache
+
+logger = logging.getLogger(__name__)
+
+CommuteEstimate = namedtuple('CommuteEstimate', 'commute uncertainty neighbors')
+
+# Neighbors closer than this are treated as being this far, so a home in the
+# same building doesn't get an infinite weight
+MIN_DISTANCE_MILES = 0.01
+
+
+class EstimatorStats(object):
+    """How many commutes were estimated locally and how many needed Bing."""
+
+    def __init__(self):
+        self.estimated = 0
+        self.requested = 0
+
+    @property
+    def local_fraction(self):
+        """float: Fraction of commutes served without calling Bing."""
+        total = self.estimated + self.requested
+        if not total:
+            return 0.0
+        return self.estimated / total
+
+    def __str__(self):
+        total = self.estimated + self.requested
+        return f'{self.estimated}/{total} commutes estimated locally ({self.local_fraction:.1%})'
+
+
+class _Neighborhood(object):
+    """Known commutes to one destination at one time slot."""
+
+    def __init__(self, routes):
+        self.coords = [start for start, route in routes]
+        self.routes = [route for start, route in routes]
+        self._index = None
+
+    def add(self, startcoords, route):
+        self.coords.append(tuple(startcoords))
+        self.routes.append(route)
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = spatial.PointIndex(self.coords)
+        return self._index
+
+
+class CommuteEstimator(object):
+    """Inverse-distance weighted commute estimates from cached commutes.
+
+    Args:
+        route_cache (cache.RouteCache, optional): Where known commutes are loaded
+            from. Defaults to the on-disk route cache.
+        radius_miles (float, optional): How far away a neighbor can be. Defaults to 0.5.
+        min_neighbors (int, optional): Neighbors needed for an estimate. Defaults to 4.
+        max_uncertainty (float, optional): Largest allowed difference, in minutes,
+            between any neighbor's commute and the estimate. Defaults to 3.
+        power (float, optional): Exponent of the inverse-distance weights. Defaults to 2.
+
+    """
+    name = 'estimate'
+    cache_results = False
+
+    def __init__(self, route_cache=None, radius_miles=0.5, min_neighbors=4,
+                 max_uncertainty=3.0, power=2):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        if route_cache is None:
+            route_cache = cache.get_route_cache()
+        self.route_cache = route_cache
+        self.radius_miles = radius_miles
+        self.min_neighbors = min_neighbors
+        self.max_uncertainty = max_uncertainty
+        self.power = power
+        self.stats = EstimatorStats()
+        self._neighborhoods = {}
+        self._lock = threading.Lock()
+
+    def _get_neighborhood(self, endcoords, slot):
+        key = (self.route_cache.make_key('transit', endcoords, endcoords, slot), slot)
+        if key not in self._neighborhoods:
+            routes = self.route_cache.routes_to('transit', endcoords, slot=slot)
+            self._neighborhoods[key] = _Neighborhood(routes)
+        return self._neighborhoods[key]
+
+    def estimate(self, startcoords, endcoords, slot=None):
+        """Estimate a commute from its neighbors, if they are dense and agree.
+
+        Args:
+            startcoords (Geocoords): Home being routed.
+            endcoords (Geocoords): Work.
+            slot (str, optional): Time slot of the commute, e.g. ``'Tue 08:00'``.
+
+        Returns:
+            CommuteEstimate: The estimated commute fields, the uncertainty bound in
+                minutes and the number of neighbors used; or None if Bing should
+                be called instead.
+
+        """
+        with self._lock:
+            neighborhood = self._get_neighborhood(endcoords, slot)
+            estimate = self._interpolate(neighborhood, startcoords)
+            if estimate is None:
+                self.stats.requested += 1
+            else:
+                self.stats.estimated += 1
+        return estimate
+
+    def _interpolate(self, neighborhood, startcoords):
+        if len(neighborhood.coords) < self.min_neighbors:
+            return None
+        lat, lon = float(startcoords[0]), float(startcoords[1])
+        idx = neighborhood.index.within(lat, lon, self.radius_miles)
+        usable = [i for i in idx if neighborhood.routes[i][0] is not None]
+        if len(usable) < self.min_neighbors:
+            return None
+
+        neighbor_coords = neighborhood.index.coords[usable]
+        chord = np.linalg.norm(
+            spatial.to_unit_vectors(neighbor_coords[:, 0], neighbor_coords[:, 1])
+            - spatial.to_unit_vectors(lat, lon)[0], axis=1
+        )
+        miles = spatial.chord_to_miles(chord)
+        weights = 1 / np.maximum(miles, MIN_DISTANCE_MILES) ** self.power
+        times = np.array([neighborhood.routes[i][0] for i in usable], dtype=float)
+        commute_time = float(np.average(times, weights=weights))
+        uncertainty = float(np.max(np.abs(times - commute_time)))
+        if uncertainty > self.max_uncertainty:
+            return None
+
+        first_legs = Counter()
+        for i, weight in zip(usable, weights):
+            first_legs[neighborhood.routes[i][1]] += weight
+        walks = [(neighborhood.routes[i][2], w) for i, w in zip(usable, weights)
+                 if neighborhood.routes[i][2] is not None]
+        first_walk = None
+        if walks:
+            first_walk = round(float(np.average([x[0] for x in walks], weights=[x[1] for x in walks])), 1)
+        commute = [round(commute_time, 0), first_legs.most_common(1)[0][0], first_walk]
+        return CommuteEstimate(commute=commute, uncertainty=round(uncertainty, 1),
+                               neighbors=len(usable))
+
+    def get_commute(self, commute_request):
+        """Estimated commute fields for a ``BingCommuteAPICall``, or None.
+
+        Lets the estimator be one of the transit providers in
+        :mod:`deathpledge.api_calls.providers`.
+
+        """
+        # Imported here since bing uses this module
+        from deathpledge.api_calls.bing import BingMapsAPI
+        startcoords = commute_request.url_args['wp.0'].split(',')
+        endcoords = commute_request.url_args['wp.1'].split(',')
+        estimate = self.estimate(startcoords, endcoords, slot=BingMapsAPI.get_time_slot(commute_request))
+        return None if estimate is None else estimate.commute
+
+    def add(self, startcoords, endcoords, commute, slot=None):
+        """Make a commute just fetched from Bing available as a neighbor."""
+        with self._lock:
+            neighborhood = self._get_neighborhood(endcoords, slot)
+            neighborhood.add(tuple(float(x) for x in startcoords), list(commute))
+
+    def log_stats(self):
+        self.logger.info(str(self.stats))
+
+
+_commute_estimator = None
+
+
+def get_commute_estimator(route_cache=None):
+    """Get the estimator shared by every caller using the shared route cache.
+
+    A caller with its own route cache gets its own estimator over that cache.
+    Returns None if estimation is turned off in the keys file with
+    ``Enrichment: commute_estimate: enabled: false``.
+
+    """
+    global _commute_estimator
+    settings = dict(keys.get('Enrichment', {}).get('commute_estimate') or {})
+    if not settings.pop('enabled', True):
+        return None
+    if route_cache is not None and route_cache is not cache.get_route_cache():
+        return CommuteEstimator(route_cache, **settings)
+    if _commute_estimator is None:
+        _commute_estimator = CommuteEstimator(**settings)
+    return _commute_estimator
+
+
+def log_stats():
+    if _commute_estimator is not None:
+        _commute_estimator.log_stats()
@@ -9,7 +9,7 @@ from google.oauth2 import service_account
 from google.auth.transport.requests import Request
 from google.auth.exceptions import TransportError
 
-from deathpledge import database
+from deathpledge import database, resilience, tracing
 
 logger = logging.getLogger(__name__)
 
@@ -183,7 +183,8 @@ def get_google_sheets_api_response(google_creds, sheet_range: str):
     sheet_obj = service.spreadsheets()
     request = sheet_obj.values().get(spreadsheetId=SPREADSHEET_DICT['spreadsheetId'],
                                      range=SPREADSHEET_DICT[sheet_range])
-    response = request.execute()
+    with tracing.span('google_sheets.get', range=sheet_range):
+        response = resilience.get_provider('google_sheets').call(request.execute)
     return response
 
 
@@ -204,7 +205,7 @@ def refresh_url_sheet(google_creds, db_client):
         range=SPREADSHEET_DICT['url_range'],
         majorDimension='ROWS',
         values=url_list)
-    response = service.spreadsheets().values().batchUpdate(
+    request = service.spreadsheets().values().batchUpdate(
         spreadsheetId=SPREADSHEET_DICT['spreadsheetId'],
         body=dict(
             valueInputOption='USER_ENTERED',
@@ -212,7 +213,9 @@ def refresh_url_sheet(google_creds, db_client):
             data=[
                 url_obj
             ])
-    ).execute()
+    )
+    with tracing.span('google_sheets.batch_update', rows=len(url_list)):
+        response = resilience.get_provider('google_sheets').call(request.execute)
     logger.info(response)
 
 
@@ -10,13 +10,12 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from bs4 import BeautifulSoup
-from django.utils.text import slugify
 from collections import namedtuple
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
 import deathpledge
 from deathpledge import scrape2 as scrape
-from deathpledge import classes
+from deathpledge import classes, support, tracing
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +33,7 @@ class HomeScoutWebsite(classes.WebDataSource):
         super().__init__(*args, **kwargs)
         self.signed_in = False
 
+    @tracing.traced()
     def sign_into_website(self):
         """Open website and login to access restricted listings."""
         self.logger.info('Opening browser and signing in')
@@ -84,6 +84,7 @@ class HomeScoutWebsite(classes.WebDataSource):
     def _get_paging_buttons(self):
         return self.webdriver.find_elements_by_class_name('mcl-paging-next')
 
+    @tracing.traced()
     def get_soup_for_url(self, url):
         """Get BeautifulSoup object for a URL.
 
@@ -181,6 +182,7 @@ class HomeScoutSoup(BeautifulSoup):
         super().__init__(*args, **kwargs)
         self.data = {}
 
+    @tracing.traced()
     def scrape_soup(self) -> dict:
         """Scrape all for a single BS4 self object."""
         # Initialize dict with metadata
@@ -285,7 +287,7 @@ class HomeScoutSoup(BeautifulSoup):
 
     @staticmethod
     def _slugify(s):
-        return slugify(s).replace('-', '_')
+        return support.slugify(s).replace('-', '_')
 
     def _get_advanced(self) -> dict:
         """Parse advanced details."""
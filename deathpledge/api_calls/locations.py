@@ -0,0 +1,111 @@
+"""
+Fixed destinations used by every enrichment step, resolved once per run.
+
+Favorite driving places are configured by street address, so they have to be
+geocoded before any home can be routed to them. Rather than geocoding them
+again for every home, the registry resolves them once at startup and saves
+the coordinates next to the API cache, so a later run with the same addresses
+makes no geocode calls at all.
+
+"""
+import json
+import logging
+from collections import namedtuple
+from os import path, makedirs
+
+from deathpledge import keys
+from deathpledge.api_calls import bing, cache
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_PATH = path.join(cache.CACHE_DIR, 'locations.json')
+
+Destination = namedtuple('Destination', 'name addr coords day time')
+
+
+class LocationRegistry(object):
+    """Geocoded work, centerpoint and favorite driving locations.
+
+    Attributes:
+        work_coords (Geocoords): Commute destination.
+        centerpoint (Geocoords): Reference point for tether distance.
+        favorite_driving (dict): Place name to :class:`Destination`.
+
+    Args:
+        locations_config (dict, optional): The ``Locations`` section of the keys
+            file. Defaults to the loaded keys.
+        registry_path (str, optional): Where resolved coordinates are saved.
+            Pass None to keep them in memory only.
+
+    """
+
+    def __init__(self, locations_config=None, registry_path=REGISTRY_PATH):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        self._config = locations_config or keys['Locations']
+        self.registry_path = registry_path
+        self.work_coords = bing.Geocoords._make(self._config['work_coords'].values())
+        self.centerpoint = bing.Geocoords._make(self._config['centerpoint'].values())
+        self.favorite_driving = {}
+
+    def resolve(self, bing_api=None):
+        """Geocode every favorite place not already saved with the same address.
+
+        Args:
+            bing_api (BingMapsAPI, optional): Used for any address not yet saved.
+
+        Returns:
+            LocationRegistry: self, for chaining.
+
+        """
+        saved = self._load()
+        for place, attribs in self._config.get('favorite_driving', {}).items():
+            addr = attribs['addr']
+            saved_place = saved.get(place, {})
+            if saved_place.get('addr') == addr:
+                coords = bing.Geocoords._make(saved_place['coords'])
+            else:
+                bing_api = bing_api or bing.BingMapsAPI()
+                geocoder = bing.BingGeocoderAPICall(address=addr)
+                try:
+                    coords = bing_api.get_geocoords(geocoder=geocoder)
+                except Exception:
+                    self.logger.exception(f"Could not geocode favorite place '{place}'")
+                    continue
+            self.favorite_driving[place] = Destination(
+                name=place, addr=addr, coords=coords,
+                day=attribs.get('day'), time=attribs.get('time')
+            )
+        self._save()
+        self.logger.info(f'{len(self.favorite_driving)} favorite places resolved')
+        return self
+
+    def _load(self):
+        if self.registry_path is None:
+            return {}
+        try:
+            with open(self.registry_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save(self):
+        if self.registry_path is None:
+            return
+        makedirs(path.dirname(self.registry_path), exist_ok=True)
+        saved = {
+            place: dict(addr=dest.addr, coords=list(dest.coords))
+            for place, dest in self.favorite_driving.items()
+        }
+        with open(self.registry_path, 'w') as f:
+            json.dump(saved, f, indent=2)
+
+
+_registry = None
+
+
+def get_registry():
+    """Get the registry for this run, resolving it on first use."""
+    global _registry
+    if _registry is None:
+        _registry = LocationRegistry().resolve()
+    return _registry
@@ -0,0 +1,150 @@
+"""
+Local table of metro stations for instant nearest-station lookups.
+
+The station set is small and rarely changes, so instead of asking Bing's
+LocalSearch for the stations near every home, the complete station list is
+kept in a table in the API cache and indexed with a KD-tree. The table is
+seeded once, from ``Metro: stations_csv`` in the keys file if set (see
+:meth:`MetroStationIndex.load_csv`), or else by sweeping LocalSearch over the
+area (see :meth:`BingMapsAPI.sweep_metro_stations
+<deathpledge.api_calls.bing.BingMapsAPI.sweep_metro_stations>`), and then
+answers for every home without an API call.
+
+Only complete lists go in the table. LocalSearch results for a single home
+are just the stations near it, so they are never added.
+
+"""
+import csv
+import logging
+import threading
+
+from deathpledge import keys, spatial, support
+from deathpledge.api_calls import cache
+
+logger = logging.getLogger(__name__)
+
+# Stations closer than this are one station listed under two names, like
+# LocalSearch's name and the one in a station list
+DUPLICATE_MILES = 0.05
+
+
+class MetroStationIndex(object):
+    """Metro station names and coordinates with a spatial index.
+
+    Args:
+        station_table (cache.SQLiteCache, optional): Where the station list is
+            stored, as ``{name: [lat, lon]}``. Defaults to the on-disk API cache.
+        coverage_miles (float, optional): A home whose nearest station is
+            farther than this is outside the list's area, and should be looked
+            up with LocalSearch instead. Defaults to 2 miles.
+
+    Attributes:
+        seeded (bool): Whether the table holds a station list yet.
+        sweep_tried (bool): Whether seeding by LocalSearch sweep has been tried.
+
+    """
+
+    def __init__(self, station_table=None, coverage_miles=2.0):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        if station_table is None:
+            station_table = cache.SQLiteCache(table='metro_station_list')
+        self.station_table = station_table
+        self.coverage_miles = coverage_miles
+        self.names = []
+        self.sweep_tried = False
+        self._index = None
+        self._lock = threading.Lock()
+        self._rebuild()
+
+    @property
+    def seeded(self):
+        return len(self.names) > 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def _rebuild(self):
+        stations = dict(self.station_table.items())
+        self.names = list(stations)
+        self._index = spatial.PointIndex([stations[name] for name in self.names])
+
+    def seed(self, stations):
+        """Add a complete station list to the table and rebuild the index.
+
+        A station already in the table, under its name or under another name
+        at the same place, keeps the entry it has.
+
+        Args:
+            stations (dict): Station name to (lat, lon).
+
+        """
+        with self._lock:
+            kept = dict(zip(self.names, self._index.coords.tolist()))
+            new_stations = {}
+            for name, coords in stations.items():
+                coords = [float(x) for x in coords]
+                if name in kept or _near_any(coords, kept.values()):
+                    continue
+                kept[name] = new_stations[name] = coords
+            self.station_table.set_many(new_stations.items())
+            self._rebuild()
+        self.logger.info(f'{len(new_stations)} of {len(stations)} stations added, {len(self)} in table')
+
+    def load_csv(self, filepath):
+        """Seed the table from a CSV with ``name``, ``lat`` and ``lon`` columns.
+
+        The CSV must list every station, so that the nearest station in the
+        table is the nearest station.
+
+        """
+        with open(filepath, 'r', newline='') as f:
+            stations = {
+                row['name'].upper(): (float(row['lat']), float(row['lon']))
+                for row in csv.DictReader(f)
+            }
+        self.seed(stations)
+
+    def nearest(self, coords, k=2):
+        """Get the *k* stations nearest a location, if the table covers it.
+
+        Args:
+            coords (Geocoords): Location to search from.
+            k (int): Number of stations.
+
+        Returns:
+            list: (name, (lat, lon)) tuples, nearest first, or None if the table
+                hasn't been seeded, has fewer than *k* stations or the nearest is
+                beyond coverage.
+
+        """
+        with self._lock:
+            names, index = self.names, self._index
+        if not names:
+            return None
+        miles, idx = index.nearest(coords[0], coords[1], k=k)
+        if len(idx) < k or miles[0] > self.coverage_miles:
+            return None
+        return [(names[i], tuple(index.coords[i])) for i in idx]
+
+
+def _near_any(coords, others):
+    return any(support.haversine(coords, other) < DUPLICATE_MILES for other in others)
+
+
+_station_index = None
+
+
+def get_station_index():
+    """Get the station index shared by every caller in this process.
+
+    Seeded from ``Metro: stations_csv`` in the keys file, if set. Otherwise
+    it is seeded by a LocalSearch sweep the first time it is needed.
+
+    """
+    global _station_index
+    if _station_index is None:
+        _station_index = MetroStationIndex()
+        stations_csv = (keys.get('Metro') or {}).get('stations_csv')
+        if stations_csv:
+            _station_index.load_csv(stations_csv)
+    return _station_index
@@ -0,0 +1,321 @@
+"""
+Geocodes and routes from whichever provider can answer, in order of preference.
+
+Bing, Citymapper, the local engines (commute estimates, GTFS transit and the
+road graph) and the offline stand-in all answer the same requests as
+:class:`~deathpledge.api_calls.bing.BingMapsAPI`: ``get_geocoords``,
+``get_commute``, ``get_walk_time`` and ``get_driving_info``, each taking the
+matching Bing request object. A :class:`ProviderChain` has a priority list of
+providers for each field and implements the same methods, so it drops in
+wherever a ``BingMapsAPI`` is used.
+
+For each request the chain looks in the shared geocode and route caches,
+then asks the providers in order. A provider that errors, returns nothing,
+or takes longer than the timeout is skipped for the next, so a slow or
+failing provider never stalls enrichment. A call skipped for being slow
+can't be stopped, but makes no more retries once the timeout is up. Results
+from remote providers are written to the shared caches. Local engines are
+cheap to ask again, and approximate, so their results are not cached.
+
+Priorities come from the ``Providers`` section of the keys file, e.g.::
+
+    Providers:
+      timeout: 20
+      geocode: [bing]
+      transit: [estimate, gtfs, bing, citymapper]
+      walk: [bing]
+      drive: [roads, bing]
+
+"""
+import logging
+import time
+from concurrent import futures
+
+import requests
+
+from deathpledge import keys, metrics, support, resilience
+from deathpledge.api_calls import bing, cache, citymapper, commute_estimate, standin
+
+# Local routers need pandas and scipy, so they load only when configured
+raptor = support.lazy_import('deathpledge.routing.raptor')
+roads = support.lazy_import('deathpledge.routing.roads')
+
+logger = logging.getLogger(__name__)
+
+# Method each field is answered by, and the type of its answer
+FIELD_METHODS = {
+    'geocode': 'get_geocoords',
+    'transit': 'get_commute',
+    'walk': 'get_walk_time',
+    'drive': 'get_driving_info',
+}
+ROUTE_TYPES = {'transit': bing.Commute, 'walk': bing.Walk, 'drive': bing.Drive}
+
+DEFAULT_PRIORITIES = {
+    'geocode': ['bing'],
+    'transit': ['estimate', 'bing'],
+    'walk': ['bing'],
+    'drive': ['roads', 'bing'],
+}
+DEFAULT_TIMEOUT = 30.0
+
+# Failures that mean "ask the next provider"
+FALLBACK_ERRORS = (support.BadResponse, resilience.QuotaExceeded, requests.RequestException,
+                   KeyError, IndexError, ValueError)
+
+_executor = futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix='provider')
+
+
+class NoProvider(support.BadResponse):
+    """Every provider for a field failed or had no answer."""
+    pass
+
+
+class BingProvider(object):
+    """Bing Maps as one provider among several.
+
+    Requests go straight to Bing; the chain does the caching.
+
+    Args:
+        bing_api (bing.BingMapsAPI, optional): Defaults to a new instance, made on
+            first use.
+
+    """
+    name = 'bing'
+    cache_results = True
+
+    def __init__(self, bing_api=None):
+        self._bing_api = bing_api
+
+    @property
+    def bing_api(self):
+        if self._bing_api is None:
+            self._bing_api = self._make_api()
+        return self._bing_api
+
+    def _make_api(self):
+        return bing.BingMapsAPI()
+
+    def get_geocoords(self, geocoder):
+        return self.bing_api._fetch_geocoords(geocoder)
+
+    def get_commute(self, commute_request):
+        return self.bing_api._fetch_commute(commute_request)
+
+    def get_walk_time(self, walk_request):
+        return self.bing_api._fetch_walk_time(walk_request)
+
+    def get_driving_info(self, driving_request):
+        return self.bing_api._fetch_driving_info(driving_request)
+
+    def get_distance_matrix(self, matrix_request):
+        return self.bing_api.get_distance_matrix(matrix_request)
+
+
+class StandInProvider(BingProvider):
+    """The offline stand-in for Bing, answered in-process.
+
+    Its answers are made up, so they are never cached.
+
+    """
+    name = 'standin'
+    cache_results = False
+
+    def __init__(self, server=None):
+        super().__init__()
+        self.server = server
+
+    def _make_api(self):
+        return standin.StandInMapsAPI(server=self.server)
+
+
+def make_provider(name):
+    """Provider with a given name, or None if it isn't configured.
+
+    Names are ``bing``, ``standin``, ``citymapper``, ``estimate`` (commutes
+    interpolated from cached ones), ``gtfs`` and ``roads``.
+
+    """
+    if name == 'bing':
+        return BingProvider()
+    if name == 'standin':
+        return StandInProvider()
+    if name == 'citymapper':
+        return citymapper.CitymapperAPI()
+    if name == 'estimate':
+        return commute_estimate.get_commute_estimator()
+    if name == 'gtfs':
+        return raptor.get_transit_router()
+    if name == 'roads':
+        return roads.get_road_router()
+    raise ValueError(f"Unknown provider '{name}'")
+
+
+class ProviderChain(object):
+    """Answers Bing-style requests from the first provider that can.
+
+    Args:
+        priorities (dict): {field: [provider, ...]} in order of preference, where
+            field is one of :data:`FIELD_METHODS`. Providers without the field's
+            method are left out.
+        timeout (float, optional): Seconds to wait for one provider before moving
+            on to the next. Defaults to 30.
+        geocode_cache (cache.GeocodeCache, optional): Defaults to the shared one.
+        route_cache (cache.RouteCache, optional): Defaults to the shared one.
+
+    """
+
+    def __init__(self, priorities, timeout=DEFAULT_TIMEOUT, geocode_cache=None, route_cache=None):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        self.priorities = {
+            field: [x for x in providers if hasattr(x, FIELD_METHODS[field])]
+            for field, providers in priorities.items()
+        }
+        self.timeout = timeout
+        self._geocode_cache = geocode_cache
+        self._route_cache = route_cache
+
+    @property
+    def geocode_cache(self):
+        if self._geocode_cache is None:
+            return cache.get_geocode_cache()
+        return self._geocode_cache
+
+    @property
+    def route_cache(self):
+        if self._route_cache is None:
+            return cache.get_route_cache()
+        return self._route_cache
+
+    def __repr__(self):
+        names = {field: [_name(x) for x in providers] for field, providers in self.priorities.items()}
+        return f'<ProviderChain {names}>'
+
+    def get_geocoords(self, geocoder):
+        address = geocoder.url_args.get('addressLine')
+        zip_code = geocoder.url_args.get('postalCode')
+        cached_coords = self.geocode_cache.get_coords(address, zip_code)
+        if cached_coords is not None:
+            return bing.Geocoords._make(cached_coords)
+        geocoords, provider, _ = self._first_answer('geocode', geocoder)
+        geocoords = bing.Geocoords._make(geocoords)
+        if provider.cache_results:
+            self.geocode_cache.set_coords(address, zip_code, geocoords)
+        return geocoords
+
+    def get_commute(self, commute_request):
+        return self._get_route('transit', commute_request)
+
+    def get_walk_time(self, walk_request):
+        return self._get_route('walk', walk_request)
+
+    def get_driving_info(self, driving_request):
+        return self._get_route('drive', driving_request)
+
+    def matrix_router(self):
+        """Local engine to route batches of drives with, if it comes before Bing.
+
+        Returns:
+            The first drive provider, if it answers distance matrix requests and
+                isn't a remote provider; otherwise None, for Bing.
+
+        """
+        drive_providers = self.priorities.get('drive') or [None]
+        first = drive_providers[0]
+        if hasattr(first, 'get_distance_matrix') and not first.cache_results:
+            return first
+        return None
+
+    def _get_route(self, field, route_request):
+        startcoords = route_request.url_args['wp.0'].split(',')
+        endcoords = route_request.url_args['wp.1'].split(',')
+        slot = bing.BingMapsAPI.get_time_slot(route_request)
+        cached_route = self.route_cache.get_route(field, startcoords, endcoords, slot=slot)
+        if cached_route is not None:
+            return ROUTE_TYPES[field]._make(cached_route)
+
+        route, provider, latency = self._first_answer(field, route_request)
+        route = ROUTE_TYPES[field]._make(route)
+        if provider.cache_results:
+            self.route_cache.set_route(field, startcoords, endcoords, route, slot=slot,
+                                       latency=latency)
+            # Providers that learn from real routes, like the commute estimator
+            for learner in self.priorities[field]:
+                if learner is not provider and hasattr(learner, 'add'):
+                    learner.add(startcoords, endcoords, route, slot=slot)
+        return route
+
+    def _first_answer(self, field, request):
+        """Ask each provider for a field in turn until one answers.
+
+        Returns:
+            tuple: (answer, provider that gave it, seconds it took)
+
+        Raises:
+            resilience.QuotaExceeded: If no provider answered and one was out of quota.
+            NoProvider: If no provider answered.
+
+        """
+        errors = []
+        for provider in self.priorities.get(field, []):
+            method = getattr(provider, FIELD_METHODS[field])
+            start = time.perf_counter()
+            future = _executor.submit(self._call_before_timeout, method, request)
+            try:
+                answer = future.result(timeout=self.timeout)
+            except futures.TimeoutError:
+                future.cancel()
+                self.logger.warning(f"'{_name(provider)}' took over {self.timeout}s for {field}; "
+                                    f"trying the next provider")
+                metrics.counter('deathpledge_provider_abandoned_total',
+                                'Provider calls given up on for taking too long, by field',
+                                ['provider', 'field']).inc(provider=_name(provider), field=field)
+                errors.append(TimeoutError(_name(provider)))
+                continue
+            except FALLBACK_ERRORS as e:
+                self.logger.warning(f"'{_name(provider)}' failed for {field} ({e!r}); "
+                                    f"trying the next provider")
+                errors.append(e)
+                continue
+            if answer is not None:
+                return answer, provider, time.perf_counter() - start
+        for error in errors:
+            if isinstance(error, resilience.QuotaExceeded):
+                raise error
+        raise NoProvider(f'No provider could answer the {field} request')
+
+
+    def _call_before_timeout(self, method, request):
+        with resilience.deadline(self.timeout):
+            return method(request)
+
+
+def _name(provider):
+    return getattr(provider, 'name', type(provider).__name__)
+
+
+_provider_chain = None
+
+
+def get_provider_chain():
+    """Get the chain of providers configured in the keys file.
+
+    Providers that aren't configured, like ``roads`` without a road graph, are
+    left out of each list.
+
+    """
+    global _provider_chain
+    if _provider_chain is None:
+        settings = dict(keys.get('Providers') or {})
+        timeout = settings.pop('timeout', DEFAULT_TIMEOUT)
+        made = {}
+        priorities = {}
+        for field in FIELD_METHODS:
+            names = settings.get(field) or DEFAULT_PRIORITIES[field]
+            for name in names:
+                if name not in made:
+                    made[name] = make_provider(name)
+            priorities[field] = [made[name] for name in names if made[name] is not None]
+        _provider_chain = ProviderChain(priorities, timeout=timeout)
+        logger.info(f'Using {_provider_chain}')
+    return _provider_chain
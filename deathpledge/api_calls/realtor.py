@@ -14,7 +14,7 @@ from bs4 import BeautifulSoup
 
 import deathpledge
 from deathpledge import scrape2 as scrape
-from deathpledge import classes
+from deathpledge import classes, tracing
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +37,7 @@ class RealtorWebsite(classes.WebDataSource):
         search_button.click()
         self.logger.debug('stop here')
 
+    @tracing.traced()
     def get_soup_for_url(self, url):
         """Get BeautifulSoup object for a URL.
 
@@ -72,6 +73,7 @@ class RealtorSoup(BeautifulSoup):
         super().__init__(*args, **kwargs)
         self.data = {}
 
+    @tracing.traced()
     def scrape_soup(self) -> dict:
         """Scrape all for a single BS4 self object."""
         # Initialize dict with metadata
@@ -0,0 +1,326 @@
+"""
+Local stand-in for the Bing Maps REST API, for offline tests and benchmarks.
+
+The stand-in serves the Locations, Routes (Transit, Walking, Driving and
+DistanceMatrix) and LocalSearch endpoints over HTTP from a background thread.
+A request is answered with a recorded response when one matches it, and
+otherwise with a synthetic response derived from the request's coordinates,
+so the same request always gets the same answer. Latency and error rate are
+configurable, so concurrency, caching and retries can be measured without
+touching the real API or spending its quota.
+
+Example::
+
+    with StandInBingServer(latency=0.05) as server:
+        previous = bing.set_base_url(server.base_url)
+        ...  # enrich homes
+        bing.set_base_url(previous)
+
+"""
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from deathpledge import support
+from deathpledge.api_calls import bing
+
+logger = logging.getLogger(__name__)
+
+# Where synthetic geocodes land: a box around Washington, DC
+GEOCODE_CENTER = (38.89, -77.03)
+GEOCODE_SPREAD = 0.1
+
+# Synthetic travel speeds, in miles per hour, and ratio of route to straight-line distance
+WALK_MPH = 3.0
+BUS_MPH = 12.0
+DRIVE_MPH = 25.0
+DETOUR_FACTOR = 1.3
+
+
+def request_key(endpoint, params):
+    """Canonical form of a request, used to match it to a recorded response.
+
+    The API key is left out, so recordings made with one key replay for any.
+
+    Examples:
+        >>> request_key('Routes/Walking', {'wp.1': '1,2', 'wp.0': '3,4', 'key': 'abc'})
+        'Routes/Walking?wp.0=3,4&wp.1=1,2'
+
+    """
+    query = '&'.join(f'{k}={v}' for k, v in sorted(params.items()) if k != 'key')
+    return f"{endpoint.strip('/')}?{query}"
+
+
+def load_recordings(filepath):
+    """Read recorded responses saved with :func:`save_recordings`."""
+    with open(filepath, 'r') as f:
+        return json.load(f)
+
+
+def save_recordings(filepath, recordings):
+    """Save recorded responses, as ``{request key: response JSON}``."""
+    with open(filepath, 'w') as f:
+        json.dump(recordings, f, indent=2, sort_keys=True)
+
+
+def record_response(recordings, api_call, response_json):
+    """Add a real Bing response to a set of recordings.
+
+    Args:
+        recordings (dict): Recordings to add to.
+        api_call (bing.BingAPICall): Request the response was for.
+        response_json (dict): Response body from Bing.
+
+    """
+    recordings[request_key(api_call.endpoint, api_call.url_args)] = response_json
+
+
+class StandInBingServer(object):
+    """HTTP server answering Bing Maps REST requests locally.
+
+    Attributes:
+        base_url (str): REST root to pass to :func:`bing.set_base_url`.
+        requests (list): Request key of every request received, in order.
+
+    Args:
+        recordings (dict, optional): Recorded responses by :func:`request_key`,
+            replayed ahead of synthetic ones.
+        latency (float or tuple, optional): Seconds to wait before answering, or a
+            (min, max) range to draw from. Defaults to 0.
+        error_rate (float, optional): Fraction of requests answered with
+            *error_status* instead of a route. Defaults to 0.
+        error_status (int, optional): Status code for failed requests. Defaults to 503.
+        seed (int, optional): Seed for latency and error draws.
+        port (int, optional): Port to listen on. Defaults to any free port.
+
+    """
+
+    def __init__(self, recordings=None, latency=0.0, error_rate=0.0, error_status=503,
+                 seed=None, port=0):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        self.recordings = recordings or {}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/REST/V1'
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name='bing-standin', daemon=True
+        )
+        self._thread.start()
+        self.logger.info(f'Serving stand-in Bing Maps API at {self.base_url}')
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body = server.respond(self.path)
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                server.logger.debug(format % args)
+
+        return Handler
+
+    def respond(self, url_path):
+        """Answer a request path like ``/REST/V1/Routes/Walking?wp.0=...``.
+
+        Returns:
+            tuple: (HTTP status code, response JSON)
+
+        """
+        url_parts = urlsplit(url_path)
+        endpoint = url_parts.path.split('/REST/V1/', 1)[-1].strip('/')
+        params = dict(parse_qsl(url_parts.query))
+        key = request_key(endpoint, params)
+        with self._lock:
+            self.requests.append(key)
+            delay = self._draw_latency()
+            failed = self._random.random() < self.error_rate
+        time.sleep(delay)
+        if failed:
+            return self.error_status, _error_body(self.error_status, 'Stand-in error')
+        if key in self.recordings:
+            return 200, self.recordings[key]
+        if endpoint not in SYNTHETIC_RESPONSES:
+            return 404, _error_body(404, f"No stand-in for endpoint '{endpoint}'")
+        try:
+            return 200, SYNTHETIC_RESPONSES[endpoint](params)
+        except (KeyError, ValueError):
+            return 400, _error_body(400, 'Missing or invalid parameters')
+
+    def _draw_latency(self):
+        if isinstance(self.latency, (tuple, list)):
+            return self._random.uniform(*self.latency)
+        return self.latency
+
+
+class StandInMapsAPI(bing.BingMapsAPI):
+    """Bing Maps client answered in-process by a stand-in, with no HTTP at all.
+
+    Used as the offline provider in :mod:`deathpledge.api_calls.providers`.
+
+    Args:
+        server (StandInBingServer, optional): Whose recordings, latency and error
+            rate to use. It doesn't need to be started. Defaults to a new one.
+        **kwargs: Passed to :class:`bing.BingMapsAPI`.
+
+    """
+
+    def __init__(self, server=None, **kwargs):
+        super().__init__(**kwargs)
+        self.server = server or StandInBingServer()
+
+    def _get_api_response(self, api_call):
+        query = urlencode(api_call.url_args, safe=',;:')
+        status, body = self.server.respond(f'/REST/V1/{api_call.endpoint}?{query}')
+        if status != 200:
+            raise support.BadResponse(f'Stand-in answered {status}: {body["errorDetails"]}',
+                                      status_code=status)
+        return body
+
+
+def _error_body(status, message):
+    return {'statusCode': status, 'errorDetails': [message], 'resourceSets': []}
+
+
+def _resource_sets(*resources):
+    return {'statusCode': 200, 'resourceSets': [{'estimatedTotal': len(resources),
+                                                 'resources': list(resources)}]}
+
+
+def _parse_point(value):
+    lat, lon = value.split(',')
+    return float(lat), float(lon)
+
+
+def _route_miles(start, end):
+    return support.haversine(start, end) * DETOUR_FACTOR
+
+
+def _synthetic_geocode(params):
+    """Coordinates scattered deterministically around the DC area by address."""
+    address = f"{params['addressLine']}|{params.get('postalCode', '')}"
+    digest = hashlib.sha1(address.encode('utf-8')).digest()
+    lat_offset, lon_offset = [(b / 255 - 0.5) * 2 * GEOCODE_SPREAD for b in digest[:2]]
+    coords = [round(GEOCODE_CENTER[0] + lat_offset, 6), round(GEOCODE_CENTER[1] + lon_offset, 6)]
+    return _resource_sets({
+        'name': params['addressLine'],
+        'point': {'type': 'Point', 'coordinates': coords},
+        'geocodePoints': [{'type': 'Point', 'coordinates': coords, 'usageTypes': ['Route']}],
+    })
+
+
+def _synthetic_transit(params):
+    """A walk to a bus, the bus, and a walk to the destination."""
+    miles = _route_miles(_parse_point(params['wp.0']), _parse_point(params['wp.1']))
+    walk_to_stop = round(min(miles, 0.25) / WALK_MPH * 3600)
+    bus = round(max(miles - 0.35, 0) / BUS_MPH * 3600)
+    walk_from_stop = round(min(max(miles - 0.25, 0), 0.1) / WALK_MPH * 3600)
+    return _resource_sets({
+        'travelDistance': round(miles, 3),
+        'travelDuration': walk_to_stop + bus + walk_from_stop,
+        'routeLegs': [{'itineraryItems': [
+            {'iconType': 'Walk', 'travelDuration': walk_to_stop},
+            {'iconType': 'Bus', 'travelDuration': bus},
+            {'iconType': 'Walk', 'travelDuration': walk_from_stop},
+        ]}],
+    })
+
+
+def _synthetic_walk(params):
+    miles = _route_miles(_parse_point(params['wp.0']), _parse_point(params['wp.1']))
+    return _resource_sets({
+        'travelDistance': round(miles, 3),
+        'travelDuration': round(miles / WALK_MPH * 3600),
+    })
+
+
+def _synthetic_drive(params):
+    miles = _route_miles(_parse_point(params['wp.0']), _parse_point(params['wp.1']))
+    return _resource_sets({
+        'travelDistance': round(miles, 3),
+        'travelDuration': round(miles / DRIVE_MPH * 3600),
+    })
+
+
+def _synthetic_distance_matrix(params):
+    origins = [_parse_point(x) for x in params['origins'].split(';')]
+    destinations = [_parse_point(x) for x in params['destinations'].split(';')]
+    results = []
+    for i, origin in enumerate(origins):
+        for j, destination in enumerate(destinations):
+            miles = _route_miles(origin, destination)
+            results.append({
+                'originIndex': i, 'destinationIndex': j,
+                'travelDistance': round(miles, 3),
+                'travelDuration': round(miles / DRIVE_MPH * 3600),
+            })
+    return _resource_sets({'results': results})
+
+
+def _synthetic_metro_search(params):
+    """Stations a fixed distance north-east and south-west of the search location.
+
+    The location is ``userLocation``, or the middle of ``userCircularMapView``.
+
+    """
+    if 'userLocation' in params:
+        lat, lon = _parse_point(params['userLocation'])
+    else:
+        lat, lon, _radius = (float(x) for x in params['userCircularMapView'].split(','))
+    stations = []
+    for i, offset in enumerate([0.004, -0.007][:int(params.get('maxResults', 2))]):
+        coords = [round(lat + offset, 6), round(lon + offset, 6)]
+        name = f'STANDIN STATION {coords[0]:.3f} {coords[1]:.3f}'
+        stations.append({
+            'name': name,
+            'Website': f'https://www.wmata.com/rider-guide/stations/standin-{i}.cfm',
+            'point': {'type': 'Point', 'coordinates': coords},
+        })
+    return _resource_sets(*stations)
+
+
+SYNTHETIC_RESPONSES = {
+    'Locations': _synthetic_geocode,
+    'Routes/Transit': _synthetic_transit,
+    'Routes/Walking': _synthetic_walk,
+    'Routes/Driving': _synthetic_drive,
+    'Routes/DistanceMatrix': _synthetic_distance_matrix,
+    'LocalSearch': _synthetic_metro_search,
+}
@@ -1,47 +1,25 @@
 """Clean a dictionary of listing details."""
 
 import logging
+import os
+import threading
 import usaddress
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from concurrent import futures
 
-from deathpledge import TIMEFORMAT, support
+from deathpledge import TIMEFORMAT, support, schema
+from deathpledge.api_calls import cache
 
 logger = logging.getLogger(__name__)
 
+# Parsed addresses kept in memory, in front of the on-disk cache
+ADDRESS_LRU_SIZE = 4096
+# Fewest uncached addresses worth starting a process pool for
+MIN_POOL_ADDRESSES = 500
 
-def split_comma_delimited_fields(home):
-    """Create lists out of comma-separated values in certain fields."""
-    field_list = [
-        'hoa_condo_coop_amenities',
-        'hoa_condo_coop_fee_includes',
-        'appliances',
-        'interior_features',
-        'room_list',
-        'exterior_features',
-        'garage_feature',
-        'lot_features',
-        'basement_type',
-        'wall_ceiling_types',
-        'accessibility_features',
-        'utilities',  # may have permanently moved
-        'property_condition',
-        'security_features',
-        'utilities',
-    ]
-    for key in field_list:
-        try:
-            listlike_field = home[key]
-        except KeyError:  # field not in dict
-            continue
-        try:
-            value_list = listlike_field.split(', ')
-        except AttributeError:  # listlike_field is not a string
-            continue
-        # Remove 'and' in final element
-        value_list[-1] = value_list[-1].replace('and ', '')
-        # Replace original value
-        home[key] = value_list
-        logger.debug(f'Field {key} split into list items')
+COMMA_DELIMITED_FIELDS = schema.names('list')
+NUMERIC_FIELDS = schema.names('number')
+FEE_FIELDS = schema.names('fee')
 
 
 def parse_number(s):
@@ -51,80 +29,209 @@ def parse_number(s):
         return s
 
 
-def convert_numbers(home):
-    """Parse a float from strings containing currencies and commas."""
-    numeric_field_list = [
-        # Currencies
-        'list_price',
-        'sale_price',
-        'price_per_sqft',
-        'price_sqft',
-        'total_taxes',
-        'county_tax',
-        'tax_value',
-        'city_tax',
-        'school_tax',
-        'estimated_value',
-        # Integers
-        'beds',
-        'sqft',
-        'lot_size_sqft',
-        'tax_year',
-        # Floats
-        'baths',
-        'lot_size_acres',
-    ]
-    for key in numeric_field_list:
-        try:
-            val = home[key]
-        except KeyError:
-            continue
-        else:
-            try:
-                home[key] = parse_number(val)
-            except AttributeError:
-                continue
-            else:
-                logger.debug(f'Field {key} converted to number')
-
-
-def split_fee_frequency(home):
-    """Parses HOA/Co-op fee and frequency."""
-    fee_fields = ['hoa_fee', 'condocoop_fee']
-    for key in fee_fields:
-        try:
-            val = home[key]
-        except KeyError:
-            continue
-        try:
-            fee, freq = val.split('/')
-        except (AttributeError, ValueError):
-            fee = val
-        else:
-            home[f'{key}_frequency'] = freq
-            logger.debug(f'Field {key} split and converted')
-        home[key] = parse_number(fee)
-
-
-def parse_address(home):
-    """Split address into parsed fields."""
-    full_address = home['full_address']
+def _tag_address(full_address):
     addr_tuples = usaddress.parse(full_address)
     parsed = defaultdict(list)  # format as proper dict
     for v, k in addr_tuples:
         v = v.replace(',', '')  # remove comma from city name
         parsed[k].append(v)  # for multi-word values belonging to same key
-    parsed = {k: ' '.join(v) for k, v in parsed.items()}
-    home['parsed_address'] = parsed
+    return {k: ' '.join(v) for k, v in parsed.items()}
 
 
-def parse_homescout_date(home):
-    """Convert date when added to homescout."""
-    date_added = home['new_on_homescout']
-    parsed_datetime = support.coerce_date_string_to_date(date_added)
-    formatted_datetime = parsed_datetime.strftime(TIMEFORMAT)
-    home['new_on_homescout'] = formatted_datetime
+def _tag_address_or_none(full_address):
+    """For the process pool, where one bad address shouldn't fail the batch."""
+    try:
+        return _tag_address(full_address)
+    except Exception:
+        return None
+
+
+class _LRU(object):
+    """Most recently used parsed addresses, in memory."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_address_lru = _LRU(ADDRESS_LRU_SIZE)
+
+
+def _parsed_address(full_address):
+    """Address components, from memory, then the on-disk cache, then the tagger."""
+    key = cache.AddressCache.make_key(full_address)
+    parsed = _address_lru.get(key)
+    if parsed is None:
+        address_cache = cache.get_address_cache()
+        parsed = address_cache.get(key)
+        if parsed is None:
+            parsed = _tag_address(key)
+            address_cache.set(key, parsed)
+        _address_lru.put(key, parsed)
+    return dict(parsed)
+
+
+def parse_addresses(addresses, processes=None):
+    """Parse many addresses at once, e.g. for a backfill.
+
+    Cached addresses are looked up as usual. If enough are left over, they are
+    tagged across a pool of processes, then all saved to the on-disk cache at
+    once.
+
+    Args:
+        addresses (list): Full addresses.
+        processes (int, optional): Size of the process pool. Defaults to one per
+            CPU. Pass 1 to parse in this process.
+
+    Returns:
+        list: Parsed components for each address, in order, or None for an
+            address that couldn't be parsed.
+
+    """
+    keys = [cache.AddressCache.make_key(x) for x in addresses]
+    address_cache = cache.get_address_cache()
+    parsed = {}
+    for key in dict.fromkeys(keys):
+        parsed[key] = _address_lru.get(key) or address_cache.get(key)
+    misses = [key for key, value in parsed.items() if value is None]
+    if len(misses) >= MIN_POOL_ADDRESSES and processes != 1:
+        with futures.ProcessPoolExecutor(max_workers=processes) as pool:
+            chunksize = max(1, len(misses) // (4 * (processes or os.cpu_count() or 1)))
+            tagged = list(pool.map(_tag_address_or_none, misses, chunksize=chunksize))
+    else:
+        tagged = [_tag_address_or_none(key) for key in misses]
+    address_cache.set_many((key, value) for key, value in zip(misses, tagged) if value is not None)
+    parsed.update(zip(misses, tagged))
+    logger.debug(f'Parsed {len(misses)} of {len(parsed)} distinct addresses, the rest were cached')
+    for key, value in parsed.items():
+        if value is not None:
+            _address_lru.put(key, value)
+    return [None if parsed[key] is None else dict(parsed[key]) for key in keys]
+
+
+def _format_homescout_date(date_added):
+    parsed_datetime = support.coerce_date_string_to_date(date_added, source='new_on_homescout')
+    return parsed_datetime.strftime(TIMEFORMAT)
+
+
+def _clean_list(key, value):
+    try:
+        value_list = value.split(', ')
+    except AttributeError:  # already a list
+        return {}
+    value_list[-1] = value_list[-1].replace('and ', '')
+    return {key: value_list}
 
 
-def convert_status_case(home):
-    home['status'] = home['status'].title()
+def _clean_fee(key, value):
+    try:
+        fee, freq = value.split('/')
+    except (AttributeError, ValueError):
+        return {key: parse_number(value)}
+    return {f'{key}_frequency': freq, key: parse_number(fee)}
+
+
+# How each kind of field in the schema is cleaned: (field, value) -> {field: cleaned value}
+KIND_CLEANERS = {
+    'number': lambda key, value: {key: parse_number(value)},
+    'fee': _clean_fee,
+    'list': _clean_list,
+    'address': lambda key, value: {'parsed_address': _parsed_address(value)},
+    'date': lambda key, value: {key: _format_homescout_date(value)},
+    'status': lambda key, value: {key: value.title()},
+}
+FIELD_CLEANERS = {
+    field.name: KIND_CLEANERS[field.kind] for field in schema.FIELDS if field.kind in KIND_CLEANERS
+}
+
+
+def clean_batch(homes):
+    """Clean many homes at once, with the same result as cleaning each in turn.
+
+    Works down one field at a time across every home, rather than one home at
+    a time, and cleans each distinct value of a field only once: a batch of
+    listings shares a handful of bed counts, statuses and dates. Values that
+    fail to clean are cleaned again by the home itself, so failures are
+    logged and raised just as
+    :meth:`Home.clean <deathpledge.classes.Home.clean>` would.
+
+    Args:
+        homes (list): Homes to clean in place. Each needs the ``clean_field``
+            and ``check_required_fields`` methods of
+            :class:`deathpledge.classes.Home`.
+
+    Raises:
+        Whatever ``Home.clean`` would raise, for the same home. Homes before it
+            are cleaned and homes after it are untouched, as in a loop.
+
+    """
+    logger.debug(f'Cleaning {len(homes)} homes')
+    # Nothing is changed until every field is worked out; None means the home cleans it
+    cleaned = [{} for _ in homes]
+    for key, cleaner in FIELD_CLEANERS.items():
+        results = {}
+        preparer = BATCH_PREPARERS.get(schema.FIELDS_BY_NAME[key].kind)
+        if preparer is not None:
+            results = preparer(key, list(dict.fromkeys(
+                home[key] for home in homes if type(home.get(key)) is str
+            )))
+        for i, home in enumerate(homes):
+            value = home.get(key, _MISSING)
+            if value is _MISSING:
+                continue
+            if type(value) is not str:
+                cleaned[i][key] = _try_clean(cleaner, key, value)
+                continue
+            if value not in results:
+                results[value] = _try_clean(cleaner, key, value)
+            cleaned[i][key] = results[value]
+
+    for home, home_cleaned in zip(homes, cleaned):
+        for key in list(home):
+            if key not in home_cleaned:
+                continue
+            result = home_cleaned[key]
+            if result is None:
+                home.clean_field(key)
+                continue
+            # Homes with the same value must not share lists and dicts
+            for field, value in result.items():
+                home[field] = value.copy() if type(value) in (list, dict) else value
+        home.check_required_fields()
+
+
+def _prepare_addresses(key, values):
+    parsed = parse_addresses(values)
+    return {value: {'parsed_address': x} for value, x in zip(values, parsed) if x is not None}
+
+
+# Kinds that clean_batch works out for every distinct value at once
+BATCH_PREPARERS = {'address': _prepare_addresses}
+
+_MISSING = object()
+
+
+def _try_clean(cleaner, key, value):
+    try:
+        return cleaner(key, value)
+    except Exception:
+        return None
@@ -20,7 +20,7 @@ import logging
 from tqdm import tqdm
 
 import deathpledge
-from deathpledge import keys
+from deathpledge import keys, metrics, resilience, tracing
 
 logger = logging.getLogger(__name__)
 
@@ -103,11 +103,12 @@ def get_single_doc(doc_id, db_name, client):
     return doc
 
 
+@tracing.traced()
 def get_bulk_docs(doc_ids: list, db_name: str, client: Cloudant.iam) -> dict:
     """Fetch multiple docs from the database."""
     logger.info(f'Bulk getting {len(doc_ids)} docs...')
     db = client[db_name]
-    result = db.all_docs(keys=doc_ids, include_docs=True)
+    result = resilience.get_provider('cloudant').call(db.all_docs, keys=doc_ids, include_docs=True)
     raw_rows = rate_limit_pull(result['rows'], est_doc_count=len(doc_ids))
     rows_by_docid = {x['id']: x for x in raw_rows if not x.get('error')}
     return rows_by_docid
@@ -171,6 +172,7 @@ def get_active_doc_ids(client: Cloudant.iam, db_name: str, **kwargs) -> dict:
     return docs
 
 
+@tracing.traced()
 def bulk_upload(docs: list, db_name: str, client: Cloudant.iam):
     """Push an array of docs to the database.
 
@@ -184,10 +186,15 @@ def bulk_upload(docs: list, db_name: str, client: Cloudant.iam):
             doc['_id'] = doc.docid
         except AttributeError:
             continue
+    # Compact records are sent as the dicts they stand for
+    docs = [doc.to_doc() if hasattr(doc, 'to_doc') else doc for doc in docs]
     db = client[db_name]
     resp = []
     for part in rate_limit_push(docs=docs):
-        part_resp = db.bulk_docs(part)
+        # With every _id given, a write that landed before a timeout comes back
+        # as a conflict when retried, instead of being stored twice
+        idempotent = all('_id' in doc for doc in part)
+        part_resp = resilience.get_provider('cloudant').call(db.bulk_docs, part, idempotent=idempotent)
         resp.extend(part_resp)
     get_successful_uploads(resp, db_name=db_name)
 
@@ -223,8 +230,13 @@ def get_successful_uploads(resp: list, db_name: str):
     """Count how many docs were created out of how many attempted."""
     attempted_count = len(resp)
     successful = [i['id'] for i in resp if i.get('ok')]
-    logger.info(f'Created the following docs in {db_name}:')
-    logger.info(f'\t{successful}')
+    conflicted = sum(1 for i in resp if i.get('error') == 'conflict')
+    docs_total = metrics.counter('deathpledge_docs_total', 'Docs by what happened to them, per database',
+                                 ['db', 'outcome'])
+    docs_total.inc(len(successful), db=db_name, outcome='written')
+    docs_total.inc(conflicted, db=db_name, outcome='conflicted')
+    docs_total.inc(attempted_count - len(successful) - conflicted, db=db_name, outcome='failed')
+    logger.debug(f'Created the following docs in {db_name}: {successful}')
     logger.info(f'{len(successful)}/{attempted_count} docs created')
 
 
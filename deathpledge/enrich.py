@@ -18,8 +18,8 @@ TODO: add these calculations
 """
 import logging
 
-from deathpledge import support, keys
-from deathpledge.api_calls import bing
+from deathpledge import support, freshness, geodesic
+from deathpledge.api_calls import bing, locations, providers
 
 logger = logging.getLogger(__name__)
 
@@ -29,19 +29,61 @@ class EnrichError(Exception):
     pass
 
 
-def add_bing_maps_data(home):
+def add_bing_maps_data(home, driving=True, force=False):
     """Return all data from Bing maps for a given home."""
-    bing_getter = bing.BingDataGetter(home)
-    bing_getter.add_data_to_home()
+    bing_getter = bing.BingDataGetter(home, registry=locations.get_registry(), force=force,
+                                      providers=providers.get_provider_chain())
+    bing_getter.add_data_to_home(driving=driving)
 
 
-def add_tether(home):
+def add_driving_batch(homes, force=False):
+    """Add driving info to many homes at once with distance matrix requests."""
+    bing.add_driving_to_homes(homes, registry=locations.get_registry(), force=force,
+                              drive_router=providers.get_provider_chain().matrix_router())
+
+
+def add_coords(home, force=False):
+    """Geocode a home, unless it already has fresh geocoords for its address."""
+    bing_getter = bing.BingDataGetter(home, registry=locations.get_registry(), force=force,
+                                      providers=providers.get_provider_chain())
+    inputs = bing_getter._geocode_inputs()
+    if freshness.needs_update(home, 'geocoords', inputs, force=force):
+        bing_getter._get_home_coordinates()
+
+
+def add_tether(home, force=False):
     """Add straight-line distance to centerpoint."""
     house_coords = tuple(home['geocoords'])
-    center = tuple(keys['Locations']['centerpoint'].values())
+    center = tuple(locations.get_registry().centerpoint)
+    inputs = (freshness.rounded_coords(house_coords), list(center))
+    if not freshness.needs_update(home, 'tether', inputs, force=force):
+        return
     try:
         dist = support.haversine(house_coords, center)
     except:
         logger.exception('Failed to add tether')
     else:
         home['tether'] = round(dist, 2)
+        freshness.mark_fresh(home, 'tether', inputs)
+
+
+def add_tether_batch(homes, force=False):
+    """Add straight-line distance to centerpoint to many homes at once.
+
+    Homes without geocoords, or whose tether is still fresh, are left alone.
+
+    """
+    center = tuple(locations.get_registry().centerpoint)
+    pending = []
+    for home in homes:
+        if not home.get('geocoords'):
+            continue
+        inputs = (freshness.rounded_coords(home['geocoords']), list(center))
+        if freshness.needs_update(home, 'tether', inputs, force=force):
+            pending.append((home, inputs))
+    if not pending:
+        return
+    dists = geodesic.distance_to([home['geocoords'] for home, _ in pending], center)
+    for (home, inputs), dist in zip(pending, dists):
+        home['tether'] = round(float(dist), 2)
+        freshness.mark_fresh(home, 'tether', inputs)
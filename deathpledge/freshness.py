@@ -0,0 +1,138 @@
+"""
+Track when each enriched field was computed, and from what.
+
+Every enrichment step records, under the doc's ``enriched`` field, the time
+it ran and a digest of the inputs it used (address, coordinates, destination,
+etc.). A step only needs to run again when one of its fields is missing, its
+record is older than the step's max age, or its inputs have changed since.
+
+A doc enriched before this tracking existed has fields but no records. Those
+fields are adopted as fresh with today's inputs rather than being recomputed.
+
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+
+from deathpledge import TIMEFORMAT, keys
+
+logger = logging.getLogger(__name__)
+
+FRESHNESS_FIELD = 'enriched'
+
+# Days before a step's result is considered stale; None never goes stale
+DEFAULT_MAX_AGE_DAYS = {
+    'geocoords': None,
+    'commute': 90,
+    'nearby_metro': 365,
+    'driving': 90,
+    'tether': None,
+}
+
+# Fields written by each step; driving steps are named 'driving:<place>'
+STEP_FIELDS = {
+    'geocoords': ['geocoords'],
+    'commute': ['commute_time', 'first_leg', 'first_walk'],
+    'nearby_metro': ['nearby_metro'],
+    'tether': ['tether'],
+}
+
+
+def input_digest(*inputs):
+    """Short, stable hash of a step's inputs."""
+    serialized = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()[:12]
+
+
+def rounded_coords(coords, precision=5):
+    """Coordinates as a rounded list, so float noise doesn't change a digest."""
+    if coords is None:
+        return None
+    return [round(float(x), precision) for x in coords]
+
+
+def get_max_age_days(step):
+    """Max age for a step, from the keys file's ``Enrichment`` section if set."""
+    base_step = step.split(':')[0]
+    configured = keys.get('Enrichment', {}).get('max_age_days', {})
+    return configured.get(base_step, DEFAULT_MAX_AGE_DAYS.get(base_step))
+
+
+def needs_update(home, step, inputs, force=False):
+    """Decide whether an enrichment step has to run for a home.
+
+    Args:
+        home (dict): Doc being enriched.
+        step (str): Name of the step, e.g. ``'commute'`` or ``'driving:Gym'``.
+        inputs (tuple): Values the step's result depends on.
+        force (bool): Always run the step.
+
+    Returns:
+        bool: True if any field is missing, stale, or was computed from other inputs.
+
+    """
+    if force or any(field not in home for field in get_step_fields(step)):
+        return True
+    record = home.get(FRESHNESS_FIELD, {}).get(step)
+    digest = input_digest(*inputs)
+    if record is None:
+        mark_fresh(home, step, inputs)
+        return False
+    if record.get('inputs') != digest:
+        logger.debug(f"Inputs changed for '{step}'")
+        return True
+    max_age_days = get_max_age_days(step)
+    if max_age_days is not None:
+        enriched_at = datetime.strptime(record['at'], TIMEFORMAT)
+        if datetime.now() - enriched_at > timedelta(days=max_age_days):
+            logger.debug(f"'{step}' is older than {max_age_days} days")
+            return True
+    return False
+
+
+def mark_fresh(home, step, inputs):
+    """Record that a step just ran for a home with these inputs."""
+    home.setdefault(FRESHNESS_FIELD, {})[step] = dict(
+        at=datetime.now().strftime(TIMEFORMAT),
+        inputs=input_digest(*inputs)
+    )
+
+
+def carry_over(home, existing_doc):
+    """Copy enriched fields and their records from a previously saved doc.
+
+    Only fields the home doesn't already have are copied, so freshly scraped
+    values always win.
+
+    Args:
+        home (dict): Doc about to be enriched.
+        existing_doc (dict): Same home as last saved to the clean database.
+
+    """
+    records = existing_doc.get(FRESHNESS_FIELD)
+    if not records:
+        return
+    for field in get_enriched_fields(existing_doc):
+        if field not in home and field in existing_doc:
+            home[field] = existing_doc[field]
+    merged = dict(records)
+    merged.update(home.get(FRESHNESS_FIELD, {}))
+    home[FRESHNESS_FIELD] = merged
+
+
+def get_step_fields(step):
+    """Fields written by an enrichment step."""
+    if step.startswith('driving:'):
+        place = step.split(':', 1)[1]
+        return [f'{place}_dist', f'{place}_time']
+    return STEP_FIELDS.get(step, [])
+
+
+def get_enriched_fields(doc):
+    """Fields written by the steps recorded in a doc."""
+    fields = []
+    for step in doc.get(FRESHNESS_FIELD, {}):
+        fields.extend(get_step_fields(step))
+    return fields
+
@@ -0,0 +1,142 @@
+"""Great-circle distances and bearings over many points at once.
+
+These are the array versions of :func:`deathpledge.support.haversine`, with the
+same Earth radius. Every function takes coordinates as (N, 2) arrays of
+latitude/longitude in degrees. A row of NaNs, for a home without geocoords,
+gives NaN back instead of raising.
+"""
+import numpy as np
+
+from deathpledge.support import EARTH_RADIUS_MILES
+
+# Largest number of cells computed at once by distance_matrix: about 16 MB per
+# float64 temporary
+MAX_CHUNK_CELLS = 2_000_000
+
+
+def as_coords(coords):
+    """(N, 2) float array of latitude/longitude, with missing coordinates as NaN.
+
+    Args:
+        coords: A single (lat, lon) pair, or a sequence of them, where any pair
+            may be None.
+
+    """
+    try:
+        return np.asarray(coords, dtype=float).reshape(-1, 2)
+    except (TypeError, ValueError):
+        pass
+    rows = [(np.nan, np.nan) if x is None or len(x) != 2 else x for x in _as_rows(coords)]
+    return np.array(rows, dtype=float).reshape(-1, 2)
+
+
+def _as_rows(coords):
+    coords = list(coords)
+    if len(coords) == 2 and all(np.isscalar(x) for x in coords):
+        return [coords]
+    return coords
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    """Miles between points given in radians; arguments broadcast together."""
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def distance_to(coords, point):
+    """Miles from each of N points to one point, e.g. every home's tether.
+
+    Examples:
+        >>> distance_to([(38.9, -77.0), (39.0, -77.0)], (38.9, -77.0)).round(2)
+        array([0.  , 6.91])
+
+    """
+    lat, lon = np.radians(as_coords(coords)).T
+    point_lat, point_lon = np.radians(as_coords(point)[0])
+    return _haversine(lat, lon, point_lat, point_lon)
+
+
+def distance_matrix(coords1, coords2, max_cells=MAX_CHUNK_CELLS, dtype=np.float64):
+    """Miles from each of N points to each of M points.
+
+    Rows are computed in chunks of at most *max_cells* cells, so the
+    temporaries stay small however many points there are.
+
+    Args:
+        coords1: N (lat, lon) pairs.
+        coords2: M (lat, lon) pairs.
+        max_cells (int, optional): Cells per chunk.
+        dtype (optional): Type of the result. ``np.float32`` halves its memory.
+
+    Returns:
+        np.ndarray: (N, M) miles.
+
+    """
+    lat1, lon1 = np.radians(as_coords(coords1)).T
+    lat2, lon2 = np.radians(as_coords(coords2)).T
+    result = np.empty((len(lat1), len(lat2)), dtype=dtype)
+    rows_per_chunk = max(1, max_cells // max(len(lat2), 1))
+    for start in range(0, len(lat1), rows_per_chunk):
+        rows = slice(start, start + rows_per_chunk)
+        result[rows] = _haversine(lat1[rows, None], lon1[rows, None], lat2[None, :], lon2[None, :])
+    return result
+
+
+def bearing(coords, point):
+    """Initial compass bearing, in degrees from north, from each point to one point.
+
+    Examples:
+        >>> bearing([(38.9, -77.0), (38.9, -77.1)], (39.0, -77.0)).round(1)
+        array([ 0. , 37.8])
+
+    """
+    lat, lon = np.radians(as_coords(coords)).T
+    point_lat, point_lon = np.radians(as_coords(point)[0])
+    d_lon = point_lon - lon
+    x = np.sin(d_lon) * np.cos(point_lat)
+    y = np.cos(lat) * np.sin(point_lat) - np.sin(lat) * np.cos(point_lat) * np.cos(d_lon)
+    return np.degrees(np.arctan2(x, y)) % 360
+
+
+def within_radius(coords, centers, miles, max_cells=MAX_CHUNK_CELLS):
+    """Which points are within a distance of a center, or of each of many centers.
+
+    Args:
+        coords: N (lat, lon) pairs.
+        centers: One (lat, lon) pair, or M of them.
+        miles (float): Radius.
+
+    Returns:
+        np.ndarray: Booleans, of shape (N,) for one center or (N, M) for many.
+            Points without coordinates are never within.
+
+    """
+    coords, centers = as_coords(coords), as_coords(centers)
+    if len(centers) == 1:
+        return distance_to(coords, centers[0]) <= miles
+    mask = np.empty((len(coords), len(centers)), dtype=bool)
+    rows_per_chunk = max(1, max_cells // len(centers))
+    for start in range(0, len(coords), rows_per_chunk):
+        rows = slice(start, start + rows_per_chunk)
+        mask[rows] = distance_matrix(coords[rows], centers, max_cells=max_cells) <= miles
+    return mask
+
+
+def count_within(coords, others, miles, max_cells=MAX_CHUNK_CELLS):
+    """How many of M other points are within a distance of each of N points.
+
+    Unlike :func:`within_radius`, the (N, M) mask is never held in memory at
+    once, so it suits counting neighbors among many homes.
+
+    Returns:
+        np.ndarray: (N,) counts.
+
+    """
+    coords, others = as_coords(coords), as_coords(others)
+    counts = np.zeros(len(coords), dtype=np.int64)
+    rows_per_chunk = max(1, max_cells // max(len(others), 1))
+    for start in range(0, len(coords), rows_per_chunk):
+        rows = slice(start, start + rows_per_chunk)
+        counts[rows] = (distance_matrix(coords[rows], others, max_cells=max_cells) <= miles).sum(axis=1)
+    return counts
@@ -4,9 +4,14 @@ My newest headache.
 https://stackoverflow.com/questions/45287578/yet-another-python-logging-setup
 """
 import os
+import atexit
+import queue
+import threading
+import time
 import yaml
 import logging
 import logging.config
+import logging.handlers
 
 LOGDIR = os.path.normpath(os.path.dirname(os.path.realpath(__file__)))
 LOGCONFIG_FILE = os.path.join(LOGDIR, '../../config/logging.yaml')
@@ -34,12 +39,109 @@ def dp_debugger():
     return logger
 
 
+class RateLimitFilter(logging.Filter):
+    """Let through a few records per call site in each interval, for messages logged per item.
+
+    Records from the same line of code are counted together. Once a site has
+    logged *burst* records in an interval, the rest are dropped until the
+    next interval, and the first record after that says how many were.
+
+    Args:
+        burst (int, optional): Records allowed per call site per interval.
+        interval (float, optional): Seconds.
+        clock (callable, optional): Replaceable in tests.
+
+    """
+
+    def __init__(self, burst=10, interval=60.0, clock=time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._clock = clock
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        now = self._clock()
+        with self._lock:
+            window_start, count, suppressed = self._sites.get(key, (now, 0, 0))
+            if now - window_start >= self.interval:
+                window_start, count = now, 0
+            if count >= self.burst:
+                self._sites[key] = (window_start, count, suppressed + 1)
+                return False
+            self._sites[key] = (window_start, count + 1, 0)
+        if suppressed:
+            record.msg = f'{record.getMessage()} ({suppressed} similar messages suppressed)'
+            record.args = None
+        return True
+
+
+_listeners = []
+
+
+def start_queue_logging(loggers=None):
+    """Move handlers of configured loggers onto background threads.
+
+    Each logger's handlers are replaced by a QueueHandler, and a
+    QueueListener thread does the formatting and writing, so logging in a hot
+    loop only puts a record on a queue. Loggers that share the same handlers
+    share a queue, so records still go only where the config sends them.
+
+    Args:
+        loggers (list, optional): Loggers to move. Defaults to every logger,
+            including the root logger.
+
+    Returns:
+        list: The started QueueListeners.
+
+    """
+    stop_queue_logging()
+    if loggers is None:
+        loggers = [logging.getLogger()] + [
+            x for x in logging.Logger.manager.loggerDict.values() if isinstance(x, logging.Logger)
+        ]
+    queue_handlers = {}
+    for logger_ in loggers:
+        handlers = tuple(logger_.handlers)
+        if not handlers or any(isinstance(x, logging.handlers.QueueHandler) for x in handlers):
+            continue
+        if handlers not in queue_handlers:
+            records = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+            listener.start()
+            _listeners.append(listener)
+            queue_handlers[handlers] = logging.handlers.QueueHandler(records)
+        for handler in handlers:
+            logger_.removeHandler(handler)
+        logger_.addHandler(queue_handlers[handlers])
+    return list(_listeners)
+
+
+def stop_queue_logging():
+    """Write out everything still queued and stop the listener threads."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(stop_queue_logging)
+
+
 def setup_logging(config_path=LOGCONFIG_FILE, default_level=logging.INFO,
-                  env_key='LOG_CFG', verbose=None):
+                  env_key='LOG_CFG', verbose=None, use_queue=False):
+    """Configure logging from the YAML file.
+
+    Args:
+        use_queue (bool, optional): Write logs from background threads; see
+            :func:`start_queue_logging`.
+
+    """
     path = config_path
     value = os.getenv(env_key, None)
     if value:
         path = value
+    stop_queue_logging()
     if os.path.exists(path):
         with open(path, 'rt') as f:
             config = yaml.safe_load(f.read())
@@ -48,4 +150,6 @@ def setup_logging(config_path=LOGCONFIG_FILE, default_level=logging.INFO,
         logging.config.dictConfig(config)
     else:
         logging.basicConfig(level=default_level)
+    if use_queue:
+        start_queue_logging()
 
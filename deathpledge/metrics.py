@@ -0,0 +1,295 @@
+"""Counts and latencies of a run, reported as JSON and as a Prometheus textfile.
+
+Code anywhere in the pipeline counts what happened through the run's
+registry::
+
+    metrics.counter('deathpledge_pages_scraped_total', 'Listing pages scraped',
+                    ['source']).inc(source='homescout')
+
+At the end of a run, :func:`finish_run` writes every metric to
+``data/metrics`` as JSON, and in the Prometheus text format to a ``.prom``
+file for node exporter's textfile collector. Set ``Metrics: textfile_dir`` in
+the keys file to node exporter's ``--collector.textfile.directory``.
+
+Only the standard library is used, so importing this stays cheap for
+``--help``.
+"""
+from datetime import datetime
+from os import path, makedirs, replace
+import json
+import logging
+import math
+import threading
+import time
+
+import deathpledge
+from deathpledge import keys
+
+METRICS_DIR = path.join(deathpledge.PROJ_PATH, 'data', 'metrics')
+TEXTFILE_NAME = 'deathpledge.prom'
+# Seconds; from a cache lookup up to a whole stage
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+PERCENTILES = (50, 90, 99)
+
+logger = logging.getLogger(__name__)
+
+
+class Metric(object):
+    """Values of one metric, one per combination of label values.
+
+    Args:
+        name (str): Prometheus metric name, e.g. ``deathpledge_api_calls_total``.
+        help (str): One line describing it.
+        labelnames (list, optional): Names of the labels every value has.
+
+    """
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {list(self.labelnames)}, not {sorted(labels)}')
+        return tuple(str(labels[x]) for x in self.labelnames)
+
+    def _label_dict(self, key):
+        return dict(zip(self.labelnames, key))
+
+    def to_dict(self):
+        return {
+            'type': self.type,
+            'help': self.help,
+            'values': [dict(labels=self._label_dict(k), **self._value_dict(v))
+                       for k, v in sorted(self.values.items())],
+        }
+
+    def to_prometheus(self):
+        lines = [f'# HELP {self.name} {_escape_help(self.help)}', f'# TYPE {self.name} {self.type}']
+        for key, value in sorted(self.values.items()):
+            lines.extend(self._sample_lines(self._label_dict(key), value))
+        return lines
+
+
+class Counter(Metric):
+    """Something that only goes up during a run, like docs written."""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self.values.get(self._key(labels), 0)
+
+    @staticmethod
+    def _value_dict(value):
+        return {'value': value}
+
+    def _sample_lines(self, labels, value):
+        return [f'{self.name}{_format_labels(labels)} {_format_value(value)}']
+
+
+class Gauge(Counter):
+    """A value that is set, like when the run finished."""
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    """Distribution of values, like seconds per call, with percentiles.
+
+    Every observation is kept for the run, so the JSON report has exact
+    percentiles. The textfile has Prometheus buckets, for
+    ``histogram_quantile`` across runs.
+
+    """
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values.setdefault(key, []).append(value)
+
+    def percentile(self, q, **labels):
+        return _percentile(sorted(self.values.get(self._key(labels), [])), q)
+
+    @staticmethod
+    def _value_dict(observations):
+        ordered = sorted(observations)
+        summary = {'count': len(ordered), 'sum': sum(ordered), 'max': ordered[-1]}
+        summary.update({f'p{q}': _percentile(ordered, q) for q in PERCENTILES})
+        return summary
+
+    def _sample_lines(self, labels, observations):
+        lines = []
+        for bound in self.buckets + (math.inf,):
+            count = sum(1 for x in observations if x <= bound)
+            bucket_labels = dict(labels, le=_format_value(bound))
+            lines.append(f'{self.name}_bucket{_format_labels(bucket_labels)} {count}')
+        lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(sum(observations))}')
+        lines.append(f'{self.name}_count{_format_labels(labels)} {len(observations)}')
+        return lines
+
+
+def _percentile(ordered, q):
+    """Nearest-rank percentile of sorted values, or None if there are none."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{k}="{_escape_label(v)}"' for k, v in labels.items())
+    return f'{{{pairs}}}'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _escape_help(text):
+    return text.replace('\\', r'\\').replace('\n', r'\n')
+
+
+class Registry(object):
+    """Every metric of one run, by name."""
+
+    def __init__(self):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        self.started = time.time()
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, labelnames, **kwargs)
+        if type(metric) is not cls or metric.labelnames != tuple(labelnames):
+            raise ValueError(f'{name} is already a {metric.type} with labels {list(metric.labelnames)}')
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def to_dict(self):
+        return {
+            'started': datetime.fromtimestamp(self.started).strftime(deathpledge.TIMEFORMAT),
+            'metrics': {name: metric.to_dict() for name, metric in sorted(self.metrics.items())},
+        }
+
+    def to_prometheus(self):
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.extend(metric.to_prometheus())
+        return '\n'.join(lines) + '\n'
+
+    def write(self, json_path, textfile_path):
+        """Write the JSON report and the Prometheus textfile.
+
+        The textfile is written to a temporary file and moved into place, so
+        node exporter never reads half of one.
+
+        """
+        for file_path in [json_path, textfile_path]:
+            makedirs(path.dirname(file_path) or '.', exist_ok=True)
+        with open(json_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        temp_path = f'{textfile_path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(self.to_prometheus())
+        replace(temp_path, textfile_path)
+        self.logger.info(f'Wrote metrics to {json_path} and {textfile_path}')
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """The current run's registry, started on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = Registry()
+        return _registry
+
+
+def counter(name, help, labelnames=()):
+    """Get or create a counter in the run's registry."""
+    return get_registry().counter(name, help, labelnames)
+
+
+def gauge(name, help, labelnames=()):
+    """Get or create a gauge in the run's registry."""
+    return get_registry().gauge(name, help, labelnames)
+
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Get or create a histogram in the run's registry."""
+    return get_registry().histogram(name, help, labelnames, buckets=buckets)
+
+
+def start_run():
+    """Start a new registry for a run, and return it."""
+    global _registry
+    with _registry_lock:
+        _registry = Registry()
+    return _registry
+
+
+def finish_run(success, metrics_dir=METRICS_DIR, textfile_dir=None):
+    """Record how the run went and write its metrics.
+
+    Args:
+        success (bool): Whether the run finished without an exception.
+        metrics_dir (str, optional): Where the JSON report goes.
+        textfile_dir (str, optional): Where the ``.prom`` file goes. Defaults
+            to ``Metrics: textfile_dir`` in the keys file, then *metrics_dir*.
+
+    Returns:
+        tuple: Paths of the JSON report and the textfile.
+
+    """
+    registry = get_registry()
+    finished = time.time()
+    gauge('deathpledge_run_last_timestamp_seconds', 'When the last run finished').set(finished)
+    gauge('deathpledge_run_duration_seconds', 'How long the last run took').set(finished - registry.started)
+    gauge('deathpledge_run_success', '1 if the last run finished without an exception').set(int(success))
+    if textfile_dir is None:
+        textfile_dir = keys.get('Metrics', {}).get('textfile_dir') or metrics_dir
+    run_id = datetime.fromtimestamp(registry.started).strftime('%Y%m%d_%H%M%S')
+    json_path = path.join(metrics_dir, f'{run_id}.metrics.json')
+    textfile_path = path.join(textfile_dir, TEXTFILE_NAME)
+    registry.write(json_path, textfile_path)
+    return json_path, textfile_path
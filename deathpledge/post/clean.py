@@ -4,7 +4,7 @@ import numpy as np
 import logging
 import os
 
-from deathpledge import PROJ_PATH
+from deathpledge import PROJ_PATH, schema
 from deathpledge.post import fetch
 
 logger = logging.getLogger(__name__)
@@ -15,11 +15,17 @@ class HomeData(object):
         self.df = df
 
     def run_all_cleaning(self):
+        self.validate()
         self.address_cloudant_issues()
         self.address_realscout_homescout_join()
         self.apply_transformations()
         self.handle_outliers()
 
+    def validate(self):
+        """Log where the data doesn't match the home schema."""
+        for problem in schema.validate_frame(self.df):
+            logger.warning(problem)
+
     def address_cloudant_issues(self):
         self._drop_unwanted_cols()
 
@@ -104,6 +110,7 @@ class HomeData(object):
                      'building_sites']
         self.df.drop(columns=drop_cols, errors='ignore', inplace=True)
         self._parse_currency_fields()
+        self._apply_schema_dtypes()
         zero_for_null_cols = ['garage_capacity', 'fireplaces', 'city_tax', 'county_tax', 'total_taxes']
         self._fill_zero_for_null(zero_for_null_cols)
         self._downcast_floats_to_int()
@@ -139,11 +146,18 @@ class HomeData(object):
 
     def _parse_currency_fields(self):
         """Remove currency symbols."""
-        for col in ['county_tax', 'city_tax', 'total_taxes', 'estimated_value']:
+        currency_cols = schema.names('number', units='USD') + schema.names('fee', units='USD')
+        for col in [x for x in currency_cols if x in self.df]:
             self.df[col] = self.df[col].map(str).str.replace('$', '')
             self.df[col] = self.df[col].map(str).str.replace(',', '')
             self.df[col] = pd.to_numeric(self.df[col], errors='coerce')
 
+    def _apply_schema_dtypes(self):
+        """Give schema fields their dtype; numbers that don't parse become NaN."""
+        for col, dtype in schema.dtypes(self.df.columns).items():
+            if dtype == 'float64':
+                self.df[col] = pd.to_numeric(self.df[col], errors='coerce').astype(dtype)
+
     def _downcast_floats_to_int(self):
         for col in self.df:
             try:
@@ -4,6 +4,7 @@ import numpy as np
 from os import path
 
 import deathpledge
+from deathpledge import geodesic, keys, support
 from deathpledge.post import clean
 
 
@@ -11,11 +12,14 @@ def add_engineered_features(home_data: clean.HomeData):
     home_data.df = calc_days_on_market(home_data.df)
     home_data.df = calc_taxes_price_ratio(home_data.df)
     home_data.df = calc_diff_from_estimate(home_data.df)
+    home_data.df = calc_tether(home_data.df)
+    home_data.df = calc_listings_nearby(home_data.df)
     home_data.df = handle_nulls(home_data.df)
 
 
 def calc_days_on_market(df: pd.DataFrame):
-    new_on_homescout = pd.to_datetime(df['new_on_homescout'])
+    dates = support.coerce_date_strings(df['new_on_homescout'], source='new_on_homescout')
+    new_on_homescout = pd.to_datetime(dates)
     dom = (pd.Timestamp.now() - new_on_homescout).dt.days
     df['days_on_market'] = dom
     return df
@@ -35,6 +39,27 @@ def calc_diff_from_estimate(df: pd.DataFrame):
     return df
 
 
+def _geocoords(df: pd.DataFrame):
+    """(N, 2) lat/lon of each home, NaN where it has no geocoords."""
+    return geodesic.as_coords([x if isinstance(x, (list, tuple)) else None for x in df['geocoords']])
+
+
+def calc_tether(df: pd.DataFrame):
+    """Straight-line miles to the centerpoint, for every home at once."""
+    center = keys['Locations']['centerpoint']
+    df['tether'] = geodesic.distance_to(_geocoords(df), (center['lat'], center['lon'])).round(2)
+    return df
+
+
+def calc_listings_nearby(df: pd.DataFrame, miles=0.5):
+    """How many other homes in the data are within *miles*, a rough density."""
+    coords = _geocoords(df)
+    has_coords = ~np.isnan(coords).any(axis=1)
+    nearby = geodesic.count_within(coords, coords[has_coords], miles)
+    df['listings_nearby'] = np.where(has_coords, nearby - 1, np.nan)
+    return df
+
+
 def handle_nulls(df: pd.DataFrame):
     """Null handling according to specific rules, for modeling."""
     df['county_tax'].fillna(pd.to_numeric(df['county_tax'].dropna()).mean(), inplace=True)
@@ -8,6 +8,7 @@ from os import path
 
 import deathpledge
 from deathpledge import database as db
+from deathpledge.classes import HomeRecord
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +17,7 @@ def get_homes_from_cloudant() -> list:
     """Get all homes.
 
     Returns:
-        List of docs as dictionaries.
+        List of docs as compact :class:`~deathpledge.classes.HomeRecord` mappings.
     """
     with db.DatabaseClient() as cloudant:
         clean_db = cloudant[deathpledge.DATABASE_NAME]
@@ -25,12 +26,12 @@ def get_homes_from_cloudant() -> list:
                       use_index='homeIndex')
         result_collection = QueryResult(query)
     rows = db.rate_limit_pull(result_collection, est_doc_count=900)
-    return rows
+    return [HomeRecord(x) for x in rows]
 
 
 def get_dataframe_from_docs(docs: list) -> pd.DataFrame:
-    """Convert Cloudant docs to dataframe."""
-    df = pd.DataFrame(docs)
+    """Convert Cloudant docs, or records of them, to dataframe."""
+    df = pd.DataFrame([x.to_doc() if isinstance(x, HomeRecord) else x for x in docs])
     logger.info(df['scraped_source'].value_counts())
     return df
 
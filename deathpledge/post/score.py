@@ -1 +1,255 @@
-"""Score listings."""
+"""Score listings.
+
+Scores every home at once from a frame of flat clean docs, the layout in
+Cloudant, rather than one nested listing at a time as
+:mod:`deathpledge.score2` does. ``Data/scorecard.json`` keeps the format
+score2 reads, and is compiled once into a :class:`Scorecard`:
+
+    - Categorical fields (the first dict) become a lookup of labels to
+      points, plus the numeric labels sorted for a LOOKUP, as in Excel, of
+      values that aren't labels.
+    - Continuous fields (the second dict) keep their range settings, and are
+      scored for a whole column with one ``np.searchsorted``.
+
+Scorecard field names are from the legacy layout, like ``'Structure Type'``
+or ``('expenses / taxes', 'Tax Annual Amount')``. They are matched to flat
+columns by :data:`COLUMN_NAMES`, or else slugified as the scrapers name
+fields. Each field gives a ``<name>_score`` column, NaN for homes without
+the field, and the scores add up to ``TOTAL_SCORE``.
+"""
+from collections import namedtuple
+from os import path
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+import deathpledge
+from deathpledge import support
+
+logger = logging.getLogger(__name__)
+
+# Legacy scorecard names whose flat column isn't just the slug of the name
+COLUMN_NAMES = {
+    'Has Basement': 'basement',
+    'Has Garage': 'garage',
+    'commute_transit_mins': 'commute_time',
+    'Tax Annual Amount': 'total_taxes',
+    'Price Per SQFT': 'price_sqft',
+}
+YES_NO = {True: 'Yes', 'Y': 'Yes', 'Yes': 'Yes', False: 'No', 'N': 'No', 'No': 'No'}
+LAUNDRY_POINTS = 2
+
+CategoricalRule = namedtuple('CategoricalRule', 'score_name column points numeric_keys numeric_points weight yes_no')
+RangeRule = namedtuple('RangeRule', 'score_name column min_value max_value weight ascending norm_by zero_pt')
+
+
+def column_for(name):
+    """Flat column holding a legacy scorecard field, e.g. ``'Condo/Coop Fee'`` -> ``'condocoop_fee'``."""
+    return COLUMN_NAMES.get(name) or support.slugify(name).replace('-', '_')
+
+
+class Scorecard(object):
+    """The scorecard compiled for scoring whole columns.
+
+    Args:
+        categorical (dict): ``{field: {label: points, '_weight': weight}}``.
+        continuous (dict): ``{score name: range settings}``, as taken by
+            :func:`deathpledge.score2.continuous_score`.
+
+    """
+
+    def __init__(self, categorical, continuous):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        self.categorical = [self._compile_categorical(k, v) for k, v in categorical.items()]
+        self.continuous = [self._compile_range(k, v) for k, v in continuous.items()]
+
+    @classmethod
+    def from_file(cls, filepath=None):
+        """Compile ``scorecard.json``, by default the one at ``deathpledge.SCORECARD_PATH``."""
+        with open(filepath or deathpledge.SCORECARD_PATH, 'r') as f:
+            categorical, continuous = json.load(f)
+        return cls(categorical, continuous)
+
+    @staticmethod
+    def _compile_categorical(field, scores):
+        points = {str(k): float(v) for k, v in scores.items() if k != '_weight'}
+        numeric = {}
+        for label, value in points.items():
+            try:
+                numeric[float(label)] = value
+            except ValueError:
+                continue
+        numeric_keys = np.array(sorted(numeric), dtype=float)
+        return CategoricalRule(
+            score_name='{}_score'.format(support.slugify(field).replace('-', '_')),
+            column=column_for(field),
+            points=points,
+            numeric_keys=numeric_keys,
+            numeric_points=np.array([numeric[x] for x in numeric_keys], dtype=float),
+            weight=float(scores.get('_weight', 1)),
+            yes_no=bool(points) and set(points) <= {'Yes', 'No'},
+        )
+
+    @staticmethod
+    def _compile_range(score_name, settings):
+        return RangeRule(
+            score_name=score_name,
+            column=column_for(settings['value_keys'][-1]),
+            min_value=settings['min_value'],
+            max_value=settings['max_value'],
+            weight=settings['weight'],
+            ascending=settings.get('ascending', True),
+            norm_by=settings.get('norm_by', 3.5),
+            zero_pt=settings.get('zero_pt', 0),
+        )
+
+    def score(self, homes) -> pd.DataFrame:
+        """Score every home.
+
+        Args:
+            homes: Flat clean docs, as a DataFrame or as ``{column: array}``.
+
+        Returns:
+            pd.DataFrame: A ``*_score`` column per scorecard field, and
+                ``TOTAL_SCORE``, on the same index as *homes*.
+
+        """
+        df = homes if isinstance(homes, pd.DataFrame) else pd.DataFrame(homes)
+        df = add_derived_columns(df)
+        scores = {}
+        missing = []
+        for rule in self.categorical:
+            if rule.column not in df:
+                missing.append(rule.column)
+                scores[rule.score_name] = np.full(len(df), np.nan)
+            else:
+                scores[rule.score_name] = categorical_score(df[rule.column], rule)
+        for rule in self.continuous:
+            if rule.column not in df:
+                missing.append(rule.column)
+                scores[rule.score_name] = np.full(len(df), np.nan)
+            else:
+                scores[rule.score_name] = range_score(
+                    df[rule.column], rule.min_value, rule.max_value, rule.weight,
+                    ascending=rule.ascending, norm_by=rule.norm_by, zero_pt=rule.zero_pt
+                )
+        scores['laundry_score'] = laundry_score(df)
+        if missing:
+            self.logger.info(f'Not scored, no such columns: {missing}')
+        result = pd.DataFrame(scores, index=df.index)
+        result['TOTAL_SCORE'] = result.sum(axis=1, skipna=True).round(1)
+        return result
+
+
+def categorical_score(values, rule) -> np.ndarray:
+    """Points for each value of a categorical field, times its weight.
+
+    A value that is one of the labels gets its points. Any other number gets
+    the points of the largest numeric label below it, or 0 below them all,
+    and any other string gets 0. Missing values are NaN, i.e. not scored.
+
+    Unlike :func:`deathpledge.score2.get_score_for_item`, a float equal to a
+    label, like 3.0 for ``'3'``, gets that label's points.
+
+    """
+    s = pd.Series(values, dtype=object).reset_index(drop=True)
+    present = s.notna().to_numpy()
+    types = s.map(type)
+    # Lists and dicts can't be looked up, and score 0 like other unmatched values
+    s = s.where(~types.isin([list, dict, tuple, set]), '')
+    if rule.yes_no:
+        yes_no = s.map(YES_NO)
+        s = yes_no.where(yes_no.notna(), s)
+        types = s.map(type)
+    result = np.array(s.where(types.eq(str)).map(rule.points), dtype=float)
+    unmatched = np.isnan(result) & present
+    if unmatched.any() and len(rule.numeric_keys):
+        numbers = pd.to_numeric(s[unmatched], errors='coerce').to_numpy(dtype=float)
+        i = np.searchsorted(rule.numeric_keys, numbers, side='right') - 1
+        looked_up = np.where(i >= 0, rule.numeric_points[np.clip(i, 0, None)], 0.0)
+        result[unmatched] = np.where(np.isnan(numbers), 0.0, looked_up)
+    result[np.isnan(result) & present] = 0.0
+    return result * rule.weight
+
+
+def range_score(values, min_value, max_value, weight, ascending=True, norm_by=3.5, zero_pt=0):
+    """:func:`deathpledge.score2.continuous_score` for a whole column.
+
+    Missing or non-numeric values are NaN, i.e. not scored.
+
+    Examples:
+        >>> range_score([350e3, 400e3, None], 275e3, 550e3, weight=3, ascending=False, norm_by=10)
+        array([21.6, 16.2,  nan])
+
+    """
+    v = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=float)
+    num = int(min((max_value - min_value) + 1, 50))
+    a = np.linspace(min_value, max_value, num=num)
+    if ascending:
+        steps = np.searchsorted(a, v, side='left')
+    else:
+        steps = np.searchsorted(-a[::-1], -v, side='right')
+    score = (steps * (norm_by / num) - (zero_pt * norm_by)) * weight
+    return np.where(np.isnan(v), np.nan, score.round(1))
+
+
+def add_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Add columns the scorecard uses that clean docs only hold nested."""
+    if 'metro_walk_mins' not in df and 'nearby_metro' in df:
+        df = df.assign(metro_walk_mins=[_nearest_walk_minutes(x) for x in df['nearby_metro']])
+    return df
+
+
+def _nearest_walk_minutes(nearby_metro):
+    """Minutes to walk to the nearest station, from ``{station: {distance, duration}}``."""
+    if not isinstance(nearby_metro, dict) or not nearby_metro:
+        return np.nan
+    walk = next(iter(nearby_metro.values()))
+    try:
+        hours, minutes, seconds = (float(x) for x in str(walk['duration']).split(':'))
+    except (KeyError, ValueError):
+        return np.nan
+    return hours * 60 + minutes + seconds / 60
+
+
+def laundry_score(df: pd.DataFrame) -> np.ndarray:
+    """Points for homes known to have laundry, NaN otherwise, as score2 does."""
+    if 'has_laundry' in df:
+        has_laundry = df['has_laundry'].fillna(False).astype(bool).to_numpy()
+    else:
+        has_laundry = np.zeros(len(df), dtype=bool)
+        if 'appliances' in df:
+            has_laundry |= np.array([_lists_laundry(x) for x in df['appliances']], dtype=bool)
+        if 'laundry' in df:
+            has_laundry |= df['laundry'].notna().to_numpy()
+    return np.where(has_laundry, float(LAUNDRY_POINTS), np.nan)
+
+
+def _lists_laundry(appliances):
+    if not isinstance(appliances, (list, tuple)):
+        return False
+    names = [str(x).lower() for x in appliances]
+    return 'washer' in names or any('dryer' in x for x in names)
+
+
+def score_frame(df: pd.DataFrame, scorecard=None) -> pd.DataFrame:
+    """Add the ``*_score`` columns and ``TOTAL_SCORE`` to a frame of homes."""
+    scorecard = scorecard or Scorecard.from_file()
+    scores = scorecard.score(df)
+    df = df.drop(columns=[x for x in scores if x in df])
+    return df.join(scores)
+
+
+def sample():
+    from deathpledge.post import feature
+    df = score_frame(feature.sample(online=True))
+    print(df[['mls_number', 'list_price', 'TOTAL_SCORE']].sort_values('TOTAL_SCORE').tail())
+    outfile = path.join(deathpledge.PROJ_PATH, 'data', '05-scored.csv')
+    df.to_csv(outfile, index=False)
+    return df
+
+
+if __name__ == '__main__':
+    sample()
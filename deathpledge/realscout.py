@@ -10,12 +10,11 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from bs4 import BeautifulSoup
-from django.utils.text import slugify
 from itertools import zip_longest
 
 import deathpledge
 from deathpledge import scrape2 as scrape
-from deathpledge import classes
+from deathpledge import classes, support, tracing
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +28,7 @@ class RealScoutWebsite(classes.WebDataSource):
         super().__init__(*args, **kwargs)
         self.signed_in = False
 
+    @tracing.traced()
     def sign_into_website(self):
         """Open website and login to access restricted listings."""
         self.logger.info('Opening browser and signing in')
@@ -55,6 +55,7 @@ class RealScoutWebsite(classes.WebDataSource):
             EC.title_contains('My Matches'))
         self.logger.info('signed in')
 
+    @tracing.traced()
     def get_soup_for_url(self, url):
         """Get BeautifulSoup object for a URL.
 
@@ -100,6 +101,7 @@ class RealScoutSoup(BeautifulSoup):
         super().__init__(*args, **kwargs)
         self.data = {}
 
+    @tracing.traced()
     def scrape_soup(self):
         """Scrape all for a single BS4 self object.
 
@@ -206,7 +208,7 @@ class RealScoutSoup(BeautifulSoup):
         basic_info_data = {}
         for field in basic_info_list:
             name, value = tuple(field.text.split(u':\xa0 '))
-            name = (slugify(name).replace('-', '_'))
+            name = (support.slugify(name).replace('-', '_'))
             basic_info_data[name] = value
         return basic_info_data
 
@@ -238,7 +240,7 @@ def get_normal_card_data(attrib_list: list) -> dict:
         attribute_pair = tuple(tag.text.split(u':'))
         attribute_pair = [x.strip() for x in attribute_pair]  # Strip whitespace from both
         name, value = attribute_pair
-        name = slugify(attribute_pair[0]).replace('-', '_')
+        name = support.slugify(attribute_pair[0]).replace('-', '_')
         card_data[name] = value
     return card_data
 
@@ -0,0 +1,364 @@
+"""
+Retries, backoff, circuit breaking and daily quotas for external APIs.
+
+Every call to Bing, Cloudant or Google Sheets goes through the
+:class:`Provider` for that service, which:
+
+* retries transient failures (timeouts, 429 and 5xx responses) with
+  exponential backoff and full jitter, and gives up at once on anything else;
+* opens a circuit breaker after repeated failures, so a provider that is down
+  is not hammered, and lets a trial call through once it has cooled off;
+* counts each request against the provider's daily quota, kept in the API
+  cache so the count survives between runs, and raises :class:`QuotaExceeded`
+  before a request that would go over it. Providers without a quota only
+  count in memory.
+
+Settings come from the ``Resilience`` section of the keys file, e.g.::
+
+    Resilience:
+      bing:
+        max_attempts: 4
+        daily_quota: 2000
+
+"""
+import contextlib
+import datetime as dt
+import logging
+import random
+import threading
+import time
+
+import requests
+
+from deathpledge import support, keys, metrics
+from deathpledge.api_calls import cache
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth trying again: timeouts, rate limiting and server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class QuotaExceeded(Exception):
+    """A provider's daily quota is used up; stop calling it until tomorrow."""
+    pass
+
+
+class CircuitOpen(support.BadResponse):
+    """A provider failed repeatedly and is not being called for now."""
+    pass
+
+
+class DeadlinePassed(TimeoutError):
+    """The caller stopped waiting for this call, so it isn't tried again."""
+    pass
+
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """Stop retrying calls made in this thread once *seconds* have passed.
+
+    For a caller that gives up waiting on a call running in another thread:
+    the call can't be interrupted, but it makes no more attempts, and uses no
+    more quota, after the caller has moved on.
+
+    """
+    previous = getattr(_local, 'deadline', None)
+    _local.deadline = time.monotonic() + seconds
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def _seconds_left():
+    """Seconds until this thread's deadline, or None if it has none."""
+    current = getattr(_local, 'deadline', None)
+    return None if current is None else current - time.monotonic()
+
+
+def get_status(exc):
+    """HTTP status code carried by an exception from any of the API clients.
+
+    Handles ``status_code`` set on :class:`support.BadResponse`, the response
+    attached to a ``requests`` HTTPError (raised by Cloudant), and the ``resp``
+    attached to a googleapiclient HttpError.
+
+    Returns:
+        int: The status code, or None if the exception doesn't carry one.
+
+    """
+    status = getattr(exc, 'status_code', None)
+    if status is None and getattr(exc, 'response', None) is not None:
+        status = getattr(exc.response, 'status_code', None)
+    if status is None and getattr(exc, 'resp', None) is not None:
+        status = getattr(exc.resp, 'status', None)
+    return None if status is None else int(status)
+
+
+def is_retryable(exc):
+    """Whether a failed call might succeed if tried again."""
+    if isinstance(exc, (QuotaExceeded, CircuitOpen, DeadlinePassed)):
+        return False
+    status = get_status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError))
+
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=30.0, rng=random):
+    """Seconds to wait before retry number *attempt*, with full jitter.
+
+    The ceiling doubles with every attempt up to *max_delay*, and the delay is
+    drawn uniformly below it, so callers that failed together don't retry together.
+
+    """
+    ceiling = min(max_delay, base_delay * 2 ** attempt)
+    return rng.uniform(0, ceiling)
+
+
+class CircuitBreaker(object):
+    """Stops calls to a provider after consecutive failures.
+
+    After *failure_threshold* failures in a row the breaker opens, and calls are
+    refused for *reset_after* seconds. Then one trial call is let through: if it
+    succeeds the breaker closes, and if it fails the breaker opens again.
+
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_after=60.0, clock=time.monotonic):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """str: 'closed', 'open' or 'half-open'."""
+        if self._opened_at is None:
+            return 'closed'
+        if self._clock() - self._opened_at >= self.reset_after:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Whether a call may go through now."""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                self.logger.info(f"Circuit for '{self.name}' closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            reopening = self._trial_running
+            self._trial_running = False
+            if reopening or self._failures >= self.failure_threshold:
+                if self._opened_at is None or reopening:
+                    self.logger.warning(f"Circuit for '{self.name}' opened after "
+                                        f"{self._failures} failures")
+                self._opened_at = self._clock()
+
+
+class QuotaCounter(object):
+    """Requests made to a provider today, against its daily limit.
+
+    Args:
+        name (str): Provider name, part of the stored key.
+        daily_limit (int, optional): Requests allowed per calendar day. None means
+            count but never refuse, and the count is kept in memory only, since
+            nothing needs it in the next run.
+        store (cache.SQLiteCache, optional): Where counts against a limit are
+            kept. Defaults to the ``quotas`` table of the on-disk API cache,
+            shared by every provider.
+
+    """
+
+    def __init__(self, name, daily_limit=None, store=None):
+        self.name = name
+        self.daily_limit = daily_limit
+        self.store = store
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _key(self):
+        return f'{self.name}|{dt.date.today().isoformat()}'
+
+    def _get_count(self, key):
+        if self.daily_limit is None:
+            return self._counts.get(key, 0)
+        if self.store is None:
+            self.store = cache.get_quota_store()
+        return self.store.peek(key) or 0
+
+    def _set_count(self, key, count):
+        if self.daily_limit is None:
+            self._counts[key] = count
+        else:
+            self.store.set(key, count)
+
+    @property
+    def used(self):
+        """int: Requests counted today."""
+        with self._lock:
+            return self._get_count(self._key())
+
+    @property
+    def remaining(self):
+        """int: Requests left today, or None if there is no limit."""
+        if self.daily_limit is None:
+            return None
+        return max(self.daily_limit - self.used, 0)
+
+    def consume(self, count=1):
+        """Count *count* requests, or refuse if they would go over the limit.
+
+        Raises:
+            QuotaExceeded: If today's limit would be exceeded.
+
+        """
+        with self._lock:
+            key = self._key()
+            used = self._get_count(key)
+            if self.daily_limit is not None and used + count > self.daily_limit:
+                raise QuotaExceeded(f"Daily quota of {self.daily_limit} requests to "
+                                    f"'{self.name}' used up")
+            self._set_count(key, used + count)
+
+
+class Provider(object):
+    """Calls to one external service, with retries, a breaker and a quota.
+
+    Args:
+        name (str): Service name, used in logs and the quota key.
+        max_attempts (int, optional): Tries per call, including the first. Defaults to 4.
+        base_delay (float, optional): Ceiling of the first backoff, in seconds.
+        max_delay (float, optional): Largest backoff ceiling, in seconds.
+        breaker (CircuitBreaker, optional): Defaults to one with default settings.
+        quota (QuotaCounter, optional): Defaults to an unlimited counter.
+        sleep (callable, optional): Waits between attempts; replaceable in tests.
+
+    """
+
+    def __init__(self, name, max_attempts=4, base_delay=0.5, max_delay=30.0,
+                 breaker=None, quota=None, sleep=time.sleep):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker(name)
+        self.quota = quota or QuotaCounter(name)
+        self._sleep = sleep
+
+    def call(self, func, *args, cost=1, idempotent=True, **kwargs):
+        """Call *func*, retrying transient failures.
+
+        Args:
+            func (callable): Makes one request to the provider.
+            cost (int, optional): Quota transactions each attempt uses. Defaults to 1.
+            idempotent (bool, optional): Whether making the request twice is
+                harmless. If not, it is tried only once, since a timeout or a
+                5xx can come after the request took effect.
+            *args, **kwargs: Passed to *func*.
+
+        Raises:
+            CircuitOpen: If the provider's breaker is open.
+            QuotaExceeded: If an attempt would go over the daily quota.
+            DeadlinePassed: If a retry is due after the thread's :func:`deadline`.
+            Exception: Whatever *func* last raised, if it isn't retryable or no
+                attempts are left.
+
+        """
+        calls = metrics.counter('deathpledge_api_calls_total', 'Requests to external services, by outcome',
+                                ['provider', 'outcome'])
+        max_attempts = self.max_attempts if idempotent else 1
+        for attempt in range(max_attempts):
+            if not self.breaker.allow():
+                calls.inc(provider=self.name, outcome='rejected')
+                raise CircuitOpen(f"'{self.name}' is failing; not calling it for now")
+            self.quota.consume(cost)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                calls.inc(provider=self.name, outcome='error')
+                retryable = is_retryable(e)
+                if not retryable:
+                    # The provider answered; the request itself was bad
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt == max_attempts - 1:
+                    raise
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                seconds_left = _seconds_left()
+                if seconds_left is not None and seconds_left < delay:
+                    calls.inc(provider=self.name, outcome='abandoned')
+                    raise DeadlinePassed(f"'{self.name}' call given up on before retry {attempt + 1}") from e
+                self.logger.warning(f"'{self.name}' call failed ({e}), "
+                                    f"retry {attempt + 1} in {delay:.1f}s")
+                self._sleep(delay)
+            else:
+                calls.inc(provider=self.name, outcome='ok')
+                self.breaker.record_success()
+                return result
+
+
+DEFAULT_SETTINGS = {
+    'bing': dict(max_attempts=4, daily_quota=None),
+    'cloudant': dict(max_attempts=3, daily_quota=None),
+    'google_sheets': dict(max_attempts=3, daily_quota=None),
+    'citymapper': dict(max_attempts=2, daily_quota=None),
+}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name):
+    """Get the provider for a service, configured from the keys file on first use."""
+    with _providers_lock:
+        if name not in _providers:
+            settings = dict(DEFAULT_SETTINGS.get(name, {}))
+            settings.update(keys.get('Resilience', {}).get(name) or {})
+            _providers[name] = Provider(
+                name,
+                max_attempts=settings.get('max_attempts', 4),
+                base_delay=settings.get('base_delay', 0.5),
+                max_delay=settings.get('max_delay', 30.0),
+                breaker=CircuitBreaker(
+                    name,
+                    failure_threshold=settings.get('failure_threshold', 5),
+                    reset_after=settings.get('reset_after', 60.0)
+                ),
+                quota=QuotaCounter(name, daily_limit=settings.get('daily_quota'))
+            )
+        return _providers[name]
+
+
+def log_quota_usage():
+    """Report how much of each provider's daily quota has been used."""
+    for name, provider in _providers.items():
+        quota = provider.quota
+        limit = '' if quota.daily_limit is None else f' of {quota.daily_limit}'
+        logger.info(f"'{name}' requests today: {quota.used}{limit}")
@@ -0,0 +1,250 @@
+"""
+Load a GTFS feed into compact arrays for transit routing.
+
+Only the trips running on one service day are kept. Trips that visit the
+same stops in the same order are grouped into a :class:`Pattern`, whose
+arrival and departure times are (trips x stops) arrays sorted by departure,
+which is the layout RAPTOR scans. Stops within a short walk of each other
+are linked with footpaths, on top of any in ``transfers.txt``.
+
+"""
+import datetime as dt
+import logging
+import zipfile
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from deathpledge import spatial, support
+
+logger = logging.getLogger(__name__)
+
+# GTFS route_type values that Bing reports as trains; everything else is a bus
+TRAIN_ROUTE_TYPES = {0, 1, 2, 5, 7, 12}
+
+WALK_MPH = 3.0
+WALK_DETOUR_FACTOR = 1.25  # street distance over straight-line distance
+MAX_TRANSFER_MILES = 0.25
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def walk_seconds(miles):
+    """Seconds to walk a straight-line distance, allowing for the street grid."""
+    return np.asarray(miles) * WALK_DETOUR_FACTOR / WALK_MPH * 3600
+
+
+def parse_gtfs_times(times):
+    """Convert ``'HH:MM:SS'`` strings to seconds after midnight.
+
+    Hours can run past 24 for trips that finish after midnight.
+
+    """
+    times = pd.Series(times, dtype=str)
+    if times.empty:
+        return np.array([], dtype=np.int32)
+    parts = times.str.strip().str.split(':', expand=True).astype(int)
+    return (parts[0] * 3600 + parts[1] * 60 + parts[2]).to_numpy(dtype=np.int32)
+
+
+class Pattern(object):
+    """Trips that all visit the same stops in the same order.
+
+    Attributes:
+        stops (np.ndarray): Stop indices in visiting order.
+        arrivals (np.ndarray): (trips, stops) arrival times in seconds, trips
+            sorted by departure from the first stop.
+        departures (np.ndarray): Same shape as *arrivals*.
+        mode (str): 'Bus' or 'Train'.
+
+    """
+    __slots__ = ('stops', 'arrivals', 'departures', 'mode')
+
+    def __init__(self, stops, arrivals, departures, mode):
+        self.stops = stops
+        self.arrivals = arrivals
+        self.departures = departures
+        self.mode = mode
+
+
+class TransitFeed(object):
+    """Stops, patterns and footpaths of a GTFS feed for one service day.
+
+    Attributes:
+        stop_ids (list): GTFS stop_id of each stop index.
+        stop_coords (np.ndarray): (stops, 2) latitude/longitude.
+        stop_index (spatial.PointIndex): For finding stops near a location.
+        patterns (list): :class:`Pattern` objects.
+        stop_patterns (list): For each stop, (pattern index, position) pairs.
+        footpaths (list): For each stop, (stop walked to, walk seconds) pairs.
+        service_date (datetime.date): Day the trips run on.
+
+    """
+
+    def __init__(self, stop_ids, stop_coords, patterns, footpaths, service_date):
+        self.stop_ids = stop_ids
+        self.stop_coords = stop_coords
+        self.stop_index = spatial.PointIndex(stop_coords)
+        self.patterns = patterns
+        self.footpaths = footpaths
+        self.service_date = service_date
+        self.stop_patterns = [[] for _ in stop_ids]
+        for p, pattern in enumerate(patterns):
+            for position, stop in enumerate(pattern.stops):
+                self.stop_patterns[stop].append((p, position))
+
+    def __repr__(self):
+        return (f'<TransitFeed {self.service_date}: {len(self.stop_ids)} stops, '
+                f'{len(self.patterns)} patterns>')
+
+
+def load_feed(filepath, service_date=None, max_transfer_miles=MAX_TRANSFER_MILES):
+    """Read a GTFS zip for the trips running on one day.
+
+    Args:
+        filepath (str): Path to the GTFS zip.
+        service_date (datetime.date, optional): Defaults to the day of the
+            configured work commute.
+        max_transfer_miles (float, optional): Stops closer than this are linked
+            with a footpath.
+
+    Returns:
+        TransitFeed
+
+    """
+    if service_date is None:
+        service_date = dt.datetime.fromisoformat(support.get_commute_datetime('iso')).date()
+    with zipfile.ZipFile(filepath) as feed_zip:
+        tables = {
+            name[:-len('.txt')]: _read_table(feed_zip, name)
+            for name in feed_zip.namelist() if name.endswith('.txt')
+        }
+
+    stops = tables['stops']
+    if 'location_type' in stops:
+        stops = stops.loc[pd.to_numeric(stops['location_type'], errors='coerce').fillna(0) == 0]
+    stop_ids = stops['stop_id'].tolist()
+    stop_lookup = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+    stop_coords = stops[['stop_lat', 'stop_lon']].astype(float).to_numpy()
+
+    services = active_services(tables.get('calendar'), tables.get('calendar_dates'), service_date)
+    trips = tables['trips']
+    trips = trips.loc[trips['service_id'].isin(services)]
+    route_types = tables['routes'].set_index('route_id')['route_type'].astype(int)
+    trip_modes = trips.set_index('trip_id')['route_id'].map(route_types).map(
+        lambda route_type: 'Train' if route_type in TRAIN_ROUTE_TYPES else 'Bus'
+    )
+    if trip_modes.empty:
+        logger.warning(f'No trips in the feed run on {service_date}')
+
+    patterns = _build_patterns(tables['stop_times'], trip_modes, stop_lookup)
+    footpaths = _build_footpaths(stop_coords, max_transfer_miles)
+    _add_listed_transfers(footpaths, tables.get('transfers'), stop_lookup)
+    feed = TransitFeed(stop_ids, stop_coords, patterns, footpaths, service_date)
+    logger.info(f'Loaded {feed}')
+    return feed
+
+
+def _read_table(feed_zip, name):
+    with feed_zip.open(name) as f:
+        return pd.read_csv(f, dtype=str, encoding='utf-8-sig', skipinitialspace=True)
+
+
+def active_services(calendar, calendar_dates, service_date):
+    """service_ids running on a date, from calendar.txt and calendar_dates.txt."""
+    services = set()
+    day = service_date.strftime('%Y%m%d')
+    if calendar is not None:
+        runs_today = (
+            (calendar[WEEKDAYS[service_date.weekday()]] == '1')
+            & (calendar['start_date'] <= day) & (calendar['end_date'] >= day)
+        )
+        services.update(calendar.loc[runs_today, 'service_id'])
+    if calendar_dates is not None:
+        today = calendar_dates.loc[calendar_dates['date'] == day]
+        services.update(today.loc[today['exception_type'] == '1', 'service_id'])
+        services.difference_update(today.loc[today['exception_type'] == '2', 'service_id'])
+    return services
+
+
+def _build_patterns(stop_times, trip_modes, stop_lookup):
+    stop_times = stop_times.loc[
+        stop_times['trip_id'].isin(trip_modes.index) & stop_times['stop_id'].isin(stop_lookup)
+    ].copy()
+    # Stops without times of their own take the other time, or are skipped
+    stop_times['arrival_time'] = stop_times['arrival_time'].fillna(stop_times['departure_time'])
+    stop_times['departure_time'] = stop_times['departure_time'].fillna(stop_times['arrival_time'])
+    stop_times = stop_times.dropna(subset=['arrival_time'])
+    stop_times['stop_sequence'] = stop_times['stop_sequence'].astype(int)
+    stop_times = stop_times.sort_values(['trip_id', 'stop_sequence'])
+    stop_times['arrival'] = parse_gtfs_times(stop_times['arrival_time'])
+    stop_times['departure'] = parse_gtfs_times(stop_times['departure_time'])
+    stop_times['stop'] = stop_times['stop_id'].map(stop_lookup)
+
+    trips_by_pattern = defaultdict(list)
+    for trip_id, trip in stop_times.groupby('trip_id', sort=False):
+        stops = tuple(trip['stop'])
+        if len(stops) < 2:
+            continue
+        key = (stops, trip_modes[trip_id])
+        trips_by_pattern[key].append((trip['arrival'].to_numpy(), trip['departure'].to_numpy()))
+
+    patterns = []
+    for (stops, mode), trips in trips_by_pattern.items():
+        trips.sort(key=lambda trip: trip[1][0])
+        for fifo_trips in _split_overtaking(trips):
+            patterns.append(Pattern(
+                stops=np.array(stops, dtype=np.int32),
+                arrivals=np.vstack([trip[0] for trip in fifo_trips]),
+                departures=np.vstack([trip[1] for trip in fifo_trips]),
+                mode=mode
+            ))
+    return patterns
+
+
+def _split_overtaking(trips):
+    """Split trips so that none overtakes another in the same pattern.
+
+    RAPTOR binary-searches a pattern's trips at any stop, which only works if
+    a trip that leaves first arrives first everywhere. An express that passes a
+    local goes into a pattern of its own.
+
+    """
+    groups = []
+    for trip in trips:
+        for group in groups:
+            if np.all(trip[0] >= group[-1][0]) and np.all(trip[1] >= group[-1][1]):
+                group.append(trip)
+                break
+        else:
+            groups.append([trip])
+    return groups
+
+
+def _build_footpaths(stop_coords, max_transfer_miles):
+    index = spatial.PointIndex(stop_coords)
+    footpaths = [[] for _ in range(len(stop_coords))]
+    if not len(stop_coords):
+        return footpaths
+    vectors = spatial.to_unit_vectors(stop_coords[:, 0], stop_coords[:, 1])
+    for stop, (lat, lon) in enumerate(stop_coords):
+        nearby = index.within(lat, lon, max_transfer_miles)
+        nearby = nearby[nearby != stop]
+        miles = spatial.chord_to_miles(np.linalg.norm(vectors[nearby] - vectors[stop], axis=1))
+        footpaths[stop] = list(zip(nearby.tolist(), walk_seconds(miles).tolist()))
+    return footpaths
+
+
+def _add_listed_transfers(footpaths, transfers, stop_lookup):
+    """Add footpaths from transfers.txt, which may link stops farther apart."""
+    if transfers is None or 'min_transfer_time' not in transfers:
+        return
+    for row in transfers.dropna(subset=['min_transfer_time']).itertuples():
+        if row.from_stop_id == row.to_stop_id:
+            continue
+        if row.from_stop_id not in stop_lookup or row.to_stop_id not in stop_lookup:
+            continue
+        from_stop, to_stop = stop_lookup[row.from_stop_id], stop_lookup[row.to_stop_id]
+        footpaths[from_stop] = [x for x in footpaths[from_stop] if x[0] != to_stop]
+        footpaths[from_stop].append((to_stop, float(row.min_transfer_time)))
@@ -0,0 +1,244 @@
+"""
+Arrive-by transit commutes with a reverse RAPTOR search.
+
+RAPTOR works in rounds: round *k* finds the best journeys using *k* vehicles
+by scanning each pattern once, rather than exploring a graph edge by edge.
+Run in reverse from a destination and an arrival deadline, it labels every
+stop with the latest time a rider can leave it and still arrive in time.
+
+Every home commutes to the same place at the same time, so the search runs
+once per destination. Routing a home is then just a look at the stops
+within walking distance of it, which makes a thousand homes a matter of
+seconds.
+
+"""
+import datetime as dt
+import logging
+import threading
+
+import numpy as np
+
+from deathpledge import keys, spatial, support
+from deathpledge.api_calls.bing import Commute
+from deathpledge.routing import gtfs
+
+logger = logging.getLogger(__name__)
+
+MAX_WALK_MILES = 0.75
+MAX_ROUNDS = 4
+
+# How the best label at a stop was reached, going forward in time
+_EGRESS, _TRIP, _WALK = 0, 1, 2
+
+
+class CommuteRouter(object):
+    """Latest departures from every stop to reach one destination on time.
+
+    Args:
+        feed (gtfs.TransitFeed): Transit network for the commute's service day.
+        destination (tuple): (lat, lon) of work.
+        arrive_by (str, optional): Arrival time as 24-hour ``'HH:MM'``. Defaults to
+            the time in ``support.get_commute_datetime``.
+        max_walk_miles (float, optional): Longest walk to the first stop and from
+            the last stop. Defaults to 0.75.
+        max_rounds (int, optional): Most vehicles in a journey. Defaults to 4.
+
+    """
+
+    def __init__(self, feed, destination, arrive_by=None, max_walk_miles=MAX_WALK_MILES,
+                 max_rounds=MAX_ROUNDS):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        self.feed = feed
+        self.destination = tuple(float(x) for x in destination)
+        if arrive_by is None:
+            arrive_by = dt.datetime.fromisoformat(support.get_commute_datetime('iso')).strftime('%H:%M')
+        hours, minutes = arrive_by.split(':')
+        self.deadline = int(hours) * 3600 + int(minutes) * 60
+        self.max_walk_miles = max_walk_miles
+        self.max_rounds = max_rounds
+
+        stop_count = len(feed.stop_ids)
+        self.latest_departure = np.full(stop_count, -np.inf)
+        self._how = np.full(stop_count, -1, dtype=np.int8)
+        self._mode = np.full(stop_count, '', dtype=object)
+        self._walk_to = np.full(stop_count, -1, dtype=np.int32)
+        self._walk_seconds = np.zeros(stop_count)
+        self._search()
+
+    def _walk_from(self, lat, lon):
+        """Stops within walking distance of a location, and seconds to walk to each."""
+        idx = self.feed.stop_index.within(lat, lon, self.max_walk_miles)
+        if not len(idx):
+            return idx, np.array([])
+        stop_vectors = spatial.to_unit_vectors(self.feed.stop_coords[idx, 0], self.feed.stop_coords[idx, 1])
+        chord = np.linalg.norm(stop_vectors - spatial.to_unit_vectors(lat, lon)[0], axis=1)
+        return idx, gtfs.walk_seconds(spatial.chord_to_miles(chord))
+
+    def _search(self):
+        feed = self.feed
+        best = self.latest_departure
+        footpaths_in = [[] for _ in feed.stop_ids]
+        for from_stop, paths in enumerate(feed.footpaths):
+            for to_stop, seconds in paths:
+                footpaths_in[to_stop].append((from_stop, seconds))
+
+        previous = np.full(len(best), -np.inf)
+        egress_stops, egress_seconds = self._walk_from(*self.destination)
+        for stop, seconds in zip(egress_stops, egress_seconds):
+            previous[stop] = self.deadline - seconds
+            best[stop] = previous[stop]
+            self._how[stop] = _EGRESS
+        marked = set(egress_stops.tolist())
+
+        for round_number in range(1, self.max_rounds + 1):
+            if not marked:
+                break
+            current = np.full(len(best), -np.inf)
+            newly_marked = set()
+
+            # Latest position in each pattern that a marked stop can be reached from
+            scan_from = {}
+            for stop in marked:
+                for p, position in feed.stop_patterns[stop]:
+                    scan_from[p] = max(scan_from.get(p, -1), position)
+
+            for p, last_position in scan_from.items():
+                pattern = feed.patterns[p]
+                trip = None
+                for position in range(last_position, -1, -1):
+                    stop = pattern.stops[position]
+                    if trip is not None:
+                        departure = pattern.departures[trip, position]
+                        if departure > best[stop]:
+                            current[stop] = best[stop] = departure
+                            self._how[stop] = _TRIP
+                            self._mode[stop] = pattern.mode
+                            newly_marked.add(stop)
+                    if previous[stop] > -np.inf:
+                        # Latest trip that reaches this stop by the time we must leave it
+                        later_trip = np.searchsorted(
+                            pattern.arrivals[:, position], previous[stop], side='right'
+                        ) - 1
+                        if later_trip >= 0 and (trip is None or later_trip > trip):
+                            trip = later_trip
+
+            for stop in list(newly_marked):
+                for from_stop, seconds in footpaths_in[stop]:
+                    departure = current[stop] - seconds
+                    if departure > best[from_stop]:
+                        current[from_stop] = best[from_stop] = departure
+                        self._how[from_stop] = _WALK
+                        self._walk_to[from_stop] = stop
+                        self._walk_seconds[from_stop] = seconds
+                        newly_marked.add(from_stop)
+            previous = current
+            marked = newly_marked
+        reachable = np.isfinite(best).sum()
+        self.logger.info(f'{reachable}/{len(best)} stops can reach the destination on time')
+
+    def get_commute(self, startcoords):
+        """Commute from a location, in the same form as Bing's.
+
+        Args:
+            startcoords (tuple): (lat, lon) of the home.
+
+        Returns:
+            Commute: Total minutes from leaving home to arriving at work, the mode
+                of the first vehicle ('Walk' if walking all the way is quickest),
+                and minutes of walking before boarding it. None if the
+                destination can't be reached on time.
+
+        """
+        lat, lon = float(startcoords[0]), float(startcoords[1])
+        stops, seconds = self._walk_from(lat, lon)
+        best_departure, best_stop, access_seconds = -np.inf, None, 0.0
+        if len(stops):
+            departures = self.latest_departure[stops] - seconds
+            i = int(np.argmax(departures))
+            best_departure, best_stop, access_seconds = departures[i], stops[i], seconds[i]
+
+        direct_miles = support.haversine((lat, lon), self.destination)
+        direct_seconds = float(gtfs.walk_seconds(direct_miles))
+        if direct_miles <= self.max_walk_miles and self.deadline - direct_seconds >= best_departure:
+            return Commute(commute_time=float(round(direct_seconds / 60, 0)), first_leg='Walk',
+                           first_walk=round(direct_seconds / 60, 1))
+        if best_stop is None or not np.isfinite(best_departure):
+            return None
+
+        commute_time = float(round((self.deadline - best_departure) / 60, 0))
+        first_walk = access_seconds
+        stop = best_stop
+        while self._how[stop] == _WALK:
+            first_walk += self._walk_seconds[stop]
+            stop = self._walk_to[stop]
+        if self._how[stop] == _EGRESS:
+            # Quickest to walk all the way, by way of a stop near work
+            return Commute(commute_time=commute_time, first_leg='Walk',
+                           first_walk=float(round((self.deadline - best_departure) / 60, 1)))
+        return Commute(
+            commute_time=commute_time,
+            first_leg=self._mode[stop],
+            first_walk=float(round(first_walk / 60, 1))
+        )
+
+
+class TransitRouter(object):
+    """Commutes over a GTFS feed, answering the same requests as Bing's.
+
+    A :class:`CommuteRouter` is built the first time each destination and
+    arrival time is asked for, and reused for every home after that.
+
+    Args:
+        feed (gtfs.TransitFeed): Transit network for the commute's service day.
+        max_walk_miles (float, optional): Longest walk to and from stops.
+
+    """
+    name = 'gtfs'
+    cache_results = False
+
+    def __init__(self, feed, max_walk_miles=MAX_WALK_MILES):
+        self.feed = feed
+        self.max_walk_miles = max_walk_miles
+        self._routers = {}
+        self._lock = threading.Lock()
+
+    def get_router(self, destination, arrive_by):
+        key = (tuple(round(float(x), 6) for x in destination), arrive_by)
+        with self._lock:
+            if key not in self._routers:
+                self._routers[key] = CommuteRouter(self.feed, destination, arrive_by,
+                                                   max_walk_miles=self.max_walk_miles)
+            return self._routers[key]
+
+    def get_commute(self, commute_request):
+        """Commute for a ``BingCommuteAPICall``, like ``BingMapsAPI.get_commute``.
+
+        Returns:
+            Commute: Or None if the feed has no way to arrive on time.
+
+        """
+        url_args = commute_request.url_args
+        bing_datetime = url_args.get('dateTime') or url_args.get('datetime')
+        arrive_by = dt.datetime.strptime(bing_datetime, '%m/%d/%Y %H:%M:%S').strftime('%H:%M')
+        destination = [float(x) for x in url_args['wp.1'].split(',')]
+        startcoords = [float(x) for x in url_args['wp.0'].split(',')]
+        return self.get_router(destination, arrive_by).get_commute(startcoords)
+
+
+_transit_router = None
+
+
+def get_transit_router():
+    """Get the router over the GTFS feed in the keys file, if one is configured.
+
+    Configured under ``Routing`` with a ``gtfs_feed`` path.
+
+    Returns:
+        TransitRouter: Or None, to use Bing for transit.
+
+    """
+    global _transit_router
+    settings = keys.get('Routing') or {}
+    if _transit_router is None and settings.get('gtfs_feed'):
+        _transit_router = TransitRouter(gtfs.load_feed(settings['gtfs_feed']))
+    return _transit_router
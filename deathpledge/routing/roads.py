@@ -0,0 +1,308 @@
+"""
+Driving times and distances over a local road graph.
+
+The graph is read from an OSM-derived edge list, such as OSMnx's node and
+edge tables saved as CSV, into a sparse CSR matrix of travel seconds. Every
+home drives to the same few favorite places, so each query runs Dijkstra
+once per destination on the reversed graph, which gives the fastest drive
+to that destination from every node at once. Distance along the fastest
+drive is summed over the shortest-path tree with pointer jumping, so no
+path is walked node by node in Python.
+
+:class:`RoadRouter` answers the same request objects as
+:class:`~deathpledge.api_calls.bing.BingMapsAPI`'s ``get_driving_info`` and
+``get_distance_matrix``, so it can stand in for Bing for driving.
+
+"""
+import datetime as dt
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from deathpledge import keys, spatial, support
+from deathpledge.api_calls.bing import Drive
+
+logger = logging.getLogger(__name__)
+
+METERS_PER_MILE = 1609.344
+DEFAULT_SPEED_MPH = 25.0
+
+# Getting from the home to the nearest graph node, e.g. down a driveway or lot
+ACCESS_MPH = 10.0
+ACCESS_DETOUR_FACTOR = 1.3
+
+
+class RoadGraph(object):
+    """Directed road network in CSR form.
+
+    Attributes:
+        node_coords (np.ndarray): (nodes, 2) latitude/longitude.
+        node_index (spatial.PointIndex): For snapping locations to nodes.
+        edge_source, edge_target (np.ndarray): Node indices of each edge.
+        edge_miles (np.ndarray): Length of each edge.
+        edge_seconds (np.ndarray): Free-flow travel time of each edge.
+        edge_class (np.ndarray): OSM ``highway`` value of each edge, e.g. 'primary'.
+
+    """
+
+    def __init__(self, node_coords, edge_source, edge_target, edge_miles, edge_seconds, edge_class):
+        self.node_coords = np.asarray(node_coords, dtype=float)
+        self.node_index = spatial.PointIndex(self.node_coords)
+        self.edge_source = edge_source
+        self.edge_target = edge_target
+        self.edge_miles = edge_miles
+        self.edge_seconds = edge_seconds
+        self.edge_class = edge_class
+
+    def __len__(self):
+        return len(self.node_coords)
+
+    def __repr__(self):
+        return f'<RoadGraph: {len(self)} nodes, {len(self.edge_source)} edges>'
+
+    def reverse_csr(self, edge_seconds):
+        """(target, source) matrix, for searching backward from destinations."""
+        return csr_matrix((edge_seconds, (self.edge_target, self.edge_source)),
+                          shape=(len(self), len(self)))
+
+
+def load_road_graph(edges_path, nodes_path):
+    """Read a road graph from OSMnx-style CSV tables.
+
+    Args:
+        edges_path (str): One row per directed edge, with columns ``u``, ``v``,
+            ``length`` (meters) and optionally ``speed_kph``, ``highway`` and
+            ``oneway``. A row with ``oneway`` false is also added in reverse
+            unless the reverse edge is listed too.
+        nodes_path (str): One row per node, with columns ``osmid``, ``y`` (lat)
+            and ``x`` (lon).
+
+    Returns:
+        RoadGraph
+
+    """
+    nodes = pd.read_csv(nodes_path, usecols=['osmid', 'y', 'x'])
+    node_lookup = pd.Series(np.arange(len(nodes)), index=nodes['osmid'])
+    edges = pd.read_csv(edges_path)
+    edges = edges.loc[edges['u'].isin(node_lookup.index) & edges['v'].isin(node_lookup.index)]
+
+    if 'speed_kph' in edges:
+        speed_mph = pd.to_numeric(edges['speed_kph'], errors='coerce') / 1.609344
+    else:
+        speed_mph = pd.Series(np.nan, index=edges.index)
+    edges = pd.DataFrame({
+        'source': node_lookup[edges['u']].to_numpy(),
+        'target': node_lookup[edges['v']].to_numpy(),
+        'miles': edges['length'].astype(float).to_numpy() / METERS_PER_MILE,
+        'mph': speed_mph.fillna(DEFAULT_SPEED_MPH).to_numpy(),
+        'highway': edges['highway'].astype(str).to_numpy() if 'highway' in edges else 'unclassified',
+        'oneway': _as_bool(edges['oneway']).to_numpy() if 'oneway' in edges else True,
+    })
+    two_way = edges.loc[~edges['oneway']].rename(columns={'source': 'target', 'target': 'source'})
+    edges = pd.concat([edges, two_way], ignore_index=True)
+    edges['seconds'] = edges['miles'] / edges['mph'] * 3600
+    # Parallel edges would be summed in the sparse matrix; keep only the fastest
+    edges = edges.sort_values('seconds').drop_duplicates(['source', 'target'])
+
+    graph = RoadGraph(
+        node_coords=nodes[['y', 'x']].to_numpy(),
+        edge_source=edges['source'].to_numpy(dtype=np.int64),
+        edge_target=edges['target'].to_numpy(dtype=np.int64),
+        edge_miles=edges['miles'].to_numpy(),
+        edge_seconds=edges['seconds'].to_numpy(),
+        edge_class=edges['highway'].to_numpy(dtype=object),
+    )
+    logger.info(f'Loaded {graph}')
+    return graph
+
+
+def _as_bool(values):
+    return values.astype(str).str.strip().str.lower().isin(['true', '1', 'yes'])
+
+
+class SpeedFactors(object):
+    """Time-of-day slowdowns standing in for Bing's ``timeWithTraffic``.
+
+    Args:
+        periods (list): Dicts with ``days`` (weekday numbers, 0 = Monday),
+            ``start`` and ``end`` (``'HH:MM'``), and ``factors``, mapping OSM
+            road class to the fraction of free-flow speed, with an optional
+            ``default`` for other classes. Periods are checked in order.
+
+    Examples:
+        >>> rush = SpeedFactors([{'days': [0, 1, 2, 3, 4], 'start': '16:00', 'end': '19:00',
+        ...                       'factors': {'motorway': 0.5, 'default': 0.8}}])
+        >>> rush.factors_for(0, '18:00')
+        {'motorway': 0.5, 'default': 0.8}
+
+    """
+
+    def __init__(self, periods=None):
+        self.periods = periods or []
+
+    def factors_for(self, dayofweek, hrmin):
+        if dayofweek is None or hrmin is None:
+            return {}
+        for period in self.periods:
+            if dayofweek in period.get('days', range(7)) and period['start'] <= hrmin < period['end']:
+                return period['factors']
+        return {}
+
+    def edge_seconds(self, graph, dayofweek, hrmin):
+        """Travel time of every edge at a day and time."""
+        factors = self.factors_for(dayofweek, hrmin)
+        if not factors:
+            return graph.edge_seconds
+        default = factors.get('default', 1.0)
+        factor = np.array([factors.get(x, default) for x in graph.edge_class], dtype=float)
+        return graph.edge_seconds / factor
+
+
+class RoadRouter(object):
+    """Fastest drives over a road graph, in the same form as Bing's.
+
+    Args:
+        graph (RoadGraph): Road network.
+        speed_factors (SpeedFactors, optional): Slowdowns by time of day.
+
+    """
+    name = 'roads'
+    cache_results = False
+
+    def __init__(self, graph, speed_factors=None):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        self.graph = graph
+        self.speed_factors = speed_factors or SpeedFactors()
+        self._reverse_csr = {}
+
+    def _snap(self, coords):
+        """Nearest node to each location, and the extra miles to reach it."""
+        coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        nodes, miles = [], []
+        for lat, lon in coords:
+            distance, idx = self.graph.node_index.nearest(lat, lon)
+            nodes.append(int(idx[0]))
+            miles.append(float(distance[0]) * ACCESS_DETOUR_FACTOR)
+        return np.array(nodes), np.array(miles)
+
+    def _graph_for(self, dayofweek, hrmin):
+        factors = self.speed_factors.factors_for(dayofweek, hrmin)
+        key = tuple(sorted(factors.items()))
+        if key not in self._reverse_csr:
+            edge_seconds = self.speed_factors.edge_seconds(self.graph, dayofweek, hrmin)
+            self._reverse_csr[key] = (self.graph.reverse_csr(edge_seconds), edge_seconds)
+        return self._reverse_csr[key]
+
+    def drive_matrix(self, origins, destinations, dayofweek=None, hrmin=None):
+        """Fastest drive from every origin to every destination.
+
+        Args:
+            origins (list): (lat, lon) of each start.
+            destinations (list): (lat, lon) of each end.
+            dayofweek (int, optional): Day of the drive, where 0 = Monday.
+            hrmin (str, optional): Departure time, e.g. ``'18:00'``.
+
+        Returns:
+            dict: {(origin index, destination index): Drive}. Pairs with no route
+                are left out.
+
+        """
+        reverse_csr, edge_seconds = self._graph_for(dayofweek, hrmin)
+        origin_nodes, origin_access = self._snap(origins)
+        dest_nodes, dest_access = self._snap(destinations)
+        seconds, predecessors = dijkstra(reverse_csr, indices=dest_nodes, return_predecessors=True)
+
+        edge_miles = csr_matrix(
+            (self.graph.edge_miles, (self.graph.edge_target, self.graph.edge_source)),
+            shape=reverse_csr.shape
+        )
+        drives = {}
+        for j in range(len(dest_nodes)):
+            miles = _tree_distances(predecessors[j], edge_miles)
+            for i, node in enumerate(origin_nodes):
+                if not np.isfinite(seconds[j, node]):
+                    continue
+                access_miles = origin_access[i] + dest_access[j]
+                total_seconds = seconds[j, node] + access_miles / ACCESS_MPH * 3600
+                drives[(i, j)] = Drive(
+                    distance='{:.2f} miles'.format(miles[node] + access_miles),
+                    duration=str(dt.timedelta(seconds=round(total_seconds)))
+                )
+        return drives
+
+    def get_driving_info(self, driving_request):
+        """Drive for a ``BingDrivingAPICall``, like ``BingMapsAPI.get_driving_info``."""
+        url_args = driving_request.url_args
+        start = [float(x) for x in url_args['wp.0'].split(',')]
+        end = [float(x) for x in url_args['wp.1'].split(',')]
+        dayofweek, hrmin = _parse_departure(url_args.get('datetime'), '%m/%d/%Y %H:%M:%S')
+        drives = self.drive_matrix([start], [end], dayofweek, hrmin)
+        if (0, 0) not in drives:
+            raise support.BadResponse('No route between these points in the road graph.')
+        return drives[(0, 0)]
+
+    def get_distance_matrix(self, matrix_request):
+        """Drives for a ``BingDistanceMatrixAPICall``, like ``BingMapsAPI.get_distance_matrix``."""
+        url_args = matrix_request.url_args
+        origins = [[float(x) for x in point.split(',')] for point in url_args['origins'].split(';')]
+        destinations = [[float(x) for x in point.split(',')]
+                        for point in url_args['destinations'].split(';')]
+        dayofweek, hrmin = _parse_departure(url_args.get('startTime'))
+        return self.drive_matrix(origins, destinations, dayofweek, hrmin)
+
+
+def _parse_departure(value, datetime_format=None):
+    if value is None:
+        return None, None
+    if datetime_format is None:
+        departure = dt.datetime.fromisoformat(value)
+    else:
+        departure = dt.datetime.strptime(value, datetime_format)
+    return departure.weekday(), departure.strftime('%H:%M')
+
+
+def _tree_distances(predecessors, edge_miles):
+    """Miles from every node to the root of a shortest-path tree.
+
+    Each node's distance is its edge to its parent plus the parent's distance.
+    Rather than following each path, every node's pointer is doubled each pass
+    (parent, then grandparent, ...), so all distances are done in log(depth)
+    vectorized passes.
+
+    """
+    node_count = len(predecessors)
+    nodes = np.arange(node_count)
+    has_parent = predecessors >= 0
+    parent = np.where(has_parent, predecessors, nodes)
+    miles = np.zeros(node_count)
+    # predecessors come from the reversed graph, so a node's parent is the next
+    # node on its drive to the destination
+    miles[has_parent] = np.asarray(edge_miles[parent[has_parent], nodes[has_parent]]).ravel()
+    while np.any(parent != parent[parent]):
+        miles = miles + miles[parent] * (parent != nodes)
+        parent = parent[parent]
+    return miles
+
+
+_road_router = None
+
+
+def get_road_router():
+    """Get the router over the road graph in the keys file, if one is configured.
+
+    Configured under ``Routing`` with ``road_edges`` and ``road_nodes`` paths and
+    optional ``speed_factors`` periods.
+
+    Returns:
+        RoadRouter: Or None, to use Bing for driving.
+
+    """
+    global _road_router
+    settings = keys.get('Routing') or {}
+    if _road_router is None and settings.get('road_edges'):
+        graph = load_road_graph(settings['road_edges'], settings['road_nodes'])
+        _road_router = RoadRouter(graph, SpeedFactors(settings.get('speed_factors')))
+    return _road_router
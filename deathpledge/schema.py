@@ -0,0 +1,120 @@
+"""Fields of a home: what kind of value each holds, and how to check it.
+
+Each field is declared once here. :mod:`deathpledge.cleaning` compiles the
+schema into the parser for each field, and :mod:`deathpledge.post.clean`
+takes column dtypes and validation from it, so a field that is added,
+renamed or retyped is changed in one place.
+
+Kinds:
+    number: A string like ``'$425,000'`` or ``'1,850 sqft'``, parsed to a float.
+    fee: A number with an optional frequency, like ``'295.16/Monthly'``. The
+        frequency goes in ``<name>_frequency``.
+    list: Comma-separated values, like ``'Range, Dishwasher, and Washer'``.
+    address: The full street address, parsed into ``parsed_address``.
+    date: A date in one of the formats HomeScout uses.
+    status: Listing status, stored title case.
+    text: Kept as it is.
+"""
+from collections import namedtuple
+
+Field = namedtuple('Field', ['name', 'kind', 'units', 'nullable'], defaults=[None, True])
+
+KIND_DTYPES = {
+    'number': 'float64',
+    'fee': 'float64',
+    'list': 'object',
+    'address': 'object',
+    'date': 'object',
+    'status': 'object',
+    'text': 'object',
+}
+
+FIELDS = [
+    # Currencies
+    Field('list_price', 'number', units='USD'),
+    Field('sale_price', 'number', units='USD'),
+    Field('price_per_sqft', 'number', units='USD/sqft'),
+    Field('price_sqft', 'number', units='USD/sqft'),
+    Field('total_taxes', 'number', units='USD'),
+    Field('county_tax', 'number', units='USD'),
+    Field('tax_value', 'number', units='USD'),
+    Field('city_tax', 'number', units='USD'),
+    Field('school_tax', 'number', units='USD'),
+    Field('estimated_value', 'number', units='USD'),
+    # Integers
+    Field('beds', 'number', units='count'),
+    Field('sqft', 'number', units='sqft'),
+    Field('lot_size_sqft', 'number', units='sqft'),
+    Field('tax_year', 'number', units='year'),
+    # Floats
+    Field('baths', 'number', units='count'),
+    Field('lot_size_acres', 'number', units='acres'),
+    # Fees
+    Field('hoa_fee', 'fee', units='USD'),
+    Field('hoa_fee_frequency', 'text'),
+    Field('condocoop_fee', 'fee', units='USD'),
+    Field('condocoop_fee_frequency', 'text'),
+    # Lists
+    Field('hoa_condo_coop_amenities', 'list'),
+    Field('hoa_condo_coop_fee_includes', 'list'),
+    Field('appliances', 'list'),
+    Field('interior_features', 'list'),
+    Field('room_list', 'list'),
+    Field('exterior_features', 'list'),
+    Field('garage_feature', 'list'),
+    Field('lot_features', 'list'),
+    Field('basement_type', 'list'),
+    Field('wall_ceiling_types', 'list'),
+    Field('accessibility_features', 'list'),
+    Field('utilities', 'list'),
+    Field('property_condition', 'list'),
+    Field('security_features', 'list'),
+    # Everything else cleaning touches
+    Field('full_address', 'address', nullable=False),
+    Field('new_on_homescout', 'date'),
+    Field('status', 'status', nullable=False),
+]
+FIELDS_BY_NAME = {field.name: field for field in FIELDS}
+
+
+def names(kind=None, units=None):
+    """Names of fields, optionally only those of a kind and/or units."""
+    return [field.name for field in FIELDS
+            if (kind is None or field.kind == kind) and (units is None or field.units == units)]
+
+
+def required():
+    """Names of fields every home must have."""
+    return [field.name for field in FIELDS if not field.nullable]
+
+
+def dtypes(columns=None):
+    """{column: dtype} for schema fields, optionally only those among *columns*."""
+    columns = FIELDS_BY_NAME if columns is None else columns
+    return {x: KIND_DTYPES[FIELDS_BY_NAME[x].kind] for x in columns if x in FIELDS_BY_NAME}
+
+
+def validate_frame(df: 'pd.DataFrame'):
+    """Check a frame of homes against the schema.
+
+    Returns:
+        list: Messages for missing or empty required columns, and for values in
+            numeric columns that aren't numbers. Empty if the frame is valid.
+
+    """
+    import pandas as pd
+
+    problems = []
+    for name in required():
+        if name not in df:
+            problems.append(f"Required column '{name}' is missing")
+        elif df[name].isna().any():
+            problems.append(f"Required column '{name}' has {df[name].isna().sum()} empty values")
+    for name in names('number') + names('fee'):
+        if name not in df:
+            continue
+        bad = pd.to_numeric(df[name], errors='coerce').isna() & df[name].notna()
+        if bad.any():
+            examples = df.loc[bad, name].unique()[:3].tolist()
+            problems.append(f"Column '{name}' has {bad.sum()} values that aren't numbers, e.g. {examples}")
+    return problems
@@ -16,7 +16,7 @@ from datetime import datetime
 from tqdm import tqdm
 
 import deathpledge
-from deathpledge import support, classes, cleaning
+from deathpledge import support, classes, cleaning, metrics
 from deathpledge.api_calls import homescout as hs, check
 
 logger = logging.getLogger(__name__)
@@ -100,10 +100,12 @@ def scrape_from_url_df(urls, sign_in=False, *args, **kwargs) -> tuple:
                 continue
             except:
                 logger.exception(f'Scrape failed for {row.url}')
+                count_scrape_failure()
                 continue
             else:
                 current_home.docid = support.create_house_id(current_home['mls_number'])
                 scraped_homes.append(current_home)
+                count_page_scraped()
     return scraped_homes, closed_homes
 
 
@@ -124,6 +126,8 @@ def scrape_from_homescout_gallery(db_client, max_pages: int, *args, **kwargs):
                         update_changed_doc_with_card(clean_db, card)
                     except KeyError:
                         pass
+                else:
+                    count_skipped_doc()
             else:
                 current_home = classes.Home(url=card.url, docid=card.docid)
                 try:
@@ -131,11 +135,27 @@ def scrape_from_homescout_gallery(db_client, max_pages: int, *args, **kwargs):
                     wait_a_random_time()
                 except:
                     logger.error('Scraping failed for {card.url}', exc_info=True)
+                    count_scrape_failure()
                 else:
                     new_homes.append(current_home)
+                    count_page_scraped()
     return new_homes
 
 
+def count_page_scraped(source='homescout'):
+    metrics.counter('deathpledge_pages_scraped_total', 'Listing pages scraped', ['source']).inc(source=source)
+
+
+def count_scrape_failure(source='homescout'):
+    metrics.counter('deathpledge_scrape_failures_total', 'Listing pages that failed to scrape',
+                    ['source']).inc(source=source)
+
+
+def count_skipped_doc():
+    metrics.counter('deathpledge_docs_total', 'Docs by what happened to them, per database',
+                    ['db', 'outcome']).inc(db=deathpledge.DATABASE_NAME, outcome='skipped')
+
+
 def update_changed_doc_with_card(clean_db, card):
     """Update price, status, and scrape time with gallery card."""
     doc = clean_db[card.docid]
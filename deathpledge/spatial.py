@@ -0,0 +1,327 @@
+"""Nearest-neighbor lookups over latitude/longitude points.
+
+Points are placed on the unit sphere as 3-D vectors so that a KD-tree's
+straight-line (chord) distance orders them exactly like great-circle
+distance, with no distortion away from the equator.
+"""
+import ast
+import json
+import logging
+import threading
+from os import path, makedirs
+
+import numpy as np
+
+import deathpledge
+from deathpledge.support import EARTH_RADIUS_MILES
+
+logger = logging.getLogger(__name__)
+
+HOME_INDEX_PATH = path.join(deathpledge.PROJ_PATH, 'data', 'cache', 'home_index.json')
+
+
+def to_unit_vectors(lat, lon):
+    """Convert degrees latitude/longitude to (N, 3) points on the unit sphere."""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_miles(chord):
+    """Great-circle miles for a chord length on the unit sphere."""
+    chord = np.clip(np.asarray(chord, dtype=float), 0, 2)
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(chord / 2)
+
+
+def miles_to_chord(miles):
+    """Chord length on the unit sphere for a great-circle distance in miles."""
+    angle = np.asarray(miles, dtype=float) / EARTH_RADIUS_MILES
+    return 2 * np.sin(np.minimum(angle, np.pi) / 2)
+
+
+class PointIndex(object):
+    """KD-tree over a fixed set of lat/lon points.
+
+    Args:
+        coords (array-like): (N, 2) latitude/longitude pairs in degrees.
+
+    """
+
+    def __init__(self, coords):
+        from scipy.spatial import cKDTree  # only needed once there are points, so importing stays light
+
+        coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        self.coords = coords
+        self._tree = cKDTree(to_unit_vectors(coords[:, 0], coords[:, 1]))
+
+    def __len__(self):
+        return len(self.coords)
+
+    def nearest(self, lat, lon, k=1):
+        """Find the *k* points closest to a location.
+
+        Returns:
+            tuple: (miles, indices) as arrays sorted nearest first. Fewer than *k*
+                results are returned if the index is smaller than *k*.
+
+        """
+        k = min(k, len(self))
+        if k == 0:
+            return np.array([]), np.array([], dtype=int)
+        chord, idx = self._tree.query(to_unit_vectors(lat, lon)[0], k=k)
+        return chord_to_miles(np.atleast_1d(chord)), np.atleast_1d(idx)
+
+    def within(self, lat, lon, miles):
+        """Indices of all points within *miles* of a location, nearest first."""
+        if not len(self):
+            return np.array([], dtype=int)
+        point = to_unit_vectors(lat, lon)[0]
+        idx = np.array(self._tree.query_ball_point(point, r=float(miles_to_chord(miles))), dtype=int)
+        if not len(idx):
+            return idx
+        chord = np.linalg.norm(self._tree.data[idx] - point, axis=1)
+        return idx[np.argsort(chord)]
+
+
+class _StatusBucket(object):
+    """Homes with one status: a KD-tree, plus homes added since it was built.
+
+    Homes moved or removed since the build are masked out of the tree rather
+    than rebuilding it each time. Once the changes pile up, the tree is rebuilt.
+
+    """
+
+    def __init__(self):
+        self.tree_docids = []
+        self.tree = PointIndex([])
+        self.alive = np.array([], dtype=bool)
+        self.positions = {}
+        self.pending = {}
+        self._pending_vectors = None
+
+    def __len__(self):
+        return len(self.positions) + len(self.pending)
+
+    @property
+    def changes(self):
+        return len(self.pending) + int((~self.alive).sum())
+
+    def add(self, docid, coords):
+        self.pending[docid] = coords
+        self._pending_vectors = None
+
+    def discard(self, docid):
+        if self.pending.pop(docid, None) is not None:
+            self._pending_vectors = None
+        elif docid in self.positions:
+            self.alive[self.positions.pop(docid)] = False
+
+    def rebuild(self):
+        docids = [x for x in self.tree_docids if x in self.positions] + list(self.pending)
+        coords = ([self.tree.coords[self.positions[x]] for x in self.tree_docids if x in self.positions]
+                  + list(self.pending.values()))
+        self.tree_docids = docids
+        self.tree = PointIndex(coords)
+        self.alive = np.ones(len(docids), dtype=bool)
+        self.positions = {docid: i for i, docid in enumerate(docids)}
+        self.pending = {}
+        self._pending_vectors = None
+
+    def _pending_miles(self, lat, lon):
+        if not self.pending:
+            return [], np.array([])
+        if self._pending_vectors is None:
+            coords = np.array(list(self.pending.values()), dtype=float)
+            self._pending_vectors = list(self.pending), to_unit_vectors(coords[:, 0], coords[:, 1])
+        docids, vectors = self._pending_vectors
+        chord = np.linalg.norm(vectors - to_unit_vectors(lat, lon)[0], axis=1)
+        return docids, chord_to_miles(chord)
+
+    def within(self, lat, lon, miles):
+        idx = self.tree.within(lat, lon, miles)
+        idx = idx[self.alive[idx]] if len(idx) else idx
+        results = list(zip([self.tree_docids[i] for i in idx],
+                           self._tree_miles(lat, lon, idx)))
+        docids, pending_miles = self._pending_miles(lat, lon)
+        close = np.flatnonzero(pending_miles <= miles)
+        results.extend((docids[i], pending_miles[i]) for i in close)
+        return results
+
+    def nearest(self, lat, lon, k):
+        # Masked-out homes take up places in the tree's answer, so ask for more
+        masked = len(self.alive) - len(self.positions)
+        miles, idx = self.tree.nearest(lat, lon, k=k + masked)
+        keep = self.alive[idx] if len(idx) else np.array([], dtype=bool)
+        results = list(zip([self.tree_docids[i] for i in idx[keep]], miles[keep]))
+        docids, pending_miles = self._pending_miles(lat, lon)
+        if len(pending_miles) > k:
+            closest = np.argpartition(pending_miles, k)[:k]
+        else:
+            closest = range(len(pending_miles))
+        results.extend((docids[i], pending_miles[i]) for i in closest)
+        return results
+
+    def _tree_miles(self, lat, lon, idx):
+        if not len(idx):
+            return []
+        chord = np.linalg.norm(self.tree._tree.data[idx] - to_unit_vectors(lat, lon)[0], axis=1)
+        return chord_to_miles(chord)
+
+
+class HomeIndex(object):
+    """Every home's geocoords, for radius, nearest and bounding-box queries.
+
+    Homes are bucketed by status, each bucket with its own KD-tree, so "the
+    five nearest closed homes" only searches closed homes. The index is
+    updated one home at a time as homes are enriched; new and moved homes are
+    kept aside and checked directly until there are enough to rebuild a tree.
+
+    Args:
+        homes (iterable, optional): Docs with ``_id`` (or ``docid``),
+            ``geocoords`` and ``status``. Those without geocoords are skipped.
+        rebuild_fraction (float, optional): Fraction of a bucket's homes that can
+            change before its tree is rebuilt.
+
+    """
+    min_rebuild = 256
+
+    def __init__(self, homes=(), rebuild_fraction=0.1):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        self.rebuild_fraction = rebuild_fraction
+        self._homes = {}
+        self._buckets = {}
+        self._lock = threading.RLock()
+        for home in homes:
+            self.update(home, rebuild=False)
+        for bucket in self._buckets.values():
+            bucket.rebuild()
+
+    def __len__(self):
+        return len(self._homes)
+
+    def __contains__(self, docid):
+        return docid in self._homes
+
+    @staticmethod
+    def _docid(home):
+        return home.get('_id') or home.get('docid') or getattr(home, 'docid', None)
+
+    @staticmethod
+    def _status(status):
+        return str(status).title() if status else 'Unknown'
+
+    def update(self, home, rebuild=True):
+        """Add a home, or move it if its geocoords or status changed.
+
+        Returns:
+            bool: Whether the home is in the index afterwards; False if it has
+                no docid or geocoords.
+
+        """
+        docid, coords = self._docid(home), home.get('geocoords')
+        if not docid or not coords:
+            return False
+        coords = (float(coords[0]), float(coords[1]))
+        status = self._status(home.get('status'))
+        with self._lock:
+            if self._homes.get(docid) == (coords, status):
+                return True
+            self.remove(docid)
+            self._homes[docid] = (coords, status)
+            bucket = self._buckets.setdefault(status, _StatusBucket())
+            bucket.add(docid, coords)
+            if rebuild and bucket.changes > max(self.min_rebuild, self.rebuild_fraction * len(bucket)):
+                bucket.rebuild()
+        return True
+
+    def remove(self, docid):
+        with self._lock:
+            entry = self._homes.pop(docid, None)
+            if entry is not None:
+                self._buckets[entry[1]].discard(docid)
+
+    def _buckets_for(self, status):
+        if status is None:
+            return list(self._buckets.values())
+        statuses = [status] if isinstance(status, str) else status
+        return [self._buckets[x] for x in map(self._status, statuses) if x in self._buckets]
+
+    def within(self, lat, lon, miles, status=None):
+        """Homes within *miles* of a location.
+
+        Args:
+            status (str or list, optional): Only homes with this status, or any
+                of these statuses, e.g. ``'Closed'``.
+
+        Returns:
+            list: (docid, miles) tuples, nearest first.
+
+        """
+        with self._lock:
+            results = [x for bucket in self._buckets_for(status) for x in bucket.within(lat, lon, miles)]
+        return sorted(results, key=lambda x: x[1])
+
+    def nearest(self, lat, lon, k=5, status=None):
+        """The *k* homes closest to a location, optionally only with some status.
+
+        Returns:
+            list: (docid, miles) tuples, nearest first.
+
+        """
+        with self._lock:
+            results = [x for bucket in self._buckets_for(status) for x in bucket.nearest(lat, lon, k)]
+        return sorted(results, key=lambda x: x[1])[:k]
+
+    def in_bbox(self, south, west, north, east, status=None):
+        """Docids of homes inside a latitude/longitude box."""
+        center_lat, center_lon = (south + north) / 2, (west + east) / 2
+        corner = to_unit_vectors([south, north], [west, east])
+        half_diagonal = chord_to_miles(np.linalg.norm(corner[1] - corner[0])) / 2
+        # Circle around the box, then trim to the box
+        candidates = self.within(center_lat, center_lon, half_diagonal * 1.01, status=status)
+        docids = []
+        for docid, _ in candidates:
+            lat, lon = self._homes[docid][0]
+            if south <= lat <= north and west <= lon <= east:
+                docids.append(docid)
+        return docids
+
+    @classmethod
+    def from_csv(cls, filepath, **kwargs):
+        """Index a ``post`` snapshot, such as ``data/01-raw.csv``."""
+        import pandas as pd
+
+        df = pd.read_csv(filepath, usecols=lambda x: x in ('_id', 'docid', 'geocoords', 'status'))
+        df['geocoords'] = df['geocoords'].map(lambda x: ast.literal_eval(x) if isinstance(x, str) else None)
+        return cls(df.to_dict('records'), **kwargs)
+
+    def save(self, filepath=HOME_INDEX_PATH):
+        makedirs(path.dirname(filepath), exist_ok=True)
+        with self._lock:
+            records = {docid: [*coords, status] for docid, (coords, status) in self._homes.items()}
+        with open(filepath, 'w') as f:
+            json.dump(records, f)
+
+    @classmethod
+    def load(cls, filepath=HOME_INDEX_PATH, **kwargs):
+        """Index saved with :meth:`save`; empty if there isn't one yet."""
+        if not path.exists(filepath):
+            return cls(**kwargs)
+        with open(filepath, 'r') as f:
+            records = json.load(f)
+        homes = ({'_id': docid, 'geocoords': [lat, lon], 'status': status}
+                 for docid, (lat, lon, status) in records.items())
+        return cls(homes, **kwargs)
+
+
+_home_index = None
+
+
+def get_home_index():
+    """Get the index of every home, loaded from disk on first use."""
+    global _home_index
+    if _home_index is None:
+        _home_index = HomeIndex.load()
+        logger.info(f'Loaded index of {len(_home_index)} homes')
+    return _home_index
@@ -1,17 +1,30 @@
 """Generic functions to support other modules."""
 
-import requests
+import importlib.util
+import re
+import sys
+import unicodedata
 from math import radians, cos, sin, asin, sqrt
 import datetime
 from datetime import datetime as dt
-from fake_useragent import UserAgent
-from django.utils.text import slugify
+from zoneinfo import ZoneInfo
 
 import deathpledge
 
+# Commute times are local to the homes, in the DC area
+LOCAL_TIMEZONE = ZoneInfo('America/New_York')
+
 
 class BadResponse(Exception):
-    pass
+    """An API sent back something other than a usable response.
+
+    Args:
+        status_code (int, optional): HTTP status of the response, if there was one.
+
+    """
+    def __init__(self, *args, status_code=None):
+        super().__init__(*args)
+        self.status_code = status_code
 
 
 def timing(f):
@@ -25,6 +38,42 @@ def timing(f):
     return timed
 
 
+def lazy_import(name):
+    """A module that is only really imported the first time it is used.
+
+    For heavy dependencies that a command might not need at all, like
+    selenium for ``--help``.
+
+    Examples:
+        >>> pd = lazy_import('pandas')  # nothing imported yet
+        >>> pd.DataFrame  # imported now
+        <class 'pandas.core.frame.DataFrame'>
+
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def slugify(value):
+    """Lowercase ASCII words joined by dashes, as Django 3.1's ``slugify`` makes.
+
+    Examples:
+        >>> slugify(' Café & Bar -- 2nd floor ')
+        'cafe-bar-2nd-floor'
+
+    """
+    value = unicodedata.normalize('NFKD', str(value)).encode('ascii', 'ignore').decode('ascii')
+    value = re.sub(r'[^\w\s-]', '', value.lower()).strip()
+    return re.sub(r'[-\s]+', '-', value)
+
+
 def str_coords(coords):
     str_list = [str(x) for x in coords]
     return ','.join(str_list)
@@ -32,13 +81,16 @@ def str_coords(coords):
 
 def check_status_of_website(url):
     """Make sure get() returns a 200"""
+    import requests
+    from fake_useragent import UserAgent
+
     ua = UserAgent(verify_ssl=False)
     header = {'User-Agent': str(ua.firefox)}
     result = requests.get(url, headers=header)
     return result.status_code
 
 
-def get_commute_datetime(mode, dayofweek=1, hrmin='06:30'):
+def get_commute_datetime(mode, dayofweek=1, hrmin='06:30', now=None):
     """Get my work commute time for the next day specified.
 
     By default, work time is 06:30 and day is Tuesday.
@@ -46,17 +98,19 @@ def get_commute_datetime(mode, dayofweek=1, hrmin='06:30'):
 
     Args:
         mode (str): Determines how to format the resulting string.
-            Either 'bing', or 'cm' for citymapper.
+            Either 'bing', 'iso' for the Bing distance matrix, or 'cm' for citymapper.
         dayofweek (int, optional): Index of weekday. Defaults to 1 (Tuesday).
             0=Mon, 1=Tue, 2=Wed, 3=Thur, 4=Fri, 5=Sat, 6=Sun
         hrmin (str, optional): 24-hour specifying departure or arrival time. Defaults to 6:30 AM.
             It's the departure time if driving, arrival time if transit.
+        now (datetime, optional): When to look ahead from. Defaults to now.
 
     Returns:
-        str: Formatted as datetime for chosen *mode*.
+        str: Formatted as datetime for chosen *mode*. For 'cm', with the
+            Eastern UTC offset in effect on that day.
 
     """
-    now = dt.now()
+    now = now or dt.now()
     days_ahead = dayofweek - now.weekday()
     if days_ahead <= 0:  # Target day already happened this week
         days_ahead += 7
@@ -66,10 +120,13 @@ def get_commute_datetime(mode, dayofweek=1, hrmin='06:30'):
 
     # Format for mode
     if mode == 'cm':
-        return '{}-0400'.format(work_datetime.isoformat())
+        return work_datetime.replace(tzinfo=LOCAL_TIMEZONE).isoformat()
     elif mode == 'bing':
         # dateTime=03/01/2011 05:42:00
         return work_datetime.strftime('%m/%d/%Y %H:%M:%S')
+    elif mode == 'iso':
+        # startTime=2011-03-01T05:42:00
+        return work_datetime.isoformat()
 
 
 def str_time_to_min(s):
@@ -82,11 +139,14 @@ def str_time_to_min(s):
     return delta.total_seconds()/60
 
 
+EARTH_RADIUS_MILES = 3959.87433  # For kilometers use 6372.8 km
+
+
 def haversine(coords1, coords2):
     """ Get distance between two lat/lon pairs using the Haversine formula."""
     lat1, lon1 = coords1
     lat2, lon2 = coords2
-    R = 3959.87433  # this is in miles. For kilometers use 6372.8 km
+    R = EARTH_RADIUS_MILES
 
     dLat = radians(lat2 - lat1)
     dLon = radians(lon2 - lon1)
@@ -115,18 +175,102 @@ def create_house_id(mls):
     return clean_mls
 
 
-def coerce_date_string_to_date(date_str):
-    date_str_formats = ['%m/%d/%Y', '%Y-%m-%dT%H:%M:%S', '%m-%d-%Y']
-    date_object = date_str
-    for date_format in date_str_formats:
+# Formats tried in order; no string matches more than one
+DATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%dT%H:%M:%S', '%m-%d-%Y']
+# Regexes for the usual shape of each format, and the characters any match must contain
+_DATE_SHAPES = {
+    '%m/%d/%Y': (re.compile(r'([0-9]{1,2})/([0-9]{1,2})/([0-9]{4})'), '/'),
+    '%Y-%m-%dT%H:%M:%S': (
+        re.compile(r'([0-9]{4})-([0-9]{1,2})-([0-9]{1,2})T([0-9]{1,2}):([0-9]{1,2}):([0-9]{1,2})'), '-:'
+    ),
+    '%m-%d-%Y': (re.compile(r'([0-9]{1,2})-([0-9]{1,2})-([0-9]{4})'), '-'),
+}
+# Format that last parsed a date, for each source field
+_last_date_formats = {}
+
+
+def coerce_date_string_to_date(date_str, source=None):
+    """Parse a date in any of :data:`DATE_FORMATS`.
+
+    The format that worked last time for the same *source* is tried first,
+    and the usual shape of each format is read with a regex instead of
+    ``strptime``; anything the regex doesn't cover still goes to ``strptime``,
+    so results are the same as trying each format in order.
+
+    Args:
+        date_str (str): Date to parse.
+        source (str, optional): Field the date came from, e.g. ``'sold'``, whose
+            dates all tend to share a format.
+
+    Returns:
+        datetime: The parsed date, or *date_str* unchanged if it isn't a string
+            or isn't in any of the formats.
+
+    """
+    if not isinstance(date_str, str):
+        return date_str
+    last_format = _last_date_formats.get(source)
+    if last_format is not None:
+        parsed = _parse_date_format(date_str, last_format)
+        if parsed is not None:
+            return parsed
+    for date_format in DATE_FORMATS:
+        if date_format == last_format:
+            continue
+        parsed = _parse_date_format(date_str, date_format)
+        if parsed is not None:
+            _last_date_formats[source] = date_format
+            return parsed
+    return date_str
+
+
+def _parse_date_format(date_str, date_format):
+    """Date in one format, or None if it isn't in that format."""
+    pattern, separators = _DATE_SHAPES[date_format]
+    if not all(x in date_str for x in separators):
+        return None
+    match = pattern.fullmatch(date_str)
+    if match is not None:
+        parts = [int(x) for x in match.groups()]
+        if date_format != '%Y-%m-%dT%H:%M:%S':
+            month, day, year = parts
+            parts = [year, month, day]
         try:
-            date_object = dt.strptime(date_str, date_format)
-            break
-        except TypeError:
-            break
+            return dt(*parts)
         except ValueError:
-            continue
-    return date_object
+            pass
+    try:
+        return dt.strptime(date_str, date_format)
+    except ValueError:
+        return None
+
+
+def coerce_date_strings(values, source=None):
+    """:func:`coerce_date_string_to_date` for a whole array of dates.
+
+    Each distinct string is parsed once; anything else is left as it is.
+
+    Args:
+        values (array-like): Dates, e.g. a column of a DataFrame.
+
+    Returns:
+        A Series with the same index if *values* is a Series, otherwise an
+            object array.
+
+    """
+    import numpy as np  # only needed here, so importing support stays light
+    import pandas as pd
+
+    result = np.empty(len(values), dtype=object)
+    result[:] = list(values)
+    is_str = np.array([isinstance(x, str) for x in result], dtype=bool)
+    codes, uniques = pd.factorize(result[is_str])
+    parsed = np.empty(len(uniques), dtype=object)
+    parsed[:] = [coerce_date_string_to_date(x, source=source) for x in uniques]
+    result[is_str] = parsed[codes]
+    if isinstance(values, pd.Series):
+        return pd.Series(result, index=values.index, name=values.name, dtype=object)
+    return result
 
 
 def update_modified_date(home):
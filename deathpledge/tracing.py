@@ -0,0 +1,263 @@
+"""Where a run's time goes: spans around pipeline stages and external calls.
+
+Wrap a stage or call in a span, as a context manager or a decorator::
+
+    with tracing.span('clean', homes=len(homes)):
+        cleaning.clean_batch(homes)
+
+    @tracing.traced()
+    def bulk_upload(docs, db_name, client):
+        ...
+
+Spans cost one flag check until a run is started with :func:`start_run`, so
+library code and tests can be traced freely. A finished run writes a JSON
+trace, in the Trace Event format that chrome://tracing and Perfetto open, and
+a table of time per span name, to ``data/traces``.
+
+With ``profile=True`` every :func:`stage` also runs under cProfile. A stage
+nested in another is profiled on its own, and its time is left out of the
+outer stage's profile. Profiles of stages with the same name are added
+together and written as ``.prof`` files next to the trace, for ``pstats`` or
+snakeviz.
+"""
+from datetime import datetime
+from os import path, makedirs
+import contextlib
+import cProfile
+import functools
+import itertools
+import json
+import logging
+import pstats
+import threading
+import time
+
+import deathpledge
+from deathpledge import metrics
+
+TRACE_DIR = path.join(deathpledge.PROJ_PATH, 'data', 'traces')
+
+logger = logging.getLogger(__name__)
+
+
+class Tracer(object):
+    """Collects the spans of one run.
+
+    Args:
+        profile (bool, optional): Run stages under cProfile.
+
+    """
+    def __init__(self, profile=False):
+        self.logger = logging.getLogger(f'{__name__}.{type(self).__name__}')
+        self.profile = profile
+        self.run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.spans = []
+        self.profiles = {}
+        self._origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self, name):
+        stack = getattr(self._local, name, None)
+        if stack is None:
+            stack = []
+            setattr(self._local, name, stack)
+        return stack
+
+    @contextlib.contextmanager
+    def span(self, name, stage=False, **attrs):
+        """Time the block as a span, recording any exception that escapes it."""
+        parents = self._stack('spans')
+        span_id = next(self._ids)
+        record = {
+            'name': name,
+            'id': span_id,
+            'parent': parents[-1] if parents else None,
+            'thread': threading.current_thread().name,
+            'attrs': attrs,
+            'error': None,
+        }
+        profiler = self._start_profile() if stage and self.profile else None
+        parents.append(span_id)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record['error'] = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+            parents.pop()
+            if profiler is not None:
+                self._stop_profile(name, profiler)
+            record['start'] = start - self._origin
+            record['duration'] = end - start
+            with self._lock:
+                self.spans.append(record)
+            metrics.histogram('deathpledge_span_seconds', 'Time per stage or external call',
+                              ['span']).observe(record['duration'], span=name)
+
+    def _start_profile(self):
+        # Only one profiler runs in a thread at a time, so pause the outer stage's
+        profilers = self._stack('profilers')
+        if profilers:
+            profilers[-1].disable()
+        profiler = cProfile.Profile()
+        profilers.append(profiler)
+        profiler.enable()
+        return profiler
+
+    def _stop_profile(self, name, profiler):
+        profiler.disable()
+        profilers = self._stack('profilers')
+        profilers.pop()
+        if profilers:
+            profilers[-1].enable()
+        with self._lock:
+            self.profiles.setdefault(name, []).append(profiler)
+
+    def summary(self):
+        """Time per span name, slowest total first.
+
+        Returns:
+            list: Dicts of name, count, total and max seconds, and errors.
+
+        """
+        rows = {}
+        for record in self.spans:
+            row = rows.setdefault(record['name'], {
+                'name': record['name'], 'count': 0, 'total': 0.0, 'max': 0.0, 'errors': 0,
+            })
+            row['count'] += 1
+            row['total'] += record['duration']
+            row['max'] = max(row['max'], record['duration'])
+            row['errors'] += record['error'] is not None
+        return sorted(rows.values(), key=lambda x: x['total'], reverse=True)
+
+    def format_summary(self):
+        """The summary as a text table."""
+        rows = self.summary()
+        width = max([len(x['name']) for x in rows] + [4])
+        lines = [f'{"span":{width}s} {"count":>7s} {"total s":>9s} {"mean ms":>9s} {"max ms":>9s} {"errors":>6s}']
+        for row in rows:
+            lines.append(
+                f'{row["name"]:{width}s} {row["count"]:7d} {row["total"]:9.3f} '
+                f'{row["total"] / row["count"] * 1000:9.1f} {row["max"] * 1000:9.1f} {row["errors"]:6d}'
+            )
+        return '\n'.join(lines)
+
+    def to_trace_events(self):
+        """The run in Trace Event format, with the summary as extra data."""
+        threads = {}
+        events = []
+        for record in sorted(self.spans, key=lambda x: x['start']):
+            args = dict(record['attrs'], id=record['id'], parent=record['parent'])
+            if record['error']:
+                args['error'] = record['error']
+            events.append({
+                'name': record['name'],
+                'ph': 'X',
+                'ts': round(record['start'] * 1e6, 1),
+                'dur': round(record['duration'] * 1e6, 1),
+                'pid': 1,
+                'tid': threads.setdefault(record['thread'], len(threads) + 1),
+                'args': args,
+            })
+        for thread, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': thread}})
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'run_id': self.run_id, 'summary': self.summary()},
+        }
+
+    def write(self, trace_dir=TRACE_DIR):
+        """Write the trace, the summary table and any profiles.
+
+        Returns:
+            str: Path of the JSON trace.
+
+        """
+        makedirs(trace_dir, exist_ok=True)
+        trace_path = path.join(trace_dir, f'{self.run_id}.trace.json')
+        with open(trace_path, 'w') as f:
+            json.dump(self.to_trace_events(), f, default=str)
+        with open(path.join(trace_dir, f'{self.run_id}.summary.txt'), 'w') as f:
+            f.write(self.format_summary() + '\n')
+        for name, profilers in self.profiles.items():
+            stats = pstats.Stats(*profilers)
+            stats.dump_stats(path.join(trace_dir, f'{self.run_id}.{name}.prof'))
+        self.logger.info(f'Wrote trace to {trace_path}')
+        return trace_path
+
+
+_tracer = None
+
+
+def get_tracer():
+    """The tracer of the current run, or None if no run was started."""
+    return _tracer
+
+
+def start_run(profile=False):
+    """Start collecting spans, and return the new :class:`Tracer`."""
+    global _tracer
+    _tracer = Tracer(profile=profile)
+    return _tracer
+
+
+def finish_run(trace_dir=TRACE_DIR):
+    """Stop collecting spans, log the summary and write the trace.
+
+    Returns:
+        str: Path of the JSON trace, or None if no run was started.
+
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return None
+    logger.info(f'Time per span:\n{tracer.format_summary()}')
+    return tracer.write(trace_dir)
+
+
+def span(name, **attrs):
+    """Time a block, if a run was started.
+
+    Args:
+        name (str): What the block does, e.g. ``'bing.BingGeocoderAPICall'``.
+        **attrs: Details for the trace, e.g. the number of homes.
+
+    """
+    if _tracer is None:
+        return contextlib.nullcontext()
+    return _tracer.span(name, **attrs)
+
+
+def stage(name, **attrs):
+    """Time a pipeline stage, and profile it if the run is being profiled."""
+    if _tracer is None:
+        return contextlib.nullcontext()
+    return _tracer.span(name, stage=True, **attrs)
+
+
+def traced(name=None):
+    """Decorator that times each call to a function as a span.
+
+    Args:
+        name (str, optional): Span name. Defaults to the function's qualified
+            name, e.g. ``HomeScoutWebsite.sign_into_website``.
+
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -7,7 +7,7 @@ from tqdm import tqdm
 
 import deathpledge
 from deathpledge.api_calls import google_sheets as gs
-from deathpledge import database, support
+from deathpledge import database, support, resilience
 
 logger = logging.getLogger(__name__)
 
@@ -75,7 +75,7 @@ def update_sale_price(row, doc):
 
 
 def update_sold_date(row, doc):
-    sold_date = support.coerce_date_string_to_date(row.sold)
+    sold_date = support.coerce_date_string_to_date(row.sold, source='sold')
     doc['sold'] = sold_date.strftime(deathpledge.TIMEFORMAT)
 
 
@@ -98,18 +98,20 @@ def refresh_sold_list(google_creds, db_client):
     # Send to google
     service = build('sheets', 'v4', credentials=google_creds, cache_discovery=False)
 
+    sheets_provider = resilience.get_provider('google_sheets')
+
     # Clear existing values in all columns
-    clear_response = service.spreadsheets().values().clear(
+    clear_response = sheets_provider.call(service.spreadsheets().values().clear(
             spreadsheetId=gs.SPREADSHEET_DICT['spreadsheetId'],
             range=gs.SPREADSHEET_DICT['sold_values']
-            ).execute()
+            ).execute)
     logger.info(clear_response)
 
     data_obj = dict(
         range=gs.SPREADSHEET_DICT['sold_sheet'],
         majorDimension='ROWS',
         values=sold_list)
-    data_response = service.spreadsheets().values().batchUpdate(
+    data_response = sheets_provider.call(service.spreadsheets().values().batchUpdate(
         spreadsheetId=gs.SPREADSHEET_DICT['spreadsheetId'],
         body=dict(
             valueInputOption='USER_ENTERED',
@@ -117,7 +119,7 @@ def refresh_sold_list(google_creds, db_client):
             data=[
                 data_obj
             ])
-    ).execute()
+    ).execute)
     logger.info(data_response)
 
 
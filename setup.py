@@ -8,7 +8,6 @@ setup(
     install_requires=[
         'beautifulsoup4',
         'cloudant',
-        'Django',
         'fake-useragent',
         'google-api-python-client',
         'oauthlib',
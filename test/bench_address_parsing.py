@@ -0,0 +1,72 @@
+"""
+Benchmark address parsing with and without the parsed address caches.
+
+Times each address through the ``usaddress`` tagger directly, then through
+``cleaning._parsed_address`` with an empty cache, with only the on-disk
+cache, and with the in-memory LRU, then a batch across a process pool. The
+on-disk cache is a throwaway file, not the real one. Run with::
+
+    python -m test.bench_address_parsing --addresses 2000
+
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from deathpledge import cleaning
+from deathpledge.api_calls import cache
+
+STREETS = ['NORTH MAPLE DR', 'Wilson Blvd', 'S Glebe Rd', '7th Rd S', 'Columbia Pike']
+CITIES = ['ALEXANDRIA VA 22302', 'Arlington, VA 22201', 'Falls Church VA 22046']
+
+
+def make_addresses(count):
+    rng = random.Random(0)
+    return [f'{rng.randint(1, 9999)} {rng.choice(STREETS)} #{i} {rng.choice(CITIES)}' for i in range(count)]
+
+
+def time_per_address(label, fn, addresses, baseline=None):
+    start = time.perf_counter()
+    for address in addresses:
+        fn(address)
+    seconds = (time.perf_counter() - start) / len(addresses)
+    speedup = f'  ({baseline / seconds:.0f}x faster)' if baseline else ''
+    print(f'{label + ":":24s}{seconds * 1e6:8.1f} us per address{speedup}')
+    return seconds
+
+
+def run(address_count, processes):
+    addresses = make_addresses(address_count)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache._address_cache = cache.AddressCache(db_path=os.path.join(tmpdir, 'bench.sqlite3'))
+        cleaning._address_lru.clear()
+
+        tagger = time_per_address('tagger, no cache', cleaning._tag_address, addresses)
+        time_per_address('cold cache', cleaning._parsed_address, addresses, tagger)
+        cleaning._address_lru.clear()
+        time_per_address('on-disk cache', cleaning._parsed_address, addresses, tagger)
+        time_per_address('in-memory LRU', cleaning._parsed_address, addresses[-cleaning.ADDRESS_LRU_SIZE:],
+                         tagger)
+
+        cache._address_cache.close()
+        cache._address_cache = cache.AddressCache(db_path=os.path.join(tmpdir, 'batch.sqlite3'))
+        cleaning._address_lru.clear()
+        start = time.perf_counter()
+        cleaning.parse_addresses(addresses, processes=processes)
+        seconds = (time.perf_counter() - start) / len(addresses)
+        print(f'{"batch, process pool:":24s}{seconds * 1e6:8.1f} us per address  ({tagger / seconds:.1f}x faster)')
+        cache._address_cache.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--addresses', type=int, default=2000)
+    parser.add_argument('--processes', type=int, default=None, help='defaults to one per CPU')
+    args = parser.parse_args()
+    run(args.addresses, args.processes)
+
+
+if __name__ == '__main__':
+    main()
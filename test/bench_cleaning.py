@@ -0,0 +1,50 @@
+"""
+Benchmark batch cleaning against cleaning one home at a time.
+
+Cleans the same randomly generated raw docs with ``Home.clean`` in a loop and
+with ``cleaning.clean_batch``, checks that they agree, and prints both times.
+Addresses are parsed the same way in both, so they are left out unless
+``--addresses`` is given. Run with::
+
+    python -m test.bench_cleaning --homes 5000
+
+"""
+import argparse
+import logging
+import time
+
+from deathpledge import cleaning
+from test.test_cleaning import make_raw_docs, make_homes
+
+
+def run(home_count, addresses):
+    docs = make_raw_docs(home_count)
+    if not addresses:
+        for doc in docs:
+            doc.pop('full_address', None)
+    loop_homes, batch_homes = make_homes(docs), make_homes(docs)
+    logging.disable(logging.WARNING)
+
+    start = time.perf_counter()
+    for home in loop_homes:
+        home.clean()
+    loop_seconds = time.perf_counter() - start
+    print(f'Home.clean loop:{loop_seconds:7.3f}s')
+
+    start = time.perf_counter()
+    cleaning.clean_batch(batch_homes)
+    batch_seconds = time.perf_counter() - start
+    print(f'clean_batch:    {batch_seconds:7.3f}s  ({loop_seconds / batch_seconds:.1f}x faster)')
+    assert [dict(x) for x in batch_homes] == [dict(x) for x in loop_homes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--homes', type=int, default=5000)
+    parser.add_argument('--addresses', action='store_true', help='include address parsing')
+    args = parser.parse_args()
+    run(args.homes, args.addresses)
+
+
+if __name__ == '__main__':
+    main()
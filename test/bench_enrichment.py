@@ -0,0 +1,82 @@
+"""
+Benchmark Bing enrichment offline against the stand-in server.
+
+Enriches a batch of synthetic homes with every Bing step, first with cold
+caches and then again with warm ones, and reports wall time and how many
+requests reached the server. Run with::
+
+    python -m test.bench_enrichment --homes 50 --latency 0.1
+
+"""
+import argparse
+import time
+from unittest import mock
+
+from deathpledge import resilience
+from deathpledge.api_calls import bing, cache, locations, metro, standin
+from test import helpers
+
+
+def make_homes(count):
+    return [
+        {'full_address': f'{100 + i} Test St, Arlington, VA', 'parsed_address': {'ZipCode': '22204'}}
+        for i in range(count)
+    ]
+
+
+def make_registry():
+    registry = helpers.make_registry()
+    registry.favorite_driving = {
+        name: locations.Destination(name, 'addr', bing.Geocoords(38.8, -77.1), day, '18:00')
+        for name, day in [('Gym', 0), ('Market', 5)]
+    }
+    return registry
+
+
+def enrich_all(homes, registry):
+    for home in homes:
+        bing.BingDataGetter(home, registry=registry, force=True).add_data_to_home(driving=False)
+    bing.add_driving_to_homes(homes, registry, force=True)
+
+
+def run(home_count, latency, error_rate):
+    registry = make_registry()
+    throwaway = dict(
+        _geocode_cache=cache.GeocodeCache(db_path=':memory:'),
+        _route_cache=cache.RouteCache(db_path=':memory:'),
+    )
+    station_index = metro.MetroStationIndex(cache.SQLiteCache('stations', db_path=':memory:'))
+    provider = resilience.Provider('bing', base_delay=latency, quota=resilience.QuotaCounter(
+        'bing', store=cache.SQLiteCache('quotas', db_path=':memory:')
+    ))
+    with standin.StandInBingServer(latency=latency, error_rate=error_rate, seed=0) as server, \
+            mock.patch.multiple(cache, **throwaway), \
+            mock.patch.object(metro, '_station_index', station_index), \
+            mock.patch.dict(resilience._providers, bing=provider):
+        previous_url = bing.set_base_url(server.base_url)
+        try:
+            for label in ['cold cache', 'warm cache']:
+                request_count = len(server.requests)
+                start = time.perf_counter()
+                enrich_all(make_homes(home_count), registry)
+                elapsed = time.perf_counter() - start
+                print(f'{label:>10}: {home_count} homes in {elapsed:6.2f}s, '
+                      f'{len(server.requests) - request_count} requests')
+        finally:
+            bing.set_base_url(previous_url)
+    for name, value in throwaway.items():
+        print(f"{name.strip('_')}: {value.stats}")
+    print(f'bing requests counted against quota: {provider.quota.used}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--homes', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds per request')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    run(args.homes, args.latency, args.error_rate)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark vectorized great-circle distances against the scalar haversine loop.
+
+Times every home's tether to the centerpoint, computed one home at a time
+with ``support.haversine`` and all at once with ``geodesic.distance_to``,
+then a chunked distance matrix from every home to a set of places. Run with::
+
+    python -m test.bench_geodesic --homes 100000 --places 50
+
+"""
+import argparse
+import time
+
+import numpy as np
+
+from deathpledge import geodesic, support
+
+CENTER = (38.9, -77.0)
+
+
+def run(home_count, place_count):
+    rng = np.random.default_rng(0)
+    coords = np.column_stack([rng.uniform(38.6, 39.2, home_count), rng.uniform(-77.4, -76.8, home_count)])
+    places = coords[rng.choice(home_count, size=place_count, replace=False)]
+    home_list = [tuple(x) for x in coords.tolist()]
+
+    start = time.perf_counter()
+    scalar = [support.haversine(home, CENTER) for home in home_list]
+    scalar_seconds = time.perf_counter() - start
+    print(f'tether, scalar loop:{scalar_seconds:7.3f}s')
+
+    for label, homes in [('from list', home_list), ('from array', coords)]:
+        start = time.perf_counter()
+        vectorized = geodesic.distance_to(homes, CENTER)
+        vectorized_seconds = time.perf_counter() - start
+        print(f'tether, {label + ":":12s}{vectorized_seconds:7.3f}s  '
+              f'({scalar_seconds / vectorized_seconds:.0f}x faster)')
+        np.testing.assert_allclose(vectorized, scalar)
+
+    start = time.perf_counter()
+    matrix = geodesic.distance_matrix(coords, places, dtype=np.float32)
+    print(f'{home_count} x {place_count} matrix: {time.perf_counter() - start:7.3f}s  '
+          f'({matrix.nbytes / 1e6:.0f} MB)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--homes', type=int, default=100_000)
+    parser.add_argument('--places', type=int, default=50)
+    args = parser.parse_args()
+    run(args.homes, args.places)
+
+
+if __name__ == '__main__':
+    main()
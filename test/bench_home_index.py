@@ -0,0 +1,69 @@
+"""
+Benchmark radius, nearest and bounding-box queries on the index of every home.
+
+Builds a :class:`deathpledge.spatial.HomeIndex` over random homes around DC,
+times each kind of query, then times queries again with a few thousand homes
+updated since the last rebuild. Run with::
+
+    python -m test.bench_home_index --homes 100000 --queries 1000
+
+"""
+import argparse
+import time
+
+import numpy as np
+
+from deathpledge import spatial
+
+STATUSES = ['Active', 'Closed', 'Pending']
+
+
+def make_homes(rng, count, prefix='home'):
+    lats, lons = rng.uniform(38.6, 39.2, count), rng.uniform(-77.4, -76.8, count)
+    return [{'_id': f'{prefix}{i}', 'geocoords': [lat, lon], 'status': STATUSES[i % 3]}
+            for i, (lat, lon) in enumerate(zip(lats, lons))]
+
+
+def time_queries(index, points):
+    queries = {
+        'within 0.5 mi': lambda lat, lon: index.within(lat, lon, 0.5),
+        'nearest 10 closed': lambda lat, lon: index.nearest(lat, lon, k=10, status='Closed'),
+        'bbox 0.01 deg': lambda lat, lon: index.in_bbox(lat - 0.005, lon - 0.005, lat + 0.005, lon + 0.005),
+    }
+    for label, query in queries.items():
+        start = time.perf_counter()
+        for lat, lon in points:
+            query(lat, lon)
+        per_query = (time.perf_counter() - start) / len(points)
+        print(f'  {label + ":":20s}{per_query * 1e3:7.3f} ms per query')
+
+
+def run(home_count, query_count):
+    rng = np.random.default_rng(0)
+    homes = make_homes(rng, home_count)
+    points = rng.uniform([38.6, -77.4], [39.2, -76.8], size=(query_count, 2))
+
+    start = time.perf_counter()
+    index = spatial.HomeIndex(homes)
+    print(f'built index of {len(index)} homes in {time.perf_counter() - start:.2f}s')
+    time_queries(index, points)
+
+    updates = make_homes(rng, min(2000, home_count), prefix='new')
+    start = time.perf_counter()
+    for home in updates:
+        index.update(home)
+    per_update = (time.perf_counter() - start) / len(updates)
+    print(f'{len(updates)} updates at {per_update * 1e6:.0f} us each, then:')
+    time_queries(index, points)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--homes', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.homes, args.queries)
+
+
+if __name__ == '__main__':
+    main()
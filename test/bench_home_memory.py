@@ -0,0 +1,76 @@
+"""
+Benchmark memory per home for dicts, Home instances and compact records.
+
+Builds the same docs, each decoded from its own JSON as from Cloudant, as
+plain dicts, as ``Home`` instances (before and after ``__slots__`` and the
+class-level logger, by counting the per-instance ``__dict__`` they no longer
+have) and as ``HomeRecord`` instances, measuring each with tracemalloc. Run
+with::
+
+    python -m test.bench_home_memory --homes 100000
+
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import tracemalloc
+
+from deathpledge.classes import Home, HomeRecord
+from test.test_cleaning import make_raw_docs
+
+EXTRA_FIELDS = [f'detail_{i}' for i in range(40)]
+
+
+def make_docs(count):
+    """Docs with about 60 fields, decoded one at a time so no field names are shared."""
+    rng = random.Random(0)
+    templates = make_raw_docs(50)
+    for doc in templates:
+        for key in rng.sample(EXTRA_FIELDS, 35):
+            doc[key] = rng.choice(['Yes', 'No', 3.0, 'Forced Air', None])
+    return [json.loads(json.dumps(dict(templates[i % len(templates)], _id=f'home{i}')))
+            for i in range(count)]
+
+
+def measure(label, build, count, baseline=None):
+    gc.collect()
+    tracemalloc.start()
+    items = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_home = size / count
+    ratio = f'  ({baseline / per_home:.1f}x smaller)' if baseline else ''
+    print(f'{label + ":":24s}{per_home:8.0f} bytes per home, {size / 1e6:6.0f} MB total{ratio}')
+    return per_home, items
+
+
+def to_home(doc):
+    home = Home(docid=doc['_id'])
+    home.update(doc)
+    return home
+
+
+def run(home_count):
+    docs_json = [json.dumps(x) for x in make_docs(home_count)]
+    dict_bytes, _ = measure('dict per doc', lambda: [json.loads(x) for x in docs_json], home_count)
+    home_bytes, homes = measure('Home', lambda: [to_home(json.loads(x)) for x in docs_json], home_count)
+    # What each Home cost before __slots__: an instance __dict__ holding the logger and attributes
+    old_dict = {'logger': Home.logger, 'docid': 'x', 'url': None, 'added_date': None, 'skip_web_scrape': False}
+    old_home_bytes = home_bytes + sys.getsizeof(old_dict) - sys.getsizeof(())
+    print(f'{"Home, before slots:":24s}{old_home_bytes:8.0f} bytes per home (estimated)')
+    del homes
+    measure('HomeRecord', lambda: [HomeRecord(json.loads(x)) for x in docs_json], home_count, old_home_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--homes', type=int, default=100_000)
+    args = parser.parse_args()
+    run(args.homes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark the cost of per-doc log messages in a hot loop.
+
+Logs one info message per doc, as ``get_rev_id_for_doc`` does, to the same
+handlers ``config/logging.yaml`` sets up (two rotating log files, in a
+temporary directory here, and the console, sent to /dev/null). Compares
+writing synchronously, through a queue, and through a queue with the
+``per_item`` rate limit. Loop time is what the pipeline waits for; drained
+includes the listener thread finishing the writes. Run with::
+
+    python -m test.bench_logging --docs 50000
+
+"""
+import argparse
+import logging
+import logging.handlers
+import os
+import tempfile
+import time
+
+from deathpledge.logs import log_setup
+
+EXTENDED = logging.Formatter('%(asctime)s %(levelname)-8s %(name)s(%(funcName)s:%(lineno)d) - %(message)s',
+                             datefmt='%Y-%m-%d %H:%M:%S')
+SIMPLE = logging.Formatter('%(levelname)-8s %(name)-48s %(message)s')
+
+
+def make_handlers(log_dir, devnull):
+    handlers = []
+    for name, level in [('dp_info.log', logging.INFO), ('dp_debug.log', logging.DEBUG)]:
+        handler = logging.handlers.RotatingFileHandler(os.path.join(log_dir, name), maxBytes=3 * 1024 ** 2,
+                                                       backupCount=1)
+        handler.setLevel(level)
+        handler.setFormatter(EXTENDED)
+        handlers.append(handler)
+    console = logging.StreamHandler(devnull)
+    console.setLevel(logging.INFO)
+    console.setFormatter(SIMPLE)
+    handlers.append(console)
+    return handlers
+
+
+def time_mode(label, doc_count, use_queue, rate_limit, baseline=None):
+    with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, 'w') as devnull:
+        logger = logging.getLogger(f'bench.logging.{label}')
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        handlers = make_handlers(log_dir, devnull)
+        for handler in handlers:
+            logger.addHandler(handler)
+        if rate_limit:
+            logger.addFilter(log_setup.RateLimitFilter(burst=20, interval=60))
+        if use_queue:
+            log_setup.start_queue_logging([logger])
+        start = time.perf_counter()
+        for i in range(doc_count):
+            logger.info(f'Document for {i} MAIN ST ARLINGTON VA 22201 exists, updating with new revision')
+        loop_seconds = time.perf_counter() - start
+        log_setup.stop_queue_logging()
+        drained_seconds = time.perf_counter() - start
+        for handler in handlers:
+            handler.close()
+        logger.handlers.clear()
+    ratio = f'  ({baseline / loop_seconds:.0f}x faster loop)' if baseline else ''
+    print(f'{label + ":":22s}{loop_seconds / doc_count * 1e6:7.1f} us/doc in loop, '
+          f'{drained_seconds:6.2f}s drained{ratio}')
+    return loop_seconds
+
+
+def run(doc_count):
+    baseline = time_mode('sync', doc_count, use_queue=False, rate_limit=False)
+    time_mode('queue', doc_count, use_queue=True, rate_limit=False, baseline=baseline)
+    time_mode('sync, rate limited', doc_count, use_queue=False, rate_limit=True, baseline=baseline)
+    time_mode('queue, rate limited', doc_count, use_queue=True, rate_limit=True, baseline=baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--docs', type=int, default=50_000)
+    args = parser.parse_args()
+    run(args.docs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark offline transit routing over a synthetic city-sized GTFS feed.
+
+Builds a grid of bus lines with trains through the middle, routes a batch
+of random homes to one work location, and reports load, search and
+per-home query times. Run with::
+
+    python -m test.bench_routing --homes 1000 --lines 40
+
+"""
+import argparse
+import datetime as dt
+import os
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+
+from deathpledge.routing import gtfs, raptor
+
+ORIGIN = (38.80, -77.15)
+SPACING = 0.005  # degrees between stops, about a third of a mile
+TUESDAY = dt.date(2026, 10, 20)
+
+
+def _clock(seconds):
+    return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+
+
+def write_grid_feed(filepath, lines, stops_per_line=40):
+    """Buses along every row and column of a grid, and trains along the middle ones."""
+    stops, routes, trips, stop_times = [], [], [], []
+    for row in range(lines):
+        for col in range(stops_per_line):
+            stops.append(f'{row}_{col},{ORIGIN[0] + row * SPACING},{ORIGIN[1] + col * SPACING}')
+    grid_lines = ([('row', i, [f'{i}_{c}' for c in range(min(lines, stops_per_line))]) for i in range(lines)]
+                  + [('col', i, [f'{r}_{i}' for r in range(lines)]) for i in range(min(lines, stops_per_line))])
+    for kind, i, line_stops in grid_lines:
+        train = i == lines // 2
+        route_id = f'{kind}{i}'
+        routes.append(f'{route_id},{1 if train else 3}')
+        step = 60 if train else 90
+        for direction, ordered in enumerate([line_stops, line_stops[::-1]]):
+            for start in range(5 * 3600, 9 * 3600, 600 if train else 900):
+                trip_id = f'{route_id}_{direction}_{start}'
+                trips.append(f'{route_id},weekday,{trip_id}')
+                for seq, stop in enumerate(ordered):
+                    clock = _clock(start + seq * step)
+                    stop_times.append(f'{trip_id},{clock},{clock},{stop},{seq}')
+    tables = {
+        'stops.txt': ['stop_id,stop_lat,stop_lon'] + stops,
+        'routes.txt': ['route_id,route_type'] + routes,
+        'trips.txt': ['route_id,service_id,trip_id'] + trips,
+        'stop_times.txt': ['trip_id,arrival_time,departure_time,stop_id,stop_sequence'] + stop_times,
+        'calendar.txt': ['service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,'
+                         'start_date,end_date', 'weekday,1,1,1,1,1,0,0,20260101,20271231'],
+    }
+    with zipfile.ZipFile(filepath, 'w') as feed_zip:
+        for name, rows in tables.items():
+            feed_zip.writestr(name, '\n'.join(rows) + '\n')
+
+
+def run(home_count, lines):
+    with tempfile.TemporaryDirectory() as tempdir:
+        feed_path = os.path.join(tempdir, 'gtfs.zip')
+        write_grid_feed(feed_path, lines)
+        start = time.perf_counter()
+        feed = gtfs.load_feed(feed_path, service_date=TUESDAY)
+        print(f'load:   {time.perf_counter() - start:6.2f}s  {feed}')
+
+    extent = (lines - 1) * SPACING
+    work = (ORIGIN[0] + extent / 2, ORIGIN[1] + extent / 2)
+    start = time.perf_counter()
+    router = raptor.CommuteRouter(feed, work, arrive_by='08:00')
+    print(f'search: {time.perf_counter() - start:6.2f}s')
+
+    rng = np.random.default_rng(0)
+    homes = ORIGIN + rng.uniform(0, extent, size=(home_count, 2))
+    start = time.perf_counter()
+    commutes = [router.get_commute(home) for home in homes]
+    elapsed = time.perf_counter() - start
+    routed = [c for c in commutes if c is not None]
+    print(f'route:  {elapsed:6.2f}s  {home_count} homes, {elapsed / home_count * 1000:.2f} ms each, '
+          f'{len(routed)} reachable, median {np.median([c.commute_time for c in routed]):.0f} min')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--homes', type=int, default=1000)
+    parser.add_argument('--lines', type=int, default=40, help='grid lines in each direction')
+    args = parser.parse_args()
+    run(args.homes, args.lines)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark scoring the whole database at once against score2's loop per field.
+
+Builds flat clean docs with every field the scorecard uses, then scores a
+subset one value at a time with ``score2.get_score_for_item`` and
+``score2.continuous_score`` and every home with ``post.score.Scorecard``.
+Run with::
+
+    python -m test.bench_scoring --homes 100000 --legacy-homes 5000
+
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from deathpledge import score2
+from deathpledge.post import score
+
+CATEGORIES = {
+    'structure_type': ['Detached', 'Twin/Semi-Detached', 'Row/Townhouse', 'Unit/Flat/Apartment', 'Other'],
+    'county': ['ARLINGTON', 'FAIRFAX', 'WASHINGTON', 'LOUDOUN'],
+    'unit_building_type': ['Hi-Rise 9+ Floors', 'Garden 1- 4 Floors', None],
+    'basement': ['Yes', 'No', None],
+    'garage': ['Yes', 'No'],
+    'has_hoa': ['Yes', 'No'],
+}
+NUMBERS = {
+    'beds': (0, 6), 'bathrooms_full': (1, 4), 'total_garage_and_parking_spaces': (0, 4),
+    'assigned_spaces_count': (0, 3), 'of_attached_garage_spaces': (0, 3), 'of_detached_garage_spaces': (0, 3),
+    'list_price': (200e3, 700e3), 'commute_time': (10, 130), 'metro_walk_mins': (0, 130),
+    'total_taxes': (0, 8000), 'year_built': (1890, 2021), 'sqft': (500, 3000), 'price_sqft': (100, 600),
+    'tether': (0, 12), 'bus_walk_mins': (0, 40), 'days_on_market': (0, 400), 'condocoop_fee': (0, 1000),
+}
+
+
+def make_homes(count):
+    rng = np.random.default_rng(0)
+    columns = {k: rng.choice(np.array(v, dtype=object), count) for k, v in CATEGORIES.items()}
+    for name, (low, high) in NUMBERS.items():
+        values = rng.uniform(low, high, count).round()
+        values[rng.random(count) < 0.05] = np.nan
+        columns[name] = values
+    columns['has_laundry'] = rng.random(count) < 0.5
+    return pd.DataFrame(columns)
+
+
+def score_legacy(df):
+    categorical = score2.get_scorecard(mode='regular')
+    continuous = score2.get_scorecard(mode='continuous')
+    totals = []
+    for home in df.to_dict('records'):
+        total = 0
+        for field, scores in categorical.items():
+            value = home.get(score.column_for(field))
+            if value is not None and value == value:
+                total += score2.get_score_for_item(scores, field, value)
+        for name, settings in continuous.items():
+            value = home.get(score.column_for(settings['value_keys'][-1]))
+            if value is not None and value == value and name != 'tether_score':
+                total += score2.continuous_score(value, **settings)
+        totals.append(total)
+    return totals
+
+
+def run(home_count, legacy_count):
+    df = make_homes(home_count)
+    scorecard = score.Scorecard.from_file()
+
+    start = time.perf_counter()
+    score_legacy(df.head(legacy_count))
+    legacy_seconds = (time.perf_counter() - start) / legacy_count * home_count
+    print(f'score2, one value at a time: {legacy_seconds:7.2f}s for {home_count} homes '
+          f'(from {legacy_count})')
+
+    start = time.perf_counter()
+    scores = scorecard.score(df)
+    seconds = time.perf_counter() - start
+    print(f'post.score, whole columns:   {seconds:7.2f}s for {home_count} homes  '
+          f'({legacy_seconds / seconds:.0f}x faster)')
+    print(f'mean TOTAL_SCORE {scores["TOTAL_SCORE"].mean():.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--homes', type=int, default=100_000)
+    parser.add_argument('--legacy-homes', type=int, default=5_000)
+    args = parser.parse_args()
+    run(args.homes, args.legacy_homes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark command line startup time with Python's import profiler.
+
+Runs ``python -X importtime -m deathpledge --help`` several times and prints
+the median wall time and total import time, and the slowest top-level
+imports. Exits with an error if startup is slower than ``--max-ms``, or if
+any of the ``--forbid`` modules (pandas and scipy by default) was imported,
+so it can be run as a regression check. Run with::
+
+    python -m test.bench_startup --runs 5 --max-ms 500
+    python -m test.bench_startup -- -c "import deathpledge.classes"
+
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+FORBIDDEN_MODULES = ['pandas', 'scipy']
+
+
+def profile_startup(args):
+    """Wall seconds, {module: cumulative microseconds} for top-level imports, and every module imported."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    top_level = {}
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imported.add(name.strip())
+        if not name.startswith('  '):  # nested imports are indented
+            top_level[name.strip()] = int(cumulative)
+    return seconds, top_level, imported
+
+
+def run(runs, max_ms, args, forbidden=FORBIDDEN_MODULES):
+    profiles = [profile_startup(args) for _ in range(runs)]
+    wall_ms = statistics.median(x[0] for x in profiles) * 1e3
+    imports = profiles[-1][1]
+    print(f'{" ".join(args)}: {wall_ms:.0f} ms wall, {sum(imports.values()) / 1e3:.0f} ms importing '
+          f'(median of {runs})')
+    for name, micros in sorted(imports.items(), key=lambda x: -x[1])[:10]:
+        print(f'  {micros / 1e3:7.1f} ms  {name}')
+    loaded = [x for x in forbidden if x in profiles[-1][2]]
+    if loaded:
+        sys.exit(f'Startup imported {loaded}')
+    if max_ms is not None and wall_ms > max_ms:
+        sys.exit(f'Startup took {wall_ms:.0f} ms, over the {max_ms} ms limit')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=None, help='fail if slower than this')
+    parser.add_argument('--forbid', nargs='*', default=FORBIDDEN_MODULES,
+                        help='fail if any of these modules is imported')
+    parser.add_argument('command', nargs='*', default=['-m', 'deathpledge', '--help'],
+                        help='arguments to python, after -X importtime')
+    args = parser.parse_args()
+    run(args.runs, args.max_ms, args.command, args.forbid)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""Fixtures shared by the Bing and enrichment tests."""
+import copy
+from unittest import mock
+
+from deathpledge import resilience
+from deathpledge.api_calls import cache, commute_estimate, locations, metro
+
+# Places every home is enriched against, already geocoded
+LOCATION_SETTINGS = {
+    'centerpoint': {'lat': 38.9, 'lon': -77.0},
+    'work_coords': {'lat': 38.89, 'lon': -77.01},
+}
+
+
+def make_registry():
+    """A location registry of :data:`LOCATION_SETTINGS`, with no favorite places and no file."""
+    return locations.LocationRegistry(copy.deepcopy(LOCATION_SETTINGS), registry_path=None)
+
+
+def use_memory_bing(test_case):
+    """Keep Bing's quota, geocodes, routes and stations out of the on-disk cache for a test."""
+    quota = resilience.QuotaCounter('bing', store=cache.SQLiteCache(table='quotas', db_path=':memory:'))
+    station_index = metro.MetroStationIndex(cache.SQLiteCache(table='metro_station_list', db_path=':memory:'))
+    patchers = [
+        mock.patch.object(cache, '_geocode_cache', cache.GeocodeCache(db_path=':memory:')),
+        mock.patch.object(cache, '_route_cache', cache.RouteCache(db_path=':memory:')),
+        mock.patch.object(commute_estimate, '_commute_estimator', None),
+        mock.patch.object(metro, '_station_index', station_index),
+        mock.patch.dict(resilience._providers, bing=resilience.Provider('bing', quota=quota)),
+    ]
+    for patcher in patchers:
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
@@ -1,13 +1,55 @@
+import time
 import unittest
 
-from deathpledge.api_calls import bing
+from deathpledge.api_calls import bing, cache, locations, metro, standin
+from test.helpers import make_registry, use_memory_bing
 
 
-class BingGeocoordsTestCase(unittest.TestCase):
+class StandInTestCase(unittest.TestCase):
+    """Runs Bing calls against the offline stand-in server."""
+    recordings = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = standin.StandInBingServer(recordings=cls.recordings).start()
+        cls.previous_url = bing.set_base_url(cls.server.base_url)
+
+    @classmethod
+    def tearDownClass(cls):
+        bing.set_base_url(cls.previous_url)
+        cls.server.stop()
+
     def setUp(self):
-        self.full_address = '1600 Pennsylvania Ave NW, Washington, DC 20500'
+        use_memory_bing(self)
+
+    @staticmethod
+    def _make_bing_api():
+        return bing.BingMapsAPI(
+            geocode_cache=cache.GeocodeCache(db_path=':memory:'),
+            route_cache=cache.RouteCache(db_path=':memory:'),
+            station_index=metro.MetroStationIndex(cache.SQLiteCache('stations', db_path=':memory:'))
+        )
+
+
+WHITE_HOUSE = '1600 Pennsylvania Ave NW, Washington, DC 20500'
+WHITE_HOUSE_GEOCODE = {'resourceSets': [{'resources': [
+    {'geocodePoints': [{'coordinates': [38.89743, -77.03653]}]}
+]}]}
+
+
+class BingGeocoordsTestCase(StandInTestCase):
+    recordings = {
+        standin.request_key('Locations', bing.BingGeocoderAPICall(WHITE_HOUSE, 20500).url_args):
+            WHITE_HOUSE_GEOCODE,
+        standin.request_key('Locations', bing.BingGeocoderAPICall(WHITE_HOUSE).url_args):
+            WHITE_HOUSE_GEOCODE,
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.full_address = WHITE_HOUSE
         self.zip_code = 20500
-        self.bing_api = bing.BingMapsAPI()
+        self.bing_api = self._make_bing_api()
 
     def test_fetch_geocoords_with_zip_code(self):
         geocoder = bing.BingGeocoderAPICall(address=self.full_address, zip_code=self.zip_code)
@@ -24,18 +66,36 @@ class BingGeocoordsTestCase(unittest.TestCase):
         self.assertAlmostEqual(coords.lat, 38.89743, places=2)
 
 
-class BingCommuteTestCase(unittest.TestCase):
+class BingCacheInjectionTestCase(unittest.TestCase):
+    def setUp(self):
+        use_memory_bing(self)
+
+    def test_empty_geocode_cache_kept(self):
+        geocode_cache = cache.GeocodeCache(db_path=':memory:')
+        bing_api = bing.BingMapsAPI(geocode_cache=geocode_cache)
+        self.assertIs(bing_api.geocode_cache, geocode_cache)
+
+
+class BingCommuteTestCase(StandInTestCase):
     def setUp(self):
-        self.start = (38.89762138428869, -77.03660353579274)
-        self.end = (38.88987263256243, -77.00905540262258)
+        super().setUp()
+        self.start = bing.Geocoords(38.89762138428869, -77.03660353579274)
+        self.end = bing.Geocoords(38.88987263256243, -77.00905540262258)
 
     def test_get_commute(self):
-        commute_dict = bing.get_bing_commute_time(
-            startcoords=self.start, endcoords=self.end)
-        self.assertIsInstance(commute_dict, tuple)
-        self.assertIsInstance(commute_dict.commute_time, float)
-        self.assertIsInstance(commute_dict.first_leg, str)
-        self.assertIsInstance(commute_dict.first_walk, float)
+        commute_request = bing.BingCommuteAPICall(startcoords=self.start, endcoords=self.end)
+        commute = self._make_bing_api().get_commute(commute_request)
+        self.assertIsInstance(commute, tuple)
+        self.assertIsInstance(commute.commute_time, float)
+        self.assertIsInstance(commute.first_leg, str)
+        self.assertIsInstance(commute.first_walk, float)
+
+    def test_get_nearby_metro(self):
+        metro_request = bing.BingNearbyMetroAPICall(startcoords=self.start)
+        stations = self._make_bing_api().get_nearby_metro(metro_request, homecoords=self.start)
+        self.assertEqual(len(stations), 2)
+        distances = [x['distance'] for x in stations.values()]
+        self.assertEqual(distances, sorted(distances))
 
 
 class BingCommuteFirstLegTestCase(unittest.TestCase):
@@ -59,7 +119,7 @@ class BingCommuteFirstLegTestCase(unittest.TestCase):
         return trip
 
     def test_get_first_leg_of_trip(self):
-        first_leg = bing.get_first_leg_from_trip(self.trip)
+        first_leg = bing.BingMapsAPI._get_first_leg_from_trip(self.trip)
         self.assertIsInstance(first_leg, dict)
         self.assertIn('mode', first_leg)
         self.assertEqual(first_leg.get('mode'), 'Train')
@@ -69,7 +129,114 @@ class BingCommuteFirstLegTestCase(unittest.TestCase):
         modified_trip = self._create_fake_trip()
         modified_trip['routeLegs'][0]['itineraryItems'][0]['iconType'] = 'Jitpack'
         with self.assertRaises(ValueError):
-            bing.get_first_leg_from_trip(modified_trip)
+            bing.BingMapsAPI._get_first_leg_from_trip(modified_trip)
+
+
+class FakeMatrixAPI(bing.BingMapsAPI):
+    """Answers distance matrix requests locally, recording each request."""
+
+    def __init__(self):
+        self.requests = []
+        self.route_cache = cache.RouteCache(db_path=':memory:')
+
+    def _get_api_response(self, api_call):
+        self.requests.append(api_call)
+        origin_count = len(api_call.url_args['origins'].split(';'))
+        dest_count = len(api_call.url_args['destinations'].split(';'))
+        results = [
+            {'originIndex': i, 'destinationIndex': j,
+             'travelDistance': i + j + 1.0, 'travelDuration': 600.0}
+            for i in range(origin_count) for j in range(dest_count)
+        ]
+        return {'resourceSets': [{'resources': [{'results': results}]}]}
+
+
+class BingDistanceMatrixTestCase(unittest.TestCase):
+    def setUp(self):
+        use_memory_bing(self)
+        self.registry = make_registry()
+        self.registry.favorite_driving = {
+            name: locations.Destination(name, 'addr', bing.Geocoords(38.8, -77.1), day, '18:00')
+            for name, day in [('Gym', 0), ('Pool', 0), ('Market', 5)]
+        }
+        self.homes = [{'geocoords': [38.0 + i / 1000, -77.0]} for i in range(200)]
+
+    def test_backfill_uses_few_requests(self):
+        bing_api = FakeMatrixAPI()
+        request_count = bing.add_driving_to_homes(self.homes, self.registry, bing_api=bing_api)
+        self.assertEqual(request_count, len(bing_api.requests))
+        self.assertLessEqual(request_count, 10)
+
+    def test_results_written_to_each_home(self):
+        bing.add_driving_to_homes(self.homes, self.registry, bing_api=FakeMatrixAPI())
+        for home in self.homes:
+            for place in ['Gym', 'Pool', 'Market']:
+                self.assertEqual(home[f'{place}_time'], '0:10:00')
+        self.assertEqual(self.homes[0]['Gym_dist'], '1.00 miles')
+
+    def test_chunks_respect_cell_limit(self):
+        bing_api = FakeMatrixAPI()
+        bing.add_driving_to_homes(self.homes, self.registry, bing_api=bing_api)
+        for request in bing_api.requests:
+            origin_count = len(request.url_args['origins'].split(';'))
+            dest_count = len(request.url_args['destinations'].split(';'))
+            self.assertLessEqual(origin_count * dest_count,
+                                 bing.BingDistanceMatrixAPICall.max_cells)
+
+    def test_departure_time_sent(self):
+        bing_api = FakeMatrixAPI()
+        bing.add_driving_to_homes(self.homes[:1], self.registry, bing_api=bing_api)
+        start_times = sorted(x.url_args['startTime'][-8:] for x in bing_api.requests)
+        self.assertEqual(start_times, ['18:00:00', '18:00:00'])
+
+    def test_cached_drives_not_requested_again(self):
+        bing_api = FakeMatrixAPI()
+        bing.add_driving_to_homes(self.homes, self.registry, bing_api=bing_api)
+        request_count = bing.add_driving_to_homes(self.homes, self.registry, bing_api=bing_api)
+        self.assertEqual(request_count, 0)
+
+    def test_homes_without_coords_skipped(self):
+        homes = [{}, {'geocoords': [38.0, -77.0]}]
+        bing.add_driving_to_homes(homes, self.registry, bing_api=FakeMatrixAPI())
+        self.assertNotIn('Gym_time', homes[0])
+        self.assertIn('Gym_time', homes[1])
+
+
+class ConcurrentEnrichmentTestCase(unittest.TestCase):
+    """Steps after geocoding run at the same time, not one after another."""
+
+    def setUp(self):
+        use_memory_bing(self)
+        self.home = {'full_address': '1 Test Ct', 'geocoords': bing.Geocoords(38.85, -77.05)}
+        registry = make_registry()
+        self.getter = bing.BingDataGetter(self.home, registry=registry)
+
+    def _slow_step(self, field):
+        def step():
+            time.sleep(0.2)
+            self.home[field] = True
+        return step
+
+    def test_steps_overlap(self):
+        for name in ['_get_commute', '_get_nearby_metro', '_get_driving']:
+            setattr(self.getter, name, self._slow_step(name))
+        start = time.perf_counter()
+        self.getter.add_data_to_home()
+        elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 0.5)
+        self.assertTrue(all(self.home[x] for x in ['_get_commute', '_get_nearby_metro', '_get_driving']))
+
+    def test_step_exception_raised(self):
+        def failing_step():
+            raise KeyError('geocoords')
+        self.getter._get_commute = failing_step
+        self.getter._get_nearby_metro = self._slow_step('metro')
+        with self.assertRaises(KeyError):
+            self.getter.add_data_to_home(driving=False)
+        self.assertTrue(self.home['metro'])
+
+    def test_session_is_shared(self):
+        self.assertIs(bing.get_session(), bing.get_session())
 
 
 if __name__ == '__main__':
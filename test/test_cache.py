@@ -0,0 +1,150 @@
+import unittest
+
+from deathpledge.api_calls import bing, cache
+
+
+class GeocodeCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.geocode_cache = cache.GeocodeCache(db_path=':memory:')
+
+    def tearDown(self):
+        self.geocode_cache.close()
+
+    def test_miss_then_hit(self):
+        self.assertIsNone(self.geocode_cache.get_coords('1600 Pennsylvania Ave NW', 20500))
+        self.geocode_cache.set_coords('1600 Pennsylvania Ave NW', 20500, (38.89743, -77.03653))
+        coords = self.geocode_cache.get_coords('1600 Pennsylvania Ave NW', 20500)
+        self.assertEqual(coords, [38.89743, -77.03653])
+        self.assertEqual(self.geocode_cache.stats.hits, 1)
+        self.assertEqual(self.geocode_cache.stats.misses, 1)
+        self.assertEqual(self.geocode_cache.stats.hit_rate, 0.5)
+
+    def test_key_is_normalized(self):
+        key1 = cache.GeocodeCache.make_key('1600 Pennsylvania Ave. NW,', 20500)
+        key2 = cache.GeocodeCache.make_key('1600 PENNSYLVANIA AVE NW', '20500')
+        self.assertEqual(key1, key2)
+
+    def test_zip_code_is_part_of_key(self):
+        key1 = cache.GeocodeCache.make_key('100 Main St', 22204)
+        key2 = cache.GeocodeCache.make_key('100 Main St')
+        self.assertNotEqual(key1, key2)
+
+
+class RouteCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.route_cache = cache.RouteCache(db_path=':memory:', ttl_days=30)
+        self.start = (38.86301, -77.06002)
+        self.end = (38.89, -77.01)
+
+    def tearDown(self):
+        self.route_cache.close()
+
+    def test_same_cell_hits(self):
+        self.route_cache.set_route('transit', self.start, self.end, [30.0, 'Bus', 4.5],
+                                   slot='Tue 06:30', latency=0.8)
+        route = self.route_cache.get_route('transit', (38.8629, -77.0601), self.end, slot='Tue 06:30')
+        self.assertEqual(route, [30.0, 'Bus', 4.5])
+        self.assertEqual(self.route_cache.stats.saved_seconds, 0.8)
+
+    def test_slot_and_mode_are_part_of_key(self):
+        self.route_cache.set_route('transit', self.start, self.end, [30.0, 'Bus', 4.5], slot='Tue 06:30')
+        self.assertIsNone(self.route_cache.get_route('transit', self.start, self.end, slot='Sat 12:00'))
+        self.assertIsNone(self.route_cache.get_route('drive', self.start, self.end, slot='Tue 06:30'))
+
+    def test_expired_route_is_a_miss(self):
+        self.route_cache.set_route('walk', self.start, self.end, [0.5, '0:10:00'])
+        key = self.route_cache.make_key('walk', self.start, self.end)
+        entry = self.route_cache.peek(key)
+        entry['cached_at'] -= 31 * 86400
+        self.route_cache.set(key, entry)
+        self.assertIsNone(self.route_cache.get_route('walk', self.start, self.end))
+        self.assertEqual(self.route_cache.stats.misses, 1)
+
+
+class BingRouteCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bing_api = bing.BingMapsAPI(
+            geocode_cache=cache.GeocodeCache(db_path=':memory:'),
+            route_cache=cache.RouteCache(db_path=':memory:'),
+            station_index=object()
+        )
+        self.calls = 0
+
+        def fake_response(api_call):
+            self.calls += 1
+            return {'resourceSets': [{'resources': [{
+                'travelDuration': 1969, 'travelDistance': 5.0,
+                'routeLegs': [{'itineraryItems': [
+                    {'iconType': 'Walk', 'travelDuration': 769},
+                    {'iconType': 'Train', 'travelDuration': 900},
+                ]}]
+            }]}]}
+        self.bing_api._get_api_response = fake_response
+
+    def test_commute_cached_for_same_building(self):
+        work = bing.Geocoords(38.89, -77.01)
+        first = self.bing_api.get_commute(bing.BingCommuteAPICall(bing.Geocoords(38.86301, -77.06002), work))
+        second = self.bing_api.get_commute(bing.BingCommuteAPICall(bing.Geocoords(38.86299, -77.06001), work))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(first, second)
+        self.assertIsInstance(second, bing.Commute)
+        self.assertEqual(second.first_leg, 'Train')
+
+    def test_driving_slot_from_request(self):
+        request = bing.BingDrivingAPICall(bing.Geocoords(38.8, -77.0), bing.Geocoords(38.9, -77.1),
+                                          dayofweek=5, hrmin='12:00')
+        self.assertEqual(bing.BingMapsAPI.get_time_slot(request), 'Sat 12:00')
+
+
+class BingGeocodeCacheTestCase(unittest.TestCase):
+    """Geocoding an address twice should only call Bing once."""
+
+    def setUp(self):
+        self.geocode_cache = cache.GeocodeCache(db_path=':memory:')
+        self.bing_api = bing.BingMapsAPI(geocode_cache=self.geocode_cache)
+        self.calls = []
+
+        def fake_response(api_call):
+            self.calls.append(api_call)
+            return {'resourceSets': [{'resources': [
+                {'geocodePoints': [{'coordinates': [38.89743, -77.03653]}]}
+            ]}]}
+        self.bing_api._get_api_response = fake_response
+
+    def tearDown(self):
+        self.geocode_cache.close()
+
+    def test_second_geocode_is_cached(self):
+        for _ in range(2):
+            geocoder = bing.BingGeocoderAPICall(address='1600 Pennsylvania Ave NW', zip_code=20500)
+            coords = self.bing_api.get_geocoords(geocoder)
+            self.assertIsInstance(coords, bing.Geocoords)
+            self.assertEqual(coords.lat, 38.89743)
+        self.assertEqual(len(self.calls), 1)
+
+
+class AddressCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.address_cache = cache.AddressCache(db_path=':memory:')
+
+    def tearDown(self):
+        self.address_cache.close()
+
+    def test_unsaved_entries_found(self):
+        self.address_cache.set('1 Main St', {'AddressNumber': '1'})
+        self.assertEqual(self.address_cache.get('1 Main St'), {'AddressNumber': '1'})
+        self.assertEqual(self.address_cache.items(), [])
+
+    def test_written_a_batch_at_a_time(self):
+        self.address_cache.flush_size = 2
+        self.address_cache.set('1 Main St', {'AddressNumber': '1'})
+        self.address_cache.set('2 Main St', {'AddressNumber': '2'})
+        self.assertEqual(len(self.address_cache.items()), 2)
+
+    def test_len_counts_unsaved(self):
+        self.address_cache.set('1 Main St', {'AddressNumber': '1'})
+        self.assertEqual(len(self.address_cache), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import pickle
+import unittest
+
+from deathpledge.classes import Home, HomeRecord
+from test.test_cleaning import make_homes, make_raw_docs
+
+
+class HomeRecordTestCase(unittest.TestCase):
+    def setUp(self):
+        self.docs = [dict(x, _id=f'home{i}') for i, x in enumerate(make_raw_docs(5))]
+
+    def test_reads_like_doc(self):
+        record = HomeRecord(self.docs[0])
+        self.assertEqual(record.docid, 'home0')
+        self.assertEqual(dict(record), self.docs[0])
+        self.assertEqual(record, self.docs[0])
+        self.assertEqual(record.get('missing', 'default'), 'default')
+        self.assertIn('status', record)
+
+    def test_to_doc_round_trip(self):
+        record = HomeRecord(self.docs[0])
+        self.assertEqual(record.to_doc(), self.docs[0])
+        self.assertEqual(list(record.to_doc()), list(self.docs[0]))
+
+    def test_home_round_trip(self):
+        home = make_homes(self.docs[:1])[0]
+        home.url = 'https://example.com/home0'
+        home['url'] = home.url
+        record = HomeRecord.from_home(home)
+        self.assertEqual(record.docid, home.docid)
+        back = record.to_home()
+        self.assertIsInstance(back, Home)
+        self.assertEqual((back.docid, back.url), (home.docid, home.url))
+        self.assertEqual(dict(back), dict(home))
+
+    def test_same_fields_share_interned_layout(self):
+        # Decoded separately, as from Cloudant, so the docs' field names are distinct strings
+        first, second = (HomeRecord(json.loads(json.dumps(self.docs[0]))) for _ in range(2))
+        self.assertIs(first._layout, second._layout)
+        key = json.loads('"status"')
+        self.assertIs(next(x for x in first if x == key), next(x for x in second if x == key))
+
+    def test_set_and_delete_fields(self):
+        record = HomeRecord(self.docs[0])
+        other = HomeRecord(self.docs[0])
+        record['status'] = 1
+        record['new_field'] = 'new'
+        self.assertEqual((record['status'], record['new_field']), (1, 'new'))
+        self.assertEqual(other['status'], self.docs[0]['status'])
+        del record['new_field']
+        self.assertNotIn('new_field', record)
+        self.assertIs(record._layout, other._layout)
+        with self.assertRaises(KeyError):
+            del record['new_field']
+
+    def test_pickles(self):
+        record = HomeRecord(self.docs[0])
+        copied = pickle.loads(pickle.dumps(record))
+        self.assertEqual((copied.docid, copied.to_doc()), (record.docid, record.to_doc()))
+        self.assertIs(copied._layout, record._layout)
+
+
+class HomeSlotsTestCase(unittest.TestCase):
+    def test_no_instance_dict(self):
+        home = Home(docid='home0')
+        self.assertFalse(hasattr(home, '__dict__'))
+        self.assertIs(home.logger, Home.logger)
+
+    def test_pickles(self):
+        home = Home(url='https://example.com', docid='home0')
+        home['status'] = 1
+        copied = pickle.loads(pickle.dumps(home))
+        self.assertEqual((copied.docid, copied.url, dict(copied)), (home.docid, home.url, dict(home)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,21 @@
+import copy
+import random
 import unittest
+from unittest import mock
+
 from deathpledge import cleaning
+from deathpledge.api_calls import cache
+from deathpledge.classes import Home
 
 
 class FeeTestCase(unittest.TestCase):
     def setUp(self):
-        self.home = {}
+        self.home = Home(docid='fee-test')
 
     def test_split_condo_fee_with_freq(self):
         condo_field = 'condocoop_fee'
         self.home[condo_field] = '295.16/Monthly'
-        cleaning.split_fee_frequency(self.home)
+        self.home.clean_field(condo_field)
         expected_fee = 295.16
         expected_freq = 'Monthly'
         self.assertEqual(self.home.get(condo_field), expected_fee)
@@ -18,10 +24,147 @@ class FeeTestCase(unittest.TestCase):
     def test_split_condo_fee_currency(self):
         condo_field = 'condocoop_fee'
         self.home[condo_field] = '$410'
-        cleaning.split_fee_frequency(self.home)
+        self.home.clean_field(condo_field)
         expected_fee = 410
         self.assertEqual(expected_fee, self.home.get(condo_field))
 
+    def test_fee_fields_have_fee_cleaner(self):
+        for key in cleaning.FEE_FIELDS:
+            self.assertEqual(cleaning.FIELD_CLEANERS[key], cleaning.KIND_CLEANERS['fee'])
+
+
+def use_memory_address_cache(test_case):
+    """Keep parsed addresses out of the on-disk cache, and out of memory after the test."""
+    patcher = mock.patch.object(cache, '_address_cache', cache.AddressCache(db_path=':memory:'))
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+    cleaning._address_lru.clear()
+    test_case.addCleanup(cleaning._address_lru.clear)
+
+
+def make_raw_docs(count, seed=0):
+    """Raw docs as scraped, with the odd value that cleaning can't handle."""
+    rng = random.Random(seed)
+    numbers = ['$425,000', '1,850 sqft', '3', '2.5', '+12', 'N/A', 'TBD', 425000.0, None]
+    fees = ['295.16/Monthly', '$410', '1,200/Quarterly', 'N/A/Monthly', '50/a/b', 75.0]
+    lists = ['Dishwasher, Refrigerator, and Range', 'Pool', 'Gym and Pool', ['already', 'split']]
+    dates = ['01/15/2020', '2020-01-15T09:30:00', '01-15-2020', 'last Tuesday']
+    addresses = ['{} NORTH MAPLE DR 456 ALEXANDRIA VA 22302', '{} Main St, Arlington, VA 22201']
+    docs = []
+    for i in range(count):
+        doc = {'status': rng.choice(['active', 'CLOSED', 'Pending', None])}
+        if rng.random() < 0.95:
+            doc['full_address'] = rng.choice(addresses).format(rng.randint(1, 9999))
+        if rng.random() < 0.9:
+            doc['new_on_homescout'] = rng.choice(dates)
+        for key in rng.sample(cleaning.NUMERIC_FIELDS, 5):
+            doc[key] = rng.choice(numbers)
+        for key in cleaning.FEE_FIELDS:
+            if rng.random() < 0.5:
+                doc[key] = rng.choice(fees)
+        for key in rng.sample(cleaning.COMMA_DELIMITED_FIELDS, 4):
+            doc[key] = rng.choice(lists)
+        docs.append(doc)
+    return docs
+
+
+def make_homes(docs):
+    homes = []
+    for i, doc in enumerate(docs):
+        home = Home(docid=str(i))
+        home.update(copy.deepcopy(doc))
+        homes.append(home)
+    return homes
+
+
+class CleanBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        use_memory_address_cache(self)
+
+    def assertSameHomes(self, batch_homes, loop_homes):
+        for batch_home, loop_home in zip(batch_homes, loop_homes):
+            self.assertEqual(list(batch_home.items()), list(loop_home.items()))
+            self.assertEqual([type(x) for x in batch_home.values()], [type(x) for x in loop_home.values()])
+
+    def test_same_as_home_clean(self):
+        docs = make_raw_docs(500)
+        loop_homes, batch_homes = make_homes(docs), make_homes(docs)
+        with self.assertLogs('deathpledge.classes', level='WARNING') as loop_logs:
+            for home in loop_homes:
+                home.clean()
+        with self.assertLogs('deathpledge.classes', level='WARNING') as batch_logs:
+            cleaning.clean_batch(batch_homes)
+        self.assertSameHomes(batch_homes, loop_homes)
+        self.assertEqual(batch_logs.output, loop_logs.output)
+
+    def test_raises_where_home_clean_would(self):
+        docs = make_raw_docs(20, seed=1)
+        docs[10]['list_price'] = ''  # parse_number raises IndexError, which Home.clean lets through
+        loop_homes, batch_homes = make_homes(docs), make_homes(docs)
+        with self.assertRaises(IndexError), self.assertLogs('deathpledge.classes', level='WARNING'):
+            for home in loop_homes:
+                home.clean()
+        with self.assertRaises(IndexError), self.assertLogs('deathpledge.classes', level='WARNING'):
+            cleaning.clean_batch(batch_homes)
+        self.assertSameHomes(batch_homes, loop_homes)
+
+    def test_empty_batch(self):
+        cleaning.clean_batch([])
+
+    def test_same_with_process_pool(self):
+        docs = make_raw_docs(40, seed=2)
+        loop_homes, batch_homes = make_homes(docs), make_homes(docs)
+        with self.assertLogs('deathpledge.classes', level='WARNING'):
+            for home in loop_homes:
+                home.clean()
+        cleaning._address_lru.clear()
+        cache._address_cache = cache.AddressCache(db_path=':memory:')
+        with mock.patch.object(cleaning, 'MIN_POOL_ADDRESSES', 1), \
+                self.assertLogs('deathpledge.classes', level='WARNING'):
+            cleaning.clean_batch(batch_homes)
+        self.assertSameHomes(batch_homes, loop_homes)
+
+
+class AddressCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        use_memory_address_cache(self)
+        self.address = '123 NORTH MAPLE DR 456 ALEXANDRIA VA 22302'
+
+    def test_parsed_once(self):
+        with mock.patch.object(cleaning, '_tag_address', wraps=cleaning._tag_address) as tag:
+            first = cleaning._parsed_address(self.address)
+            second = cleaning._parsed_address(' 123 NORTH MAPLE DR  456 ALEXANDRIA VA 22302')
+        self.assertEqual(first, second)
+        self.assertEqual(tag.call_count, 1)
+        self.assertEqual(first['ZipCode'], '22302')
+
+    def test_on_disk_cache_survives_memory(self):
+        cleaning._parsed_address(self.address)
+        cleaning._address_lru.clear()
+        with mock.patch.object(cleaning, '_tag_address') as tag:
+            parsed = cleaning._parsed_address(self.address)
+        tag.assert_not_called()
+        self.assertEqual(parsed['PlaceName'], 'ALEXANDRIA')
+
+    def test_homes_get_their_own_copy(self):
+        first = cleaning._parsed_address(self.address)
+        first['ZipCode'] = 'changed'
+        self.assertEqual(cleaning._parsed_address(self.address)['ZipCode'], '22302')
+
+    def test_lru_evicts_oldest(self):
+        lru = cleaning._LRU(maxsize=2)
+        for key in 'abc':
+            lru.put(key, {key: key})
+        self.assertIsNone(lru.get('a'))
+        self.assertEqual(lru.get('c'), {'c': 'c'})
+
+    def test_parse_addresses_matches_one_at_a_time(self):
+        addresses = [self.address, '1 Main St, Arlington, VA 22201', self.address]
+        expected = [cleaning._tag_address(x) for x in addresses]
+        with mock.patch.object(cleaning, 'MIN_POOL_ADDRESSES', 2):
+            self.assertEqual(cleaning.parse_addresses(addresses, processes=2), expected)
+        self.assertEqual(len(cache.get_address_cache()), 2)
+
 
 if __name__ == '__main__':
     unittest.main()
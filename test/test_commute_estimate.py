@@ -0,0 +1,95 @@
+import unittest
+
+from deathpledge.api_calls import bing, cache, commute_estimate
+
+WORK = (38.89, -77.01)
+SLOT = 'Tue 08:00'
+
+
+class CommuteEstimatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.route_cache = cache.RouteCache(db_path=':memory:')
+        self.estimator = commute_estimate.CommuteEstimator(self.route_cache, radius_miles=0.5,
+                                                           min_neighbors=4, max_uncertainty=3.0)
+
+    def _add_neighbors(self, times, center=(38.86, -77.06)):
+        offsets = [(0.001, 0), (-0.001, 0), (0, 0.001), (0, -0.001), (0.002, 0.002)]
+        for (dlat, dlon), minutes in zip(offsets, times):
+            start = (center[0] + dlat, center[1] + dlon)
+            self.estimator.add(start, WORK, [minutes, 'Bus', 4.0], slot=SLOT)
+
+    def test_dense_agreeing_neighbors_estimated(self):
+        self._add_neighbors([40, 41, 42, 41])
+        estimate = self.estimator.estimate((38.86, -77.06), WORK, slot=SLOT)
+        self.assertIsNotNone(estimate)
+        self.assertEqual(estimate.neighbors, 4)
+        self.assertAlmostEqual(estimate.commute[0], 41, delta=1)
+        self.assertEqual(estimate.commute[1], 'Bus')
+        self.assertLessEqual(estimate.uncertainty, 3.0)
+
+    def test_too_few_neighbors(self):
+        self._add_neighbors([40, 41, 42])
+        self.assertIsNone(self.estimator.estimate((38.86, -77.06), WORK, slot=SLOT))
+
+    def test_disagreeing_neighbors(self):
+        self._add_neighbors([30, 41, 55, 41])
+        self.assertIsNone(self.estimator.estimate((38.86, -77.06), WORK, slot=SLOT))
+
+    def test_distant_neighbors_ignored(self):
+        self._add_neighbors([40, 41, 42, 41], center=(38.95, -77.2))
+        self.assertIsNone(self.estimator.estimate((38.86, -77.06), WORK, slot=SLOT))
+
+    def test_other_time_slot_ignored(self):
+        self._add_neighbors([40, 41, 42, 41])
+        self.assertIsNone(self.estimator.estimate((38.86, -77.06), WORK, slot='Sat 12:00'))
+
+    def test_loads_neighbors_from_route_cache(self):
+        for i in range(4):
+            self.route_cache.set_route('transit', (38.86 + i / 1000, -77.06), WORK,
+                                       [40.0, 'Train', 6.0], slot=SLOT)
+        estimator = commute_estimate.CommuteEstimator(self.route_cache)
+        estimate = estimator.estimate((38.8615, -77.06), WORK, slot=SLOT)
+        self.assertEqual(estimate.commute, [40.0, 'Train', 6.0])
+
+    def test_local_fraction_tracked(self):
+        self._add_neighbors([40, 41, 42, 41])
+        self.estimator.estimate((38.86, -77.06), WORK, slot=SLOT)
+        self.estimator.estimate((38.0, -77.0), WORK, slot=SLOT)
+        self.assertEqual(self.estimator.stats.local_fraction, 0.5)
+
+
+class BingCommuteEstimateTestCase(unittest.TestCase):
+    """Only homes without enough agreeing neighbors are sent to Bing."""
+
+    def setUp(self):
+        route_cache = cache.RouteCache(db_path=':memory:')
+        self.bing_api = bing.BingMapsAPI(
+            geocode_cache=cache.GeocodeCache(db_path=':memory:'),
+            route_cache=route_cache,
+            station_index=object(),
+            commute_estimator=commute_estimate.CommuteEstimator(route_cache, min_neighbors=3)
+        )
+        self.calls = 0
+
+        def fake_response(api_call):
+            self.calls += 1
+            return {'resourceSets': [{'resources': [{
+                'travelDuration': 2400,
+                'routeLegs': [{'itineraryItems': [
+                    {'iconType': 'Walk', 'travelDuration': 300},
+                    {'iconType': 'Bus', 'travelDuration': 1800},
+                ]}]
+            }]}]}
+        self.bing_api._get_api_response = fake_response
+
+    def test_block_of_homes(self):
+        work = bing.Geocoords(*WORK)
+        homes = [bing.Geocoords(38.86 + i * 0.0012, -77.06) for i in range(6)]
+        commutes = [self.bing_api.get_commute(bing.BingCommuteAPICall(home, work)) for home in homes]
+        self.assertEqual(self.calls, 3)
+        self.assertTrue(all(commute.commute_time == 40.0 for commute in commutes))
+        self.assertEqual(self.bing_api.commute_estimator.stats.estimated, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
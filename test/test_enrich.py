@@ -1,10 +1,32 @@
 import unittest
+from unittest import mock
 
 from deathpledge.classes import Home
 from deathpledge import enrich
+from deathpledge.api_calls import bing, locations, standin
+from test.helpers import make_registry, use_memory_bing
 
 
 class EnrichTestCase(unittest.TestCase):
+    """Enriches homes against the offline stand-in server, with throwaway caches and quota."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = standin.StandInBingServer().start()
+        cls.previous_url = bing.set_base_url(cls.server.base_url)
+
+    @classmethod
+    def tearDownClass(cls):
+        bing.set_base_url(cls.previous_url)
+        cls.server.stop()
+
+    def setUp(self):
+        registry = make_registry()
+        use_memory_bing(self)
+        patcher = mock.patch.object(locations, '_registry', registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     @staticmethod
     def _instantiate_new_home():
         home = Home()
@@ -15,6 +37,7 @@ class EnrichTestCase(unittest.TestCase):
 
 class EnrichGeocoordsTestCase(EnrichTestCase):
     def setUp(self):
+        super().setUp()
         self.new_home = self._instantiate_new_home()
 
     def test_new_home_has_no_geocoordds(self):
@@ -23,8 +46,8 @@ class EnrichGeocoordsTestCase(EnrichTestCase):
 
     def test_set_new_geocoords(self):
         enrich.add_coords(self.new_home)
-        geocoords_as_dict = self.new_home['geocoords']
-        self.assertIsInstance(geocoords_as_dict, dict)
+        geocoords = self.new_home['geocoords']
+        self.assertIsInstance(geocoords, bing.Geocoords)
 
     def test_skip_setting_existing_geocoords(self):
         self._set_fake_coords()
@@ -35,7 +58,7 @@ class EnrichGeocoordsTestCase(EnrichTestCase):
     def test_existing_geocoords_force_retrieved(self):
         self._set_fake_coords()
         enrich.add_coords(self.new_home, force=True)
-        lat_should_not_be_1 = self.new_home['geocoords'].get('lat')
+        lat_should_not_be_1 = self.new_home['geocoords'].lat
         self.assertNotEqual(lat_should_not_be_1, 1.000)
 
     def _set_fake_coords(self):
@@ -50,6 +73,7 @@ class EnrichCommuteTestCase(EnrichTestCase):
     }
 
     def setUp(self):
+        super().setUp()
         self.new_home = self._instantiate_new_home()
         enrich.add_coords(self.new_home)
 
@@ -0,0 +1,145 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+
+import deathpledge
+from deathpledge import freshness
+from deathpledge.api_calls import bing
+from test.helpers import make_registry, use_memory_bing
+
+
+class NeedsUpdateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.home = {'geocoords': [38.86, -77.06]}
+        self.inputs = ('123 MAIN ST', '22204')
+
+    def test_missing_field_needs_update(self):
+        self.assertTrue(freshness.needs_update(self.home, 'commute', self.inputs))
+
+    def test_fresh_field_skipped(self):
+        freshness.mark_fresh(self.home, 'geocoords', self.inputs)
+        self.assertFalse(freshness.needs_update(self.home, 'geocoords', self.inputs))
+
+    def test_changed_inputs_need_update(self):
+        freshness.mark_fresh(self.home, 'geocoords', self.inputs)
+        self.assertTrue(freshness.needs_update(self.home, 'geocoords', ('456 OAK ST', '22204')))
+
+    def test_stale_field_needs_update(self):
+        self.home.update(commute_time=30, first_leg='Bus', first_walk=4.0)
+        freshness.mark_fresh(self.home, 'commute', self.inputs)
+        long_ago = datetime.now() - timedelta(days=365)
+        self.home['enriched']['commute']['at'] = long_ago.strftime(deathpledge.TIMEFORMAT)
+        self.assertTrue(freshness.needs_update(self.home, 'commute', self.inputs))
+
+    def test_force(self):
+        freshness.mark_fresh(self.home, 'geocoords', self.inputs)
+        self.assertTrue(freshness.needs_update(self.home, 'geocoords', self.inputs, force=True))
+
+    def test_untracked_field_adopted(self):
+        self.assertFalse(freshness.needs_update(self.home, 'geocoords', self.inputs))
+        self.assertIn('geocoords', self.home['enriched'])
+
+
+class CarryOverTestCase(unittest.TestCase):
+    def test_enriched_fields_copied(self):
+        existing = {'geocoords': [38.86, -77.06], 'Gym_dist': '1.00 miles', 'Gym_time': '0:05:00',
+                    'list_price': 100}
+        freshness.mark_fresh(existing, 'geocoords', ('addr',))
+        freshness.mark_fresh(existing, 'driving:Gym', ('inputs',))
+        home = {'list_price': 200}
+        freshness.carry_over(home, existing)
+        self.assertEqual(home['Gym_time'], '0:05:00')
+        self.assertEqual(home['list_price'], 200)
+        self.assertEqual(set(home['enriched']), {'geocoords', 'driving:Gym'})
+
+
+class IncrementalBingTestCase(unittest.TestCase):
+    """Re-enriching an up-to-date home calls no Bing steps."""
+
+    def setUp(self):
+        use_memory_bing(self)
+        self.registry = make_registry()
+        self.home = {'full_address': '1 Test Ct', 'parsed_address': {'ZipCode': '22204'}}
+        self.steps_run = []
+
+    def _enrich(self, force=False):
+        getter = bing.BingDataGetter(self.home, registry=self.registry, force=force)
+
+        def fake_geocode():
+            self.steps_run.append('geocoords')
+            self.home['geocoords'] = bing.Geocoords(38.86, -77.06)
+            freshness.mark_fresh(self.home, 'geocoords', getter._geocode_inputs())
+
+        def fake_commute():
+            self.steps_run.append('commute')
+            self.home.update(commute_time=30.0, first_leg='Bus', first_walk=4.0)
+            freshness.mark_fresh(self.home, 'commute', getter._commute_inputs())
+
+        def fake_metro():
+            self.steps_run.append('nearby_metro')
+            self.home['nearby_metro'] = {}
+            freshness.mark_fresh(self.home, 'nearby_metro', getter._metro_inputs())
+
+        getter._get_home_coordinates = fake_geocode
+        getter._get_commute = fake_commute
+        getter._get_nearby_metro = fake_metro
+        getter.add_data_to_home(driving=False)
+
+    def test_second_enrich_runs_nothing(self):
+        self._enrich()
+        self.assertEqual(sorted(self.steps_run), ['commute', 'geocoords', 'nearby_metro'])
+        self.steps_run.clear()
+        self._enrich()
+        self.assertEqual(self.steps_run, [])
+
+    def test_address_change_reruns_everything(self):
+        self._enrich()
+        self.steps_run.clear()
+        self.home['full_address'] = '2 Other Ct'
+        self._enrich()
+        self.assertIn('geocoords', self.steps_run)
+
+    def test_force_reruns_everything(self):
+        self._enrich()
+        self.steps_run.clear()
+        self._enrich(force=True)
+        self.assertEqual(sorted(self.steps_run), ['commute', 'geocoords', 'nearby_metro'])
+
+
+class CarriedOverEnrichTestCase(unittest.TestCase):
+    """A doc carried over from the database re-runs its stale steps."""
+
+    def setUp(self):
+        use_memory_bing(self)
+        self.registry = make_registry()
+        address = {'full_address': '1 Test Ct', 'parsed_address': {'ZipCode': '22204'}}
+        saved = dict(address, geocoords=bing.Geocoords(38.86, -77.06), commute_time=30.0,
+                     first_leg='Bus', first_walk=4.0, nearby_metro={})
+        getter = bing.BingDataGetter(saved, registry=self.registry)
+        freshness.mark_fresh(saved, 'geocoords', getter._geocode_inputs())
+        freshness.mark_fresh(saved, 'commute', getter._commute_inputs())
+        freshness.mark_fresh(saved, 'nearby_metro', getter._metro_inputs())
+        long_ago = datetime.now() - timedelta(days=365)
+        saved['enriched']['commute']['at'] = long_ago.strftime(deathpledge.TIMEFORMAT)
+        # As read back from the database, with geocoords as a plain list
+        self.saved = json.loads(json.dumps(saved))
+        self.home = dict(address)
+        self.commute_requests = []
+
+    def _fake_commute(self, commute_request):
+        self.commute_requests.append(commute_request)
+        return bing.Commute(commute_time=25.0, first_leg='Train', first_walk=3.0)
+
+    def test_stale_commute_recomputed(self):
+        freshness.carry_over(self.home, self.saved)
+        getter = bing.BingDataGetter(self.home, registry=self.registry)
+        getter.bing_api.get_commute = self._fake_commute
+        getter.add_data_to_home(driving=False)
+        self.assertEqual(len(self.commute_requests), 1)
+        self.assertEqual(self.commute_requests[0].url_args['wp.0'], '38.86,-77.06')
+        self.assertEqual(self.home['commute_time'], 25.0)
+        self.assertFalse(freshness.needs_update(self.home, 'commute', getter._commute_inputs()))
+
+
+if __name__ == '__main__':
+    unittest.main()
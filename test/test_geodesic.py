@@ -0,0 +1,82 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from deathpledge import enrich, geodesic, support
+from deathpledge.api_calls import locations
+
+CENTER = (38.9, -77.0)
+
+
+class GeodesicTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.coords = np.column_stack([rng.uniform(38.5, 39.5, 50), rng.uniform(-77.5, -76.5, 50)])
+
+    def test_matches_scalar_haversine(self):
+        expected = [support.haversine(tuple(x), CENTER) for x in self.coords]
+        np.testing.assert_allclose(geodesic.distance_to(self.coords, CENTER), expected)
+
+    def test_missing_coords_are_nan(self):
+        dists = geodesic.distance_to([CENTER, None], CENTER)
+        self.assertEqual(dists[0], 0)
+        self.assertTrue(np.isnan(dists[1]))
+
+    def test_matrix_matches_rows(self):
+        others = self.coords[:7]
+        matrix = geodesic.distance_matrix(self.coords, others)
+        self.assertEqual(matrix.shape, (50, 7))
+        np.testing.assert_allclose(matrix[:, 3], geodesic.distance_to(self.coords, others[3]))
+
+    def test_chunking_gives_same_matrix(self):
+        whole = geodesic.distance_matrix(self.coords, self.coords)
+        chunked = geodesic.distance_matrix(self.coords, self.coords, max_cells=60)
+        np.testing.assert_array_equal(whole, chunked)
+
+    def test_bearing_compass_points(self):
+        bearings = geodesic.bearing([(38.8, -77.0), (38.9, -77.1), (39.0, -77.0)], CENTER)
+        np.testing.assert_allclose(bearings, [0, 90, 180], atol=0.1)
+
+    def test_within_radius_one_center(self):
+        mask = geodesic.within_radius(self.coords, CENTER, 10)
+        np.testing.assert_array_equal(mask, geodesic.distance_to(self.coords, CENTER) <= 10)
+
+    def test_within_radius_many_centers(self):
+        mask = geodesic.within_radius(self.coords, self.coords[:3], 10, max_cells=20)
+        self.assertEqual(mask.shape, (50, 3))
+        self.assertTrue(mask[[0, 1, 2], [0, 1, 2]].all())
+
+    def test_count_within(self):
+        counts = geodesic.count_within(self.coords, self.coords, 10, max_cells=60)
+        expected = geodesic.within_radius(self.coords, self.coords, 10).sum(axis=1)
+        np.testing.assert_array_equal(counts, expected)
+
+
+class TetherBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        registry = locations.LocationRegistry({
+            'centerpoint': {'lat': CENTER[0], 'lon': CENTER[1]},
+            'work_coords': {'lat': 38.89, 'lon': -77.01},
+        }, registry_path=None)
+        patcher = mock.patch.object(locations, '_registry', registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_as_one_at_a_time(self):
+        homes = [{'geocoords': [38.95, -77.05]}, {'geocoords': [38.7, -76.9]}]
+        singles = [dict(x) for x in homes]
+        enrich.add_tether_batch(homes)
+        for home in singles:
+            enrich.add_tether(home)
+        self.assertEqual([x['tether'] for x in homes], [x['tether'] for x in singles])
+
+    def test_homes_without_coords_skipped(self):
+        homes = [{}, {'geocoords': list(CENTER)}]
+        enrich.add_tether_batch(homes)
+        self.assertNotIn('tether', homes[0])
+        self.assertEqual(homes[1]['tether'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from deathpledge.api_calls import bing, locations
+
+
+class FakeBingAPI(object):
+    """Stands in for BingMapsAPI, counting calls instead of making them."""
+
+    def __init__(self):
+        self.geocode_calls = 0
+        self.driving_calls = []
+
+    def get_geocoords(self, geocoder):
+        self.geocode_calls += 1
+        return bing.Geocoords(38.8, -77.1)
+
+    def get_driving_info(self, driving_request):
+        self.driving_calls.append(driving_request)
+        return bing.Drive(distance='1.00 miles', duration='0:05:00')
+
+
+class LocationRegistryTestCase(unittest.TestCase):
+    config = {
+        'favorite_driving': {
+            'Gym': {'addr': '100 Main St', 'day': 0, 'time': '18:00'},
+            'Grocery': {'addr': '200 Main St', 'day': 5, 'time': '12:00'},
+        },
+        'centerpoint': {'lat': 38.9, 'lon': -77.0},
+        'work_coords': {'lat': 38.89, 'lon': -77.01},
+    }
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.registry_path = os.path.join(self.tmpdir.name, 'locations.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_favorites_geocoded_once(self):
+        bing_api = FakeBingAPI()
+        registry = locations.LocationRegistry(self.config, registry_path=self.registry_path)
+        registry.resolve(bing_api=bing_api)
+        self.assertEqual(bing_api.geocode_calls, 2)
+        self.assertEqual(registry.favorite_driving['Gym'].time, '18:00')
+        self.assertIsInstance(registry.work_coords, bing.Geocoords)
+
+    def test_saved_favorites_not_geocoded_again(self):
+        locations.LocationRegistry(self.config, registry_path=self.registry_path).resolve(
+            bing_api=FakeBingAPI())
+        bing_api = FakeBingAPI()
+        registry = locations.LocationRegistry(self.config, registry_path=self.registry_path)
+        registry.resolve(bing_api=bing_api)
+        self.assertEqual(bing_api.geocode_calls, 0)
+        self.assertEqual(registry.favorite_driving['Grocery'].coords, bing.Geocoords(38.8, -77.1))
+
+    def test_driving_uses_registry_coords(self):
+        registry = locations.LocationRegistry(self.config, registry_path=None)
+        registry.resolve(bing_api=FakeBingAPI())
+        home = {'full_address': '1 Test Ct', 'geocoords': bing.Geocoords(38.85, -77.05)}
+        getter = bing.BingDataGetter(home, registry=registry)
+        getter.bing_api = FakeBingAPI()
+        getter._get_driving()
+        self.assertEqual(getter.bing_api.geocode_calls, 0)
+        self.assertEqual(len(getter.bing_api.driving_calls), 2)
+        self.assertEqual(home['Gym_time'], '0:05:00')
+
+
+if __name__ == '__main__':
+    unittest.main()
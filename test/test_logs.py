@@ -0,0 +1,109 @@
+import logging
+import threading
+import unittest
+
+from deathpledge.logs import log_setup
+
+
+class ListHandler(logging.Handler):
+    """Keeps formatted records, noting the thread that handled them."""
+
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.messages = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+        self.threads.add(threading.current_thread().name)
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_logger(name, *handlers):
+    logger = logging.getLogger(f'test.logs.{name}')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    for handler in handlers:
+        logger.addHandler(handler)
+    return logger
+
+
+class RateLimitFilterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.handler = ListHandler()
+        self.logger = make_logger('rate', self.handler)
+        self.logger.addFilter(log_setup.RateLimitFilter(burst=3, interval=60, clock=self.clock))
+        self.addCleanup(self.logger.handlers.clear)
+        self.addCleanup(self.logger.filters.clear)
+
+    def log_items(self, count):
+        for i in range(count):
+            self.logger.info('item %s', i)
+
+    def test_burst_then_suppressed(self):
+        self.log_items(10)
+        self.assertEqual(self.handler.messages, ['item 0', 'item 1', 'item 2'])
+
+    def test_next_interval_reports_suppressed(self):
+        self.log_items(10)
+        self.clock.now = 61
+        self.log_items(1)
+        self.assertEqual(self.handler.messages[-1], 'item 0 (7 similar messages suppressed)')
+
+    def test_call_sites_counted_separately(self):
+        self.log_items(5)
+        self.logger.info('other site')
+        self.assertEqual(self.handler.messages[-1], 'other site')
+
+
+class QueueLoggingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(log_setup.stop_queue_logging)
+
+    def test_records_written_from_listener_thread(self):
+        handler = ListHandler()
+        logger = make_logger('queued', handler)
+        self.addCleanup(logger.handlers.clear)
+        log_setup.start_queue_logging([logger])
+        self.assertIsInstance(logger.handlers[0], logging.handlers.QueueHandler)
+        for i in range(5):
+            logger.info('doc %s uploaded', i)
+        log_setup.stop_queue_logging()
+        self.assertEqual(handler.messages, [f'doc {i} uploaded' for i in range(5)])
+        self.assertNotIn(threading.current_thread().name, handler.threads)
+
+    def test_loggers_keep_their_own_handlers(self):
+        shared, files = ListHandler(), ListHandler()
+        package = make_logger('package', files, shared)
+        database = make_logger('database', shared)
+        self.addCleanup(package.handlers.clear)
+        self.addCleanup(database.handlers.clear)
+        listeners = log_setup.start_queue_logging([package, database])
+        self.assertEqual(len(listeners), 2)
+        package.info('to both')
+        database.info('to shared only')
+        log_setup.stop_queue_logging()
+        self.assertEqual(files.messages, ['to both'])
+        self.assertEqual(sorted(shared.messages), ['to both', 'to shared only'])
+
+    def test_handler_levels_respected(self):
+        handler = ListHandler(level=logging.INFO)
+        logger = make_logger('levels', handler)
+        self.addCleanup(logger.handlers.clear)
+        log_setup.start_queue_logging([logger])
+        logger.debug('hidden')
+        logger.info('shown')
+        log_setup.stop_queue_logging()
+        self.assertEqual(handler.messages, ['shown'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from deathpledge import database, metrics, support, tracing
+from test.test_resilience import make_provider
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+        patcher = mock.patch.object(metrics, '_registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_counter_by_labels(self):
+        calls = metrics.counter('calls_total', 'Calls', ['provider'])
+        calls.inc(provider='bing')
+        calls.inc(2, provider='bing')
+        calls.inc(provider='cloudant')
+        self.assertEqual(calls.get(provider='bing'), 3)
+        self.assertIs(metrics.counter('calls_total', 'Calls', ['provider']), calls)
+
+    def test_wrong_labels_raise(self):
+        calls = metrics.counter('calls_total', 'Calls', ['provider'])
+        with self.assertRaises(ValueError):
+            calls.inc(service='bing')
+        with self.assertRaises(ValueError):
+            metrics.histogram('calls_total', 'Calls', ['provider'])
+
+    def test_histogram_percentiles(self):
+        latency = metrics.histogram('latency_seconds', 'Latency', ['span'])
+        for value in range(1, 101):
+            latency.observe(value / 100, span='bing')
+        self.assertEqual(latency.percentile(50, span='bing'), 0.5)
+        self.assertEqual(latency.percentile(99, span='bing'), 0.99)
+        summary = self.registry.to_dict()['metrics']['latency_seconds']['values'][0]
+        self.assertEqual((summary['count'], summary['p90'], summary['max']), (100, 0.9, 1.0))
+
+    def test_prometheus_text(self):
+        metrics.counter('docs_total', 'Docs', ['db', 'outcome']).inc(3, db='clean', outcome='written')
+        latency = metrics.histogram('latency_seconds', 'Latency', buckets=(0.1, 1))
+        for value in [0.05, 0.5, 5]:
+            latency.observe(value)
+        metrics.gauge('note', 'Quotes "and" newlines', ['text']).set(1, text='a "b"\nc')
+        lines = self.registry.to_prometheus().splitlines()
+        self.assertIn('# TYPE docs_total counter', lines)
+        self.assertIn('docs_total{db="clean",outcome="written"} 3', lines)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{le="1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn('latency_seconds_count 3', lines)
+        self.assertIn(r'note{text="a \"b\"\nc"} 1', lines)
+
+    def test_finish_run_writes_files(self):
+        metrics.counter('pages_total', 'Pages').inc()
+        with tempfile.TemporaryDirectory() as metrics_dir:
+            json_path, textfile_path = metrics.finish_run(True, metrics_dir=metrics_dir, textfile_dir=metrics_dir)
+            with open(json_path) as f:
+                report = json.load(f)
+            with open(textfile_path) as f:
+                text = f.read()
+            files = os.listdir(metrics_dir)
+        self.assertEqual(len(files), 2)
+        self.assertEqual(report['metrics']['pages_total']['values'][0]['value'], 1)
+        self.assertIn('deathpledge_run_success 1', text.splitlines())
+
+    def test_provider_calls_counted(self):
+        provider = make_provider(max_attempts=2)
+        responses = iter([support.BadResponse('down', status_code=503), 'ok'])
+
+        def request():
+            response = next(responses)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        provider.call(request)
+        calls = self.registry.metrics['deathpledge_api_calls_total']
+        self.assertEqual(calls.get(provider='test', outcome='error'), 1)
+        self.assertEqual(calls.get(provider='test', outcome='ok'), 1)
+
+    def test_upload_outcomes_counted(self):
+        resp = [{'id': 'a', 'ok': True}, {'id': 'b', 'error': 'conflict'}, {'id': 'c', 'error': 'forbidden'}]
+        database.get_successful_uploads(resp, db_name='clean')
+        docs = self.registry.metrics['deathpledge_docs_total']
+        self.assertEqual([docs.get(db='clean', outcome=x) for x in ['written', 'conflicted', 'failed']], [1, 1, 1])
+
+    def test_spans_observed(self):
+        with mock.patch.object(tracing, '_tracer', tracing.Tracer()):
+            with tracing.span('clean'):
+                pass
+        self.assertEqual(len(self.registry.metrics['deathpledge_span_seconds'].values[('clean',)]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
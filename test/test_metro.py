@@ -0,0 +1,182 @@
+import os
+import tempfile
+import unittest
+
+from deathpledge import support
+from deathpledge.api_calls import bing, cache, metro
+
+
+def seed_index(index, stations):
+    """Load *stations* into *index* through a station list CSV."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filepath = os.path.join(tmpdir, 'stations.csv')
+        with open(filepath, 'w') as f:
+            f.write('name,lat,lon\n')
+            for name, (lat, lon) in stations.items():
+                f.write(f'{name.title()},{lat},{lon}\n')
+        index.load_csv(filepath)
+
+
+class MetroStationIndexTestCase(unittest.TestCase):
+    stations = {
+        'PENTAGON CITY': (38.8627, -77.0597),
+        'CRYSTAL CITY': (38.8579, -77.0502),
+        'BALLSTON-MU': (38.8822, -77.1117),
+    }
+
+    def setUp(self):
+        self.index = metro.MetroStationIndex(
+            station_table=cache.SQLiteCache(table='metro_station_list', db_path=':memory:'))
+
+    def test_empty_index_does_not_cover(self):
+        self.assertIsNone(self.index.nearest(bing.Geocoords(38.86, -77.06)))
+
+    def test_same_station_under_another_name_kept_once(self):
+        seed_index(self.index, self.stations)
+        self.index.seed({'PENTAGON-CITY': (38.86272, -77.05968)})
+        nearest = self.index.nearest(bing.Geocoords(38.8630, -77.0600), k=2)
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual([name for name, _ in nearest], ['PENTAGON CITY', 'CRYSTAL CITY'])
+
+    def test_seeded_table_reused(self):
+        seed_index(self.index, self.stations)
+        reopened = metro.MetroStationIndex(station_table=self.index.station_table)
+        self.assertTrue(reopened.seeded)
+        self.assertEqual(len(reopened), 3)
+
+    def test_nearest_stations_in_order(self):
+        seed_index(self.index, self.stations)
+        nearest = self.index.nearest(bing.Geocoords(38.8630, -77.0600), k=2)
+        self.assertEqual([name for name, _ in nearest], ['PENTAGON CITY', 'CRYSTAL CITY'])
+
+    def test_far_location_not_covered(self):
+        seed_index(self.index, self.stations)
+        self.assertIsNone(self.index.nearest(bing.Geocoords(39.3, -76.6)))
+
+    def test_load_csv(self):
+        seed_index(self.index, self.stations)
+        self.assertEqual(len(self.index), 3)
+        self.assertIn('BALLSTON-MU', self.index.names)
+        self.assertTrue(self.index.seeded)
+
+
+class NearbyMetroCallCountTestCase(unittest.TestCase):
+    """Once stations are seeded and walks cached, nearby homes make no Bing calls."""
+    stations = {
+        'PENTAGON CITY METRO STATION': (38.8627, -77.0597),
+        'CRYSTAL CITY METRO STATION': (38.8579, -77.0502),
+    }
+
+    def setUp(self):
+        self.calls = []
+        self.sweep_fails = False
+        self.station_index = metro.MetroStationIndex(
+            station_table=cache.SQLiteCache(table='metro_station_list', db_path=':memory:'))
+        self.bing_api = bing.BingMapsAPI(
+            geocode_cache=cache.GeocodeCache(db_path=':memory:'),
+            route_cache=cache.RouteCache(db_path=':memory:'),
+            station_index=self.station_index
+        )
+        self.bing_api._get_api_response = self._fake_response
+
+    def _fake_response(self, api_call):
+        self.calls.append(type(api_call).__name__)
+        if isinstance(api_call, bing.BingMetroSweepAPICall):
+            if self.sweep_fails:
+                raise support.BadResponse('Response code from bing 500, not 200.', status_code=500)
+            return {'resourceSets': [{'resources': [
+                {'name': 'Pentagon City Metro Station', 'point': {'coordinates': [38.8627, -77.0597]}},
+                {'name': 'Crystal City Metro Station', 'point': {'coordinates': [38.8579, -77.0502]}},
+            ]}]}
+        if isinstance(api_call, bing.BingNearbyMetroAPICall):
+            return {'resourceSets': [{'resources': [
+                {'name': 'Owings Mills Metro Station', 'point': {'coordinates': [39.4022, -76.7794]}},
+                {'name': 'Old Court Metro Station', 'point': {'coordinates': [39.3743, -76.7557]}},
+            ]}]}
+        return {'resourceSets': [{'resources': [{'travelDistance': 0.5, 'travelDuration': 600}]}]}
+
+    def _get_metro(self, coords):
+        homecoords = bing.Geocoords(*coords)
+        return self.bing_api.get_nearby_metro(bing.BingNearbyMetroAPICall(homecoords), homecoords)
+
+    def test_unseeded_index_sweeps_once(self):
+        nearby = self._get_metro((38.8630, -77.0600))
+        self._get_metro((38.8700, -77.0650))
+        self.assertEqual(self.calls.count('BingMetroSweepAPICall'), 1)
+        self.assertEqual(self.calls.count('BingNearbyMetroAPICall'), 0)
+        self.assertEqual(nearby['PENTAGON CITY METRO STATION'],
+                         {'distance': 0.5, 'duration': '0:10:00'})
+
+    def test_failed_sweep_searches_every_home(self):
+        self.sweep_fails = True
+        self._get_metro((39.3900, -76.7700))
+        self._get_metro((39.3910, -76.7710))
+        self.assertEqual(self.calls.count('BingMetroSweepAPICall'), 1)
+        self.assertEqual(self.calls.count('BingNearbyMetroAPICall'), 2)
+
+    def test_local_search_results_not_added(self):
+        seed_index(self.station_index, self.stations)
+        nearby = self._get_metro((39.3900, -76.7700))
+        self.assertIn('OWINGS MILLS METRO STATION', nearby)
+        self.assertEqual(len(self.station_index), 2)
+        self.assertNotIn('BingMetroSweepAPICall', self.calls)
+
+    def test_seeded_index_skips_local_search(self):
+        seed_index(self.station_index, self.stations)
+        nearby = self._get_metro((38.8630, -77.0600))
+        self.assertEqual(self.calls, ['BingWalkAPICall', 'BingWalkAPICall'])
+        self.assertEqual(nearby['PENTAGON CITY METRO STATION'],
+                         {'distance': 0.5, 'duration': '0:10:00'})
+
+    def test_same_block_costs_zero_calls(self):
+        seed_index(self.station_index, self.stations)
+        first = self._get_metro((38.8630, -77.0600))
+        self.calls.clear()
+        second = self._get_metro((38.86301, -77.06002))
+        self.assertEqual(self.calls, [])
+        self.assertEqual(first, second)
+
+
+class SweepMetroStationsTestCase(unittest.TestCase):
+    center = bing.Geocoords(38.9, -77.0)
+
+    def setUp(self):
+        self.calls = []
+        self.bing_api = bing.BingMapsAPI(
+            geocode_cache=cache.GeocodeCache(db_path=':memory:'),
+            route_cache=cache.RouteCache(db_path=':memory:'),
+            station_index=metro.MetroStationIndex(
+                station_table=cache.SQLiteCache(table='metro_station_list', db_path=':memory:'))
+        )
+        self.bing_api._get_api_response = self._fake_response
+
+    def _fake_response(self, api_call):
+        """A full page for wide circles, one station in the middle of narrow ones."""
+        self.calls.append(api_call.url_args['userCircularMapView'])
+        lat, lon, meters = (float(x) for x in api_call.url_args['userCircularMapView'].split(','))
+        count = api_call.max_results if meters > 20000 else 1
+        return {'resourceSets': [{'resources': [
+            {'name': f'Station {lat:.4f} {lon:.4f} {i}', 'point': {'coordinates': [lat, lon]}}
+            for i in range(count)
+        ]}]}
+
+    def test_narrow_circle_searched_once(self):
+        stations = self.bing_api.sweep_metro_stations(self.center, 10)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(stations), 1)
+
+    def test_full_circle_split_in_seven(self):
+        stations = self.bing_api.sweep_metro_stations(self.center, 20)
+        self.assertEqual(len(self.calls), 8)
+        self.assertEqual(len(stations), 7)
+        for coords in stations.values():
+            self.assertLess(support.haversine(self.center, coords), 17.4)
+
+    def test_not_split_below_min_radius(self):
+        stations = self.bing_api.sweep_metro_stations(self.center, 20, min_radius_miles=15)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(stations), bing.BingMetroSweepAPICall.max_results)
+
+
+if __name__ == '__main__':
+    unittest.main()
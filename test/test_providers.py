@@ -0,0 +1,218 @@
+from datetime import datetime
+import threading
+import unittest
+from unittest import mock
+
+from deathpledge import metrics, resilience, support
+from deathpledge.api_calls import bing, cache, citymapper, providers, standin
+from test.helpers import make_registry
+
+START = bing.Geocoords(38.85, -77.05)
+END = bing.Geocoords(38.89, -77.01)
+
+
+def drive_request():
+    return bing.BingDrivingAPICall(startcoords=START, endcoords=END, dayofweek=0, hrmin='18:00')
+
+
+class FakeProvider(object):
+    """Answers drives and geocodes with fixed values, counting calls."""
+
+    def __init__(self, name, cache_results=True, drive=None, error=None, delay=None):
+        self.name = name
+        self.cache_results = cache_results
+        self.drive = drive or bing.Drive(distance='1.00 miles', duration='0:05:00')
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    def _answer(self, value):
+        self.calls += 1
+        if self.delay is not None:
+            self.delay.wait(5)
+        if self.error is not None:
+            raise self.error
+        return value
+
+    def get_driving_info(self, driving_request):
+        return self._answer(self.drive)
+
+    def get_geocoords(self, geocoder):
+        return self._answer(bing.Geocoords(38.8, -77.1))
+
+
+class ProviderChainTestCase(unittest.TestCase):
+    def setUp(self):
+        self.route_cache = cache.RouteCache(db_path=':memory:')
+        self.geocode_cache = cache.GeocodeCache(db_path=':memory:')
+
+    def make_chain(self, drive_providers, timeout=5):
+        return providers.ProviderChain(
+            {'drive': drive_providers, 'geocode': drive_providers}, timeout=timeout,
+            geocode_cache=self.geocode_cache, route_cache=self.route_cache
+        )
+
+    def test_first_provider_answers(self):
+        first, second = FakeProvider('first'), FakeProvider('second')
+        self.make_chain([first, second]).get_driving_info(drive_request())
+        self.assertEqual((first.calls, second.calls), (1, 0))
+
+    def test_falls_back_on_failure(self):
+        failing = FakeProvider('failing', error=support.BadResponse('down', status_code=503))
+        backup = FakeProvider('backup', drive=bing.Drive('2.00 miles', '0:10:00'))
+        drive = self.make_chain([failing, backup]).get_driving_info(drive_request())
+        self.assertEqual(drive, bing.Drive('2.00 miles', '0:10:00'))
+
+    def test_falls_back_on_no_answer(self):
+        class NoRoute(FakeProvider):
+            def get_driving_info(self, driving_request):
+                return None
+
+        backup = FakeProvider('backup')
+        self.make_chain([NoRoute('none'), backup]).get_driving_info(drive_request())
+        self.assertEqual(backup.calls, 1)
+
+    def test_slow_provider_skipped(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        slow = FakeProvider('slow', delay=release)
+        backup = FakeProvider('backup', drive=bing.Drive('2.00 miles', '0:10:00'))
+        drive = self.make_chain([slow, backup], timeout=0.1).get_driving_info(drive_request())
+        self.assertEqual(drive.distance, '2.00 miles')
+
+    def test_abandoned_call_not_retried(self):
+        release, finished = threading.Event(), threading.Event()
+        self.addCleanup(release.set)
+        slow = FakeProvider('slow', error=support.BadResponse('down', status_code=503), delay=release)
+        retrying = resilience.Provider('slow', sleep=lambda seconds: None, quota=resilience.QuotaCounter('slow'))
+
+        class RetryingProvider(object):
+            name = 'slow'
+            cache_results = True
+
+            def get_driving_info(self, driving_request):
+                try:
+                    return retrying.call(slow.get_driving_info, driving_request)
+                finally:
+                    finished.set()
+
+        abandoned = metrics.counter('deathpledge_provider_abandoned_total',
+                                    'Provider calls given up on for taking too long, by field',
+                                    ['provider', 'field'])
+        abandoned_before = abandoned.get(provider='slow', field='drive')
+        backup = FakeProvider('backup')
+        self.make_chain([RetryingProvider(), backup], timeout=0.1).get_driving_info(drive_request())
+        release.set()
+        self.assertTrue(finished.wait(5))
+        self.assertEqual(slow.calls, 1)
+        self.assertEqual(backup.calls, 1)
+        self.assertEqual(abandoned.get(provider='slow', field='drive'), abandoned_before + 1)
+
+    def test_remote_results_cached(self):
+        remote = FakeProvider('remote')
+        chain = self.make_chain([remote])
+        chain.get_driving_info(drive_request())
+        chain.get_driving_info(drive_request())
+        self.assertEqual(remote.calls, 1)
+
+    def test_local_results_not_cached(self):
+        local = FakeProvider('local', cache_results=False)
+        chain = self.make_chain([local])
+        chain.get_driving_info(drive_request())
+        chain.get_driving_info(drive_request())
+        self.assertEqual(local.calls, 2)
+        self.assertEqual(self.route_cache.items(), [])
+
+    def test_geocodes_cached(self):
+        remote = FakeProvider('remote')
+        chain = self.make_chain([remote])
+        geocoder = bing.BingGeocoderAPICall(address='1 Test Ct', zip_code=20001)
+        chain.get_geocoords(geocoder)
+        self.assertEqual(chain.get_geocoords(geocoder), bing.Geocoords(38.8, -77.1))
+        self.assertEqual(remote.calls, 1)
+
+    def test_all_failing_raises(self):
+        failing = FakeProvider('failing', error=support.BadResponse('down'))
+        with self.assertRaises(providers.NoProvider):
+            self.make_chain([failing]).get_driving_info(drive_request())
+
+    def test_quota_exceeded_raised_when_nothing_answers(self):
+        out_of_quota = FakeProvider('bing', error=resilience.QuotaExceeded('used up'))
+        failing = FakeProvider('failing', error=support.BadResponse('down'))
+        with self.assertRaises(resilience.QuotaExceeded):
+            self.make_chain([out_of_quota, failing]).get_driving_info(drive_request())
+
+    def test_providers_without_field_left_out(self):
+        chain = providers.ProviderChain({'transit': [FakeProvider('drives only')]})
+        self.assertEqual(chain.priorities['transit'], [])
+
+    def test_learners_get_fetched_routes(self):
+        learner = FakeProvider('learner', error=support.BadResponse('no estimate'))
+        learner.add = mock.Mock()
+        self.make_chain([learner, FakeProvider('remote')]).get_driving_info(drive_request())
+        learner.add.assert_called_once()
+
+    def test_matrix_router_only_for_local_first(self):
+        local = FakeProvider('local', cache_results=False)
+        local.get_distance_matrix = mock.Mock()
+        self.assertIs(self.make_chain([local]).matrix_router(), local)
+        self.assertIsNone(self.make_chain([providers.BingProvider(), local]).matrix_router())
+
+
+class StandInProviderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.chain = providers.ProviderChain(
+            {field: [providers.StandInProvider()] for field in providers.FIELD_METHODS},
+            route_cache=cache.RouteCache(db_path=':memory:'),
+            geocode_cache=cache.GeocodeCache(db_path=':memory:')
+        )
+
+    def test_answers_every_field(self):
+        geocoords = self.chain.get_geocoords(bing.BingGeocoderAPICall(address='1 Test Ct'))
+        self.assertIsInstance(geocoords, bing.Geocoords)
+        commute = self.chain.get_commute(bing.BingCommuteAPICall(startcoords=START, endcoords=END))
+        self.assertEqual(commute.first_leg, 'Bus')
+        walk = self.chain.get_walk_time(bing.BingWalkAPICall(startcoords=START, endcoords=END))
+        self.assertGreater(walk.distance, 0)
+        self.assertTrue(self.chain.get_driving_info(drive_request()).distance.endswith('miles'))
+
+    def test_errors_fall_back(self):
+        with standin.StandInBingServer(error_rate=1.0) as server:
+            chain = providers.ProviderChain(
+                {'drive': [providers.StandInProvider(server), providers.StandInProvider()]},
+                route_cache=cache.RouteCache(db_path=':memory:')
+            )
+            self.assertIsInstance(chain.get_driving_info(drive_request()), bing.Drive)
+
+    def test_drop_in_for_bing_in_enrichment(self):
+        registry = make_registry()
+        home = {'full_address': '1 Test Ct', 'parsed_address': {'ZipCode': 20001}}
+        getter = bing.BingDataGetter(home, registry=registry, providers=self.chain)
+        getter._get_home_coordinates()
+        getter._get_commute()
+        self.assertIn('geocoords', home)
+        self.assertEqual(home['first_leg'], 'Bus')
+
+
+class CitymapperProviderTestCase(unittest.TestCase):
+    def _arrival_time(self, bing_datetime=None):
+        commute_request = bing.BingCommuteAPICall(startcoords=START, endcoords=END)
+        if bing_datetime is not None:
+            commute_request.url_args['dateTime'] = bing_datetime
+        with mock.patch.object(citymapper, 'get_travel_time_minutes', return_value=42) as travel_time:
+            commute = citymapper.CitymapperAPI().get_commute(commute_request)
+        self.assertEqual(commute, bing.Commute(commute_time=42.0, first_leg=None, first_walk=None))
+        return travel_time.call_args.kwargs['arrival_time']
+
+    def test_commute_from_travel_time(self):
+        arrival = datetime.fromisoformat(self._arrival_time())
+        self.assertEqual(arrival.strftime('%H:%M'), '06:30')
+        self.assertIsNotNone(arrival.utcoffset())
+
+    def test_arrival_offset_follows_daylight_saving(self):
+        self.assertEqual(self._arrival_time('07/14/2026 06:30:00'), '2026-07-14T06:30:00-04:00')
+        self.assertEqual(self._arrival_time('01/13/2026 06:30:00'), '2026-01-13T06:30:00-05:00')
+
+
+if __name__ == '__main__':
+    unittest.main()
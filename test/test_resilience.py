@@ -0,0 +1,147 @@
+import unittest
+
+import requests
+
+from deathpledge import resilience, support
+from deathpledge.api_calls import cache
+
+
+def make_provider(**kwargs):
+    store = cache.SQLiteCache(table='quotas', db_path=':memory:')
+    kwargs.setdefault('quota', resilience.QuotaCounter('test', store=store))
+    return resilience.Provider('test', sleep=lambda seconds: None, **kwargs)
+
+
+class FlakyCall(object):
+    """Fails with the given exceptions in turn, then succeeds."""
+
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return 'ok'
+
+
+class RetryTestCase(unittest.TestCase):
+    def test_transient_failures_retried(self):
+        call = FlakyCall(support.BadResponse(status_code=503), support.BadResponse(status_code=429))
+        self.assertEqual(make_provider().call(call), 'ok')
+        self.assertEqual(call.calls, 3)
+
+    def test_client_errors_not_retried(self):
+        call = FlakyCall(support.BadResponse(status_code=404))
+        with self.assertRaises(support.BadResponse):
+            make_provider().call(call)
+        self.assertEqual(call.calls, 1)
+
+    def test_gives_up_after_max_attempts(self):
+        call = FlakyCall(*[requests.ConnectionError()] * 5)
+        with self.assertRaises(requests.ConnectionError):
+            make_provider(max_attempts=3).call(call)
+        self.assertEqual(call.calls, 3)
+
+    def test_non_idempotent_call_not_retried(self):
+        call = FlakyCall(support.BadResponse(status_code=503))
+        with self.assertRaises(support.BadResponse):
+            make_provider().call(call, idempotent=False)
+        self.assertEqual(call.calls, 1)
+
+    def test_no_retry_after_deadline(self):
+        call = FlakyCall(support.BadResponse(status_code=503))
+        with resilience.deadline(0), self.assertRaises(resilience.DeadlinePassed):
+            make_provider().call(call)
+        self.assertEqual(call.calls, 1)
+
+    def test_status_read_from_http_error(self):
+        response = requests.Response()
+        response.status_code = 502
+        self.assertTrue(resilience.is_retryable(requests.HTTPError(response=response)))
+
+    def test_backoff_grows_and_is_capped(self):
+        ceilings = [max(resilience.backoff_delay(n, base_delay=1, max_delay=8) for _ in range(200))
+                    for n in range(6)]
+        self.assertLess(ceilings[0], 1)
+        self.assertGreater(ceilings[2], 2)
+        self.assertLessEqual(max(ceilings), 8)
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = resilience.CircuitBreaker('test', failure_threshold=2, reset_after=10,
+                                                 clock=lambda: self.now)
+
+    def test_opens_after_threshold(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_allows_one_trial(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now = 11
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_failed_trial_reopens(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now = 11
+        self.breaker.allow()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'open')
+
+    def test_open_circuit_stops_calls(self):
+        provider = make_provider(max_attempts=1, breaker=self.breaker)
+        call = FlakyCall(*[support.BadResponse(status_code=503)] * 5)
+        for _ in range(2):
+            with self.assertRaises(support.BadResponse):
+                provider.call(call)
+        with self.assertRaises(resilience.CircuitOpen):
+            provider.call(call)
+        self.assertEqual(call.calls, 2)
+
+
+class QuotaTestCase(unittest.TestCase):
+    def setUp(self):
+        self.store = cache.SQLiteCache(table='quotas', db_path=':memory:')
+
+    def test_quota_stops_calls(self):
+        quota = resilience.QuotaCounter('test', daily_limit=2, store=self.store)
+        provider = make_provider(quota=quota)
+        provider.call(FlakyCall())
+        provider.call(FlakyCall())
+        with self.assertRaises(resilience.QuotaExceeded):
+            provider.call(FlakyCall())
+        self.assertEqual(quota.remaining, 0)
+
+    def test_retries_count_against_quota(self):
+        quota = resilience.QuotaCounter('test', store=self.store)
+        make_provider(quota=quota).call(FlakyCall(support.BadResponse(status_code=503)))
+        self.assertEqual(quota.used, 2)
+
+    def test_unlimited_count_not_stored(self):
+        quota = resilience.QuotaCounter('test', store=self.store)
+        make_provider(quota=quota).call(FlakyCall())
+        self.assertEqual(quota.used, 1)
+        self.assertEqual(len(self.store), 0)
+
+    def test_limited_count_stored(self):
+        resilience.QuotaCounter('test', daily_limit=10, store=self.store).consume(3)
+        self.assertEqual(resilience.QuotaCounter('test', daily_limit=10, store=self.store).used, 3)
+
+    def test_cost_counted(self):
+        quota = resilience.QuotaCounter('test', daily_limit=10, store=self.store)
+        make_provider(quota=quota).call(FlakyCall(), cost=4)
+        self.assertEqual(quota.remaining, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+
+from deathpledge.api_calls import bing, cache, locations
+from deathpledge.routing import roads
+from test.helpers import make_registry
+
+# Nodes every 0.01 degrees north along one street
+NODES = {osmid: (38.90 + 0.01 * (osmid - 1), -77.0) for osmid in range(1, 6)}
+BLOCK_METERS = 1112.0
+
+
+def write_synthetic_graph(dirpath):
+    """A two-way street 1-2-3-4-5, and a one-way motorway straight from 1 to 5.
+
+    The street is listed twice between 2 and 3, the second time much slower.
+
+    """
+    nodes_path = os.path.join(dirpath, 'nodes.csv')
+    edges_path = os.path.join(dirpath, 'edges.csv')
+    with open(nodes_path, 'w') as f:
+        f.write('osmid,y,x\n')
+        f.writelines(f'{osmid},{lat},{lon}\n' for osmid, (lat, lon) in NODES.items())
+    with open(edges_path, 'w') as f:
+        f.write('u,v,length,speed_kph,highway,oneway\n')
+        for osmid in range(1, 5):
+            f.write(f'{osmid},{osmid + 1},{BLOCK_METERS},40,residential,False\n')
+        f.write(f'2,3,{BLOCK_METERS},10,residential,False\n')
+        f.write('1,5,4500,100,motorway,True\n')
+    return edges_path, nodes_path
+
+
+class RoadRouterTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tempdir = tempfile.TemporaryDirectory()
+        cls.graph = roads.load_road_graph(*write_synthetic_graph(cls.tempdir.name))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+
+    def setUp(self):
+        rush_hour = [{'days': [0, 1, 2, 3, 4], 'start': '07:00', 'end': '09:30',
+                      'factors': {'motorway': 0.5, 'default': 1.0}}]
+        self.router = roads.RoadRouter(self.graph, roads.SpeedFactors(rush_hour))
+
+    def test_graph_loaded(self):
+        self.assertEqual(len(self.graph), 5)
+        # Four two-way blocks, one motorway, and the slow duplicate dropped
+        self.assertEqual(len(self.graph.edge_source), 9)
+
+    def test_fastest_drive_takes_motorway(self):
+        drives = self.router.drive_matrix([NODES[1]], [NODES[5]])
+        self.assertEqual(drives[(0, 0)], bing.Drive(distance='2.80 miles', duration='0:02:42'))
+
+    def test_one_way_motorway_not_driven_backward(self):
+        drives = self.router.drive_matrix([NODES[5]], [NODES[1]])
+        self.assertEqual(drives[(0, 0)], bing.Drive(distance='2.76 miles', duration='0:06:40'))
+
+    def test_many_to_many(self):
+        origins = [NODES[1], NODES[2], NODES[3]]
+        destinations = [NODES[4], NODES[5]]
+        drives = self.router.drive_matrix(origins, destinations)
+        self.assertEqual(len(drives), 6)
+        self.assertEqual(drives[(2, 0)].distance, '0.69 miles')
+        # Quicker to go back a block for the motorway than to stay on the street
+        self.assertEqual(drives[(1, 1)].distance, '3.49 miles')
+
+    def test_rush_hour_slows_motorway(self):
+        drive = self.router.drive_matrix([NODES[1]], [NODES[5]], dayofweek=0, hrmin='08:00')[(0, 0)]
+        self.assertEqual(drive.duration, '0:05:24')
+        weekend = self.router.drive_matrix([NODES[1]], [NODES[5]], dayofweek=5, hrmin='08:00')
+        self.assertEqual(weekend[(0, 0)].duration, '0:02:42')
+
+    def test_access_from_off_graph_location(self):
+        near_node_3 = (38.92, -77.002)
+        drive = self.router.drive_matrix([near_node_3], [NODES[4]])[(0, 0)]
+        self.assertEqual(drive.distance, '0.83 miles')
+
+    def test_answers_bing_driving_request(self):
+        request = bing.BingDrivingAPICall(
+            startcoords=bing.Geocoords(*NODES[1]), endcoords=bing.Geocoords(*NODES[5]),
+            dayofweek=0, hrmin='08:00'
+        )
+        self.assertEqual(self.router.get_driving_info(request).duration, '0:05:24')
+
+    def test_answers_bing_distance_matrix_request(self):
+        request = bing.BingDistanceMatrixAPICall(
+            origins=[bing.Geocoords(*NODES[1]), bing.Geocoords(*NODES[5])],
+            destinations=[bing.Geocoords(*NODES[3])],
+            dayofweek=0, hrmin='18:00'
+        )
+        drives = self.router.get_distance_matrix(request)
+        self.assertEqual(set(drives), {(0, 0), (1, 0)})
+        self.assertEqual(drives[(0, 0)].distance, '1.38 miles')
+
+
+class RoadRouterInEnrichmentTestCase(unittest.TestCase):
+    """Batch driving can use the road graph instead of Bing."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.router = roads.RoadRouter(roads.load_road_graph(*write_synthetic_graph(self.tempdir.name)))
+        self.registry = make_registry()
+        self.registry.favorite_driving = {
+            'Gym': locations.Destination('Gym', 'addr', bing.Geocoords(*NODES[5]), 0, '18:00')
+        }
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_batch_driving_without_bing(self):
+        bing_api = bing.BingMapsAPI(route_cache=cache.RouteCache(db_path=':memory:'))
+        homes = [{'geocoords': list(NODES[osmid])} for osmid in (1, 3)]
+        bing.add_driving_to_homes(homes, self.registry, bing_api=bing_api, drive_router=self.router)
+        self.assertEqual(homes[0]['Gym_dist'], '2.80 miles')
+        self.assertEqual(homes[1]['Gym_dist'], '1.38 miles')
+        self.assertEqual(bing_api.route_cache.items(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
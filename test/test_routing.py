@@ -0,0 +1,127 @@
+import datetime as dt
+import os
+import tempfile
+import unittest
+import zipfile
+
+import numpy as np
+
+from deathpledge.api_calls import bing
+from deathpledge.routing import gtfs, raptor
+
+WORK = (38.900, -77.000)
+TUESDAY = dt.date(2026, 10, 20)
+
+
+def _times(start, offsets):
+    hours, minutes = start
+    return [f'{hours + (minutes + x) // 60:02d}:{(minutes + x) % 60:02d}:00' for x in offsets]
+
+
+def write_synthetic_feed(filepath):
+    """A train line A-B-C ending by work, and a bus from D feeding into it at B.
+
+    Trains leave A every 10 minutes from 06:00, reaching B in 5 minutes and C
+    in 10. Buses leave D at 05:40, 05:55 and 06:10 and reach B in 10 minutes.
+
+    """
+    stops = [('A', 38.960, -77.000), ('B', 38.930, -77.000), ('C', 38.901, -77.000),
+             ('D', 38.930, -77.040)]
+    stop_times = []
+    trips = []
+    for i in range(6):
+        trip_id = f'train_{i}'
+        trips.append(f'red,weekday,{trip_id}')
+        for seq, (stop, time) in enumerate(zip('ABC', _times((6, 10 * i), [0, 5, 10]))):
+            stop_times.append(f'{trip_id},{time},{time},{stop},{seq + 1}')
+    for i, start in enumerate([(5, 40), (5, 55), (6, 10)]):
+        trip_id = f'bus_{i}'
+        trips.append(f'bus9,weekday,{trip_id}')
+        for seq, (stop, time) in enumerate(zip('DB', _times(start, [0, 10]))):
+            stop_times.append(f'{trip_id},{time},{time},{stop},{seq + 1}')
+    tables = {
+        'stops.txt': ['stop_id,stop_name,stop_lat,stop_lon']
+                     + [f'{s},Stop {s},{lat},{lon}' for s, lat, lon in stops],
+        'routes.txt': ['route_id,route_short_name,route_type', 'red,Red,1', 'bus9,9,3'],
+        'trips.txt': ['route_id,service_id,trip_id'] + trips,
+        'stop_times.txt': ['trip_id,arrival_time,departure_time,stop_id,stop_sequence'] + stop_times,
+        'calendar.txt': ['service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,'
+                         'start_date,end_date', 'weekday,1,1,1,1,1,0,0,20260101,20271231'],
+    }
+    with zipfile.ZipFile(filepath, 'w') as feed_zip:
+        for name, lines in tables.items():
+            feed_zip.writestr(name, '\n'.join(lines) + '\n')
+
+
+class GTFSFixtureTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tempdir = tempfile.TemporaryDirectory()
+        cls.feed_path = os.path.join(cls.tempdir.name, 'gtfs.zip')
+        write_synthetic_feed(cls.feed_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+
+
+class LoadFeedTestCase(GTFSFixtureTestCase):
+    def test_patterns_grouped(self):
+        feed = gtfs.load_feed(self.feed_path, service_date=TUESDAY)
+        self.assertEqual(len(feed.stop_ids), 4)
+        self.assertEqual(sorted(p.arrivals.shape for p in feed.patterns), [(3, 2), (6, 3)])
+        self.assertEqual(sorted(p.mode for p in feed.patterns), ['Bus', 'Train'])
+
+    def test_no_service_on_weekend(self):
+        feed = gtfs.load_feed(self.feed_path, service_date=dt.date(2026, 10, 25))
+        self.assertEqual(feed.patterns, [])
+
+    def test_times_past_midnight(self):
+        np.testing.assert_array_equal(gtfs.parse_gtfs_times(['06:30:00', '25:01:30']),
+                                      [23400, 90090])
+
+    def test_overtaking_trip_split_out(self):
+        local = (np.array([0, 600, 1200]), np.array([0, 600, 1200]))
+        express = (np.array([300, 700, 1000]), np.array([300, 700, 1000]))
+        self.assertEqual(len(gtfs._split_overtaking([local, express])), 2)
+
+
+class CommuteRouterTestCase(GTFSFixtureTestCase):
+    def setUp(self):
+        feed = gtfs.load_feed(self.feed_path, service_date=TUESDAY)
+        self.router = raptor.CommuteRouter(feed, WORK, arrive_by='06:30')
+
+    def test_train_commute(self):
+        commute = self.router.get_commute((38.962, -77.000))
+        self.assertIsInstance(commute, bing.Commute)
+        self.assertEqual(commute.first_leg, 'Train')
+        # Leave A on the 06:10 train after a walk of about 3.5 minutes
+        self.assertAlmostEqual(commute.first_walk, 3.5, delta=0.5)
+        self.assertAlmostEqual(commute.commute_time, 24, delta=1)
+
+    def test_bus_then_train(self):
+        commute = self.router.get_commute((38.932, -77.040))
+        self.assertEqual(commute.first_leg, 'Bus')
+        # The 05:55 bus makes the 06:15 train from B
+        self.assertAlmostEqual(commute.commute_time, 38, delta=1)
+
+    def test_walk_when_close(self):
+        commute = self.router.get_commute((38.899, -77.000))
+        self.assertEqual(commute.first_leg, 'Walk')
+        self.assertEqual(commute.commute_time, round(commute.first_walk))
+
+    def test_unreachable(self):
+        self.assertIsNone(self.router.get_commute((39.5, -76.0)))
+
+    def test_just_missing_a_train_takes_longer(self):
+        feed = gtfs.load_feed(self.feed_path, service_date=TUESDAY)
+        home = (38.962, -77.000)
+        # The 06:10 train reaches C at 06:20, leaving under two minutes to walk to work
+        on_time = raptor.CommuteRouter(feed, WORK, arrive_by='06:22').get_commute(home)
+        too_late = raptor.CommuteRouter(feed, WORK, arrive_by='06:21').get_commute(home)
+        self.assertAlmostEqual(on_time.commute_time, 16, delta=1)
+        self.assertGreater(too_late.commute_time, on_time.commute_time + 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
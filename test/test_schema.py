@@ -0,0 +1,79 @@
+import unittest
+
+import pandas as pd
+
+from deathpledge import cleaning, schema
+from deathpledge.classes import Home
+from test.test_cleaning import use_memory_address_cache
+
+
+class SchemaTestCase(unittest.TestCase):
+    def test_each_field_declared_once(self):
+        field_names = [field.name for field in schema.FIELDS]
+        self.assertEqual(len(field_names), len(set(field_names)))
+
+    def test_names_by_kind_and_units(self):
+        self.assertIn('utilities', schema.names('list'))
+        self.assertEqual(schema.names('fee', units='USD'), ['hoa_fee', 'condocoop_fee'])
+        self.assertNotIn('sqft', schema.names('number', units='USD'))
+
+    def test_dtypes_only_for_schema_columns(self):
+        self.assertEqual(schema.dtypes(['list_price', 'appliances', 'description']),
+                         {'list_price': 'float64', 'appliances': 'object'})
+
+    def test_every_cleaned_kind_has_a_cleaner(self):
+        for field in schema.FIELDS:
+            if field.kind != 'text':
+                self.assertIn(field.name, cleaning.FIELD_CLEANERS)
+
+    def test_validate_frame(self):
+        df = pd.DataFrame({
+            'full_address': ['1 Main St', None],
+            'list_price': [425000.0, 'N/A'],
+            'beds': [3, 4],
+        })
+        problems = schema.validate_frame(df)
+        self.assertEqual(len(problems), 3)
+        self.assertIn("Required column 'status' is missing", problems)
+        self.assertIn("Required column 'full_address' has 1 empty values", problems)
+        self.assertTrue(problems[-1].startswith("Column 'list_price' has 1 values"))
+
+    def test_valid_frame(self):
+        df = pd.DataFrame({'full_address': ['1 Main St'], 'status': ['Active'], 'sqft': ['1850']})
+        self.assertEqual(schema.validate_frame(df), [])
+
+
+class SchemaCleaningTestCase(unittest.TestCase):
+    def setUp(self):
+        use_memory_address_cache(self)
+        self.home = Home(docid='abc')
+        self.home.update({
+            'full_address': '123 NORTH MAPLE DR 456 ALEXANDRIA VA 22302',
+            'status': 'ACTIVE',
+            'list_price': 'N/A',
+            'sqft': '1,850 sqft',
+            'hoa_fee': '50/Monthly',
+            'utilities': 'Electric, and Gas',
+        })
+
+    def test_one_bad_field_leaves_others_cleaned(self):
+        with self.assertLogs('deathpledge.classes', level='WARNING') as logs:
+            self.home.clean()
+        self.assertIn("Cleaning field 'list_price' failed for abc", logs.output[0])
+        self.assertEqual(self.home['list_price'], 'N/A')
+        self.assertEqual(self.home['sqft'], 1850)
+        self.assertEqual((self.home['hoa_fee'], self.home['hoa_fee_frequency']), (50, 'Monthly'))
+        self.assertEqual(self.home['utilities'], ['Electric', 'Gas'])
+        self.assertEqual(self.home['status'], 'Active')
+
+    def test_missing_required_fields_logged(self):
+        del self.home['status']
+        self.home['list_price'] = '$1'
+        with self.assertLogs('deathpledge.classes', level='WARNING') as logs:
+            self.home.clean()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("missing required fields ['status']", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
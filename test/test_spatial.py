@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from deathpledge import spatial, support
+
+
+class PointIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.coords = [(38.8627, -77.0597), (38.8579, -77.0502), (38.8822, -77.1117)]
+        self.index = spatial.PointIndex(self.coords)
+
+    def test_distance_matches_haversine(self):
+        miles, idx = self.index.nearest(38.8977, -77.0365, k=3)
+        for mi, i in zip(miles, idx):
+            expected = support.haversine((38.8977, -77.0365), self.coords[i])
+            self.assertAlmostEqual(mi, expected, places=6)
+
+    def test_nearest_first(self):
+        miles, idx = self.index.nearest(38.8830, -77.1110, k=3)
+        self.assertEqual(idx[0], 2)
+        self.assertTrue(all(miles[:-1] <= miles[1:]))
+
+    def test_within_radius(self):
+        idx = self.index.within(38.8600, -77.0550, miles=0.5)
+        self.assertEqual(sorted(idx.tolist()), [0, 1])
+
+    def test_empty_index(self):
+        index = spatial.PointIndex([])
+        miles, idx = index.nearest(38.86, -77.05, k=2)
+        self.assertEqual(len(idx), 0)
+
+
+class HomeIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.homes = [
+            {'_id': 'a', 'geocoords': [38.8627, -77.0597], 'status': 'Closed'},
+            {'_id': 'b', 'geocoords': [38.8579, -77.0502], 'status': 'Active'},
+            {'_id': 'c', 'geocoords': [38.8822, -77.1117], 'status': 'closed'},
+            {'_id': 'd', 'status': 'Active'},
+        ]
+        self.index = spatial.HomeIndex(self.homes)
+
+    def test_homes_without_coords_skipped(self):
+        self.assertEqual(len(self.index), 3)
+        self.assertNotIn('d', self.index)
+
+    def test_within_nearest_first(self):
+        results = self.index.within(38.8600, -77.0550, miles=0.5)
+        self.assertEqual([docid for docid, _ in results], ['b', 'a'])
+        expected = support.haversine((38.8600, -77.0550), (38.8579, -77.0502))
+        self.assertAlmostEqual(results[0][1], expected, places=6)
+
+    def test_nearest_by_status(self):
+        results = self.index.nearest(38.8579, -77.0502, k=2, status='Closed')
+        self.assertEqual([docid for docid, _ in results], ['a', 'c'])
+
+    def test_in_bbox(self):
+        docids = self.index.in_bbox(38.85, -77.07, 38.87, -77.04)
+        self.assertEqual(sorted(docids), ['a', 'b'])
+
+    def test_moved_home(self):
+        self.index.update({'_id': 'a', 'geocoords': [38.8822, -77.1117], 'status': 'Active'})
+        self.assertEqual(self.index.nearest(38.8627, -77.0597, k=1, status='Closed')[0][0], 'c')
+        self.assertEqual(self.index.in_bbox(38.85, -77.07, 38.87, -77.04), ['b'])
+
+    def test_removed_home(self):
+        self.index.remove('b')
+        self.assertEqual([docid for docid, _ in self.index.nearest(38.8579, -77.0502, k=5)], ['a', 'c'])
+
+    def test_same_answers_after_rebuild(self):
+        index = spatial.HomeIndex()
+        index.min_rebuild = 2
+        for home in self.homes:
+            index.update(home)
+        index.update({'_id': 'e', 'geocoords': [38.86, -77.05], 'status': 'Active'})
+        index.remove('c')
+        self.assertEqual([docid for docid, _ in index.nearest(38.86, -77.05, k=3)], ['e', 'b', 'a'])
+        self.assertEqual(len(index), 3)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, 'home_index.json')
+            self.index.save(filepath)
+            loaded = spatial.HomeIndex.load(filepath)
+        self.assertEqual(loaded.within(38.86, -77.055, 0.5), self.index.within(38.86, -77.055, 0.5))
+
+    def test_from_csv(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, '01-raw.csv')
+            pd.DataFrame(self.homes).to_csv(filepath, index=False)
+            index = spatial.HomeIndex.from_csv(filepath)
+        self.assertEqual(len(index), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import time
+import unittest
+
+from deathpledge import support, resilience
+from deathpledge.api_calls import bing, cache, standin
+
+
+class StandInServerTestCase(unittest.TestCase):
+    def _serve(self, **kwargs):
+        server = standin.StandInBingServer(**kwargs).start()
+        previous_url = bing.set_base_url(server.base_url)
+        self.addCleanup(server.stop)
+        self.addCleanup(bing.set_base_url, previous_url)
+        return server
+
+    @staticmethod
+    def _make_bing_api():
+        return bing.BingMapsAPI(
+            geocode_cache=cache.GeocodeCache(db_path=':memory:'),
+            route_cache=cache.RouteCache(db_path=':memory:'),
+            station_index=object(),
+            provider=resilience.Provider(
+                'bing', max_attempts=2, sleep=lambda seconds: None,
+                quota=resilience.QuotaCounter('bing', store=cache.SQLiteCache('quotas', db_path=':memory:'))
+            )
+        )
+
+    def test_calls_sent_to_standin(self):
+        server = self._serve()
+        walk_request = bing.BingWalkAPICall(bing.Geocoords(38.86, -77.06), bing.Geocoords(38.87, -77.05))
+        walk = self._make_bing_api().get_walk_time(walk_request)
+        self.assertGreater(walk.distance, 0)
+        self.assertEqual(len(server.requests), 1)
+        self.assertTrue(server.requests[0].startswith('Routes/Walking?'))
+        self.assertNotIn('key=', server.requests[0])
+
+    def test_synthetic_responses_repeatable(self):
+        self._serve()
+        geocoder = bing.BingGeocoderAPICall(address='1 Test Ct', zip_code=22204)
+        first = self._make_bing_api().get_geocoords(geocoder)
+        second = self._make_bing_api().get_geocoords(geocoder)
+        self.assertEqual(first, second)
+
+    def test_recording_replayed(self):
+        walk_request = bing.BingWalkAPICall(bing.Geocoords(38.86, -77.06), bing.Geocoords(38.87, -77.05))
+        recordings = {}
+        standin.record_response(recordings, walk_request, {'resourceSets': [{'resources': [
+            {'travelDistance': 0.5, 'travelDuration': 600}
+        ]}]})
+        self._serve(recordings=recordings)
+        walk = self._make_bing_api().get_walk_time(walk_request)
+        self.assertEqual(walk, bing.Walk(distance=0.5, duration='0:10:00'))
+
+    def test_errors_raise_bad_response(self):
+        server = self._serve(error_rate=1.0)
+        walk_request = bing.BingWalkAPICall(bing.Geocoords(38.86, -77.06), bing.Geocoords(38.87, -77.05))
+        with self.assertRaises(support.BadResponse):
+            self._make_bing_api().get_walk_time(walk_request)
+        self.assertEqual(len(server.requests), 2)
+
+    def test_transient_error_retried(self):
+        server = self._serve(error_rate=0.5, seed=3)
+        bing_api = self._make_bing_api()
+        bing_api.provider.max_attempts = 20
+        for i in range(5):
+            walk_request = bing.BingWalkAPICall(bing.Geocoords(38.86, -77.06 + i / 100),
+                                                bing.Geocoords(38.87, -77.05))
+            bing_api.get_walk_time(walk_request)
+        self.assertGreater(len(server.requests), 5)
+
+    def test_latency_added(self):
+        self._serve(latency=0.2)
+        walk_request = bing.BingWalkAPICall(bing.Geocoords(38.86, -77.06), bing.Geocoords(38.87, -77.05))
+        start = time.perf_counter()
+        self._make_bing_api().get_walk_time(walk_request)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.2)
+
+    def test_distance_matrix_covers_every_pair(self):
+        self._serve()
+        origins = [bing.Geocoords(38.86, -77.06), bing.Geocoords(38.88, -77.02)]
+        destinations = [bing.Geocoords(38.9, -77.0)] * 3
+        matrix_request = bing.BingDistanceMatrixAPICall(origins, destinations)
+        drives = self._make_bing_api().get_distance_matrix(matrix_request)
+        self.assertEqual(len(drives), 6)
+
+
+class BaseUrlTestCase(unittest.TestCase):
+    def test_default_is_bing(self):
+        walk_request = bing.BingWalkAPICall(bing.Geocoords(38.86, -77.06), bing.Geocoords(38.87, -77.05))
+        self.assertEqual(walk_request.baseurl, f'{bing.BING_BASE_URL}/Routes/Walking')
+
+    def test_set_and_restore(self):
+        previous_url = bing.set_base_url('http://127.0.0.1:9999/REST/V1/')
+        try:
+            self.assertEqual(bing.BingGeocoderAPICall('1 Test Ct').baseurl,
+                             'http://127.0.0.1:9999/REST/V1/Locations')
+        finally:
+            bing.set_base_url(previous_url)
+        self.assertEqual(bing.get_base_url(), previous_url)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import subprocess
+import sys
+import unittest
+
+from deathpledge import support
+
+HEAVY_MODULES = ['selenium', 'pandas', 'numpy', 'scipy', 'googleapiclient', 'cloudant', 'django', 'usaddress']
+
+
+def imported_modules(*args):
+    """Names of every module imported by running Python with *args*."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args],
+                            capture_output=True, text=True, check=True)
+    lines = [x for x in result.stderr.splitlines() if x.startswith('import time:')]
+    return {x.rsplit('|', 1)[-1].strip() for x in lines}
+
+
+class StartupTestCase(unittest.TestCase):
+    def test_help_skips_heavy_dependencies(self):
+        modules = imported_modules('-m', 'deathpledge', '--help')
+        for name in HEAVY_MODULES:
+            with self.subTest(name=name):
+                self.assertNotIn(name, modules)
+
+    def test_home_skips_pandas_and_scipy(self):
+        modules = imported_modules('-c', 'import deathpledge.classes')
+        for name in ['pandas', 'scipy']:
+            with self.subTest(name=name):
+                self.assertNotIn(name, modules)
+
+    def test_keys_read_on_first_use(self):
+        modules = imported_modules('-c', 'import deathpledge')
+        self.assertNotIn('yaml', modules)
+
+
+class LazyImportTestCase(unittest.TestCase):
+    def test_loaded_on_first_attribute(self):
+        code = ('from deathpledge import support; m = support.lazy_import("json.tool"); '
+                'print(type(m).__name__); m.main; print(type(m).__name__)')
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.split(), ['_LazyModule', 'module'])
+
+    def test_already_imported_module_returned(self):
+        self.assertIs(support.lazy_import('unittest'), unittest)
+
+
+class SlugifyTestCase(unittest.TestCase):
+    def test_same_as_django_31(self):
+        cases = {
+            '5065 7TH RD S #202 ARLINGTON, VA 22204': '5065-7th-rd-s-202-arlington-va-22204',
+            ' Café & Bar -- 2nd floor ': 'cafe-bar-2nd-floor',
+            'HOA/Condo Fee Includes': 'hoacondo-fee-includes',
+            'Year Built:': 'year-built',
+            '__under_score__': '__under_score__',
+            '-dashes-': '-dashes-',
+            'tab\tand\nnewline': 'tab-and-newline',
+            'Ünïcödé ñame': 'unicode-name',
+            '': '',
+        }
+        for value, expected in cases.items():
+            with self.subTest(value=value):
+                self.assertEqual(support.slugify(value), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,25 @@
 import unittest
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+import pandas as pd
 
 from deathpledge import support
 
 
+def strptime_in_order(date_str):
+    """How dates were parsed before: each format in turn with strptime."""
+    for date_format in support.DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, date_format)
+        except TypeError:
+            break
+        except ValueError:
+            continue
+    return date_str
+
+
 class AddressTestCase(unittest.TestCase):
     def setUp(self):
         self.full_address = '5065 7TH RD S #202 ARLINGTON, VA 22204'
@@ -23,5 +40,61 @@ class AddressTestCase(unittest.TestCase):
         self.assertEqual(actual, expected)
 
 
+class CommuteDatetimeTestCase(unittest.TestCase):
+    def test_citymapper_time_in_winter(self):
+        cm_time = support.get_commute_datetime('cm', now=datetime(2026, 1, 8, 12, 0))
+        self.assertEqual(cm_time, '2026-01-13T06:30:00-05:00')
+
+    def test_citymapper_time_in_summer(self):
+        cm_time = support.get_commute_datetime('cm', now=datetime(2026, 7, 9, 12, 0))
+        self.assertEqual(cm_time, '2026-07-14T06:30:00-04:00')
+
+    def test_bing_time_has_no_offset(self):
+        bing_time = support.get_commute_datetime('bing', now=datetime(2026, 1, 8, 12, 0))
+        self.assertEqual(bing_time, '01/13/2026 06:30:00')
+
+
+class DateParsingTestCase(unittest.TestCase):
+    dates = [
+        '01/15/2020', '1/5/2020', '12/31/1999', '1/ 5/2020', '02/30/2020', '13/01/2020', '00/10/2020',
+        '2020-01-15T09:30:00', '2020-1-5T9:3:7', '2020-01-15t09:30:00', '2020-01-15T24:00:00',
+        '2020-02-29T23:59:60', '01-15-2020', '1-5-2020', '01-15-20', ' 01/15/2020', '01/15/2020 ',
+        '01/15/2020\n', '\u0661/15/2020', '0999-01-01T00:00:00', 'last Tuesday', '', None, 20200115,
+        datetime(2020, 1, 15),
+    ]
+
+    def setUp(self):
+        patcher = mock.patch.dict(support._last_date_formats, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_as_strptime_in_order(self):
+        for source in [None, 'sold']:
+            for date_str in self.dates * 2:
+                with self.subTest(date_str=date_str, source=source):
+                    expected = strptime_in_order(date_str)
+                    actual = support.coerce_date_string_to_date(date_str, source=source)
+                    self.assertEqual(actual, expected)
+                    self.assertIs(type(actual), type(expected))
+
+    def test_last_format_tried_first(self):
+        support.coerce_date_string_to_date('2020-01-15T09:30:00', source='added_date')
+        with mock.patch.object(support, '_parse_date_format', wraps=support._parse_date_format) as parse:
+            support.coerce_date_string_to_date('2021-03-04T05:06:07', source='added_date')
+        self.assertEqual(parse.call_count, 1)
+
+    def test_array_same_as_one_at_a_time(self):
+        expected = [strptime_in_order(x) for x in self.dates]
+        actual = support.coerce_date_strings(np.array(self.dates, dtype=object))
+        self.assertEqual(list(actual), expected)
+
+    def test_series_keeps_index(self):
+        s = pd.Series(['01/15/2020', None, '01/15/2020'], index=[3, 5, 7], name='sold', dtype=object)
+        actual = support.coerce_date_strings(s, source='sold')
+        self.assertEqual(list(actual.index), [3, 5, 7])
+        self.assertEqual(actual[7], datetime(2020, 1, 15))
+        self.assertIsNone(actual[5])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,132 @@
+import json
+import os
+import pstats
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from deathpledge import tracing
+
+
+def busy_work():
+    return sum(i * i for i in range(2000))
+
+
+class TracerTestCase(unittest.TestCase):
+    def use_tracer(self, profile=False):
+        tracer = tracing.Tracer(profile=profile)
+        patcher = mock.patch.object(tracing, '_tracer', tracer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return tracer
+
+    def test_nothing_recorded_without_run(self):
+        self.assertIsNone(tracing.get_tracer())
+        with tracing.span('quiet') as record:
+            self.assertIsNone(record)
+
+    def test_nested_spans_have_parents(self):
+        tracer = self.use_tracer()
+        with tracing.span('outer', homes=3):
+            with tracing.span('inner'):
+                pass
+        inner, outer = tracer.spans
+        self.assertEqual((inner['name'], outer['name']), ('inner', 'outer'))
+        self.assertEqual(inner['parent'], outer['id'])
+        self.assertIsNone(outer['parent'])
+        self.assertEqual(outer['attrs'], {'homes': 3})
+        self.assertGreaterEqual(outer['duration'], inner['duration'])
+
+    def test_errors_recorded_and_raised(self):
+        tracer = self.use_tracer()
+        with self.assertRaises(KeyError):
+            with tracing.span('failing'):
+                raise KeyError('x')
+        self.assertEqual(tracer.spans[0]['error'], 'KeyError')
+
+    def test_traced_decorator(self):
+        tracer = self.use_tracer()
+
+        @tracing.traced()
+        def fetch(x):
+            return x * 2
+
+        self.assertEqual(fetch(2), 4)
+        self.assertEqual(fetch.__name__, 'fetch')
+        self.assertTrue(tracer.spans[0]['name'].endswith('fetch'))
+
+    def test_spans_in_threads_are_separate(self):
+        tracer = self.use_tracer()
+        with tracing.span('main'):
+            worker = threading.Thread(target=self._in_span, args=('worker',), name='worker-1')
+            worker.start()
+            worker.join()
+        worker_span = next(x for x in tracer.spans if x['name'] == 'worker')
+        self.assertIsNone(worker_span['parent'])
+        self.assertEqual(worker_span['thread'], 'worker-1')
+
+    @staticmethod
+    def _in_span(name):
+        with tracing.span(name):
+            pass
+
+    def test_summary(self):
+        tracer = self.use_tracer()
+        for _ in range(3):
+            with tracing.span('bing.BingGeocoderAPICall'):
+                pass
+        with self.assertRaises(ValueError):
+            with tracing.span('bulk_upload'):
+                raise ValueError
+        rows = {x['name']: x for x in tracer.summary()}
+        self.assertEqual(rows['bing.BingGeocoderAPICall']['count'], 3)
+        self.assertEqual(rows['bulk_upload']['errors'], 1)
+        table = tracer.format_summary()
+        self.assertIn('bing.BingGeocoderAPICall', table)
+        self.assertEqual(len(table.splitlines()), 3)
+
+    def test_nested_stages_profiled_separately(self):
+        tracer = self.use_tracer(profile=True)
+        with tracing.stage('outer'):
+            busy_work()
+            with tracing.stage('inner'):
+                busy_work()
+                busy_work()
+        self.assertEqual(set(tracer.profiles), {'outer', 'inner'})
+        calls = {name: pstats.Stats(*profilers).stats for name, profilers in tracer.profiles.items()}
+        count = {name: sum(v[0] for k, v in stats.items() if k[2] == 'busy_work')
+                 for name, stats in calls.items()}
+        self.assertEqual(count, {'outer': 1, 'inner': 2})
+
+    def test_plain_spans_not_profiled(self):
+        tracer = self.use_tracer(profile=True)
+        with tracing.span('call'):
+            busy_work()
+        self.assertEqual(tracer.profiles, {})
+
+    def test_finish_run_writes_files(self):
+        tracer = tracing.start_run(profile=True)
+        self.addCleanup(setattr, tracing, '_tracer', None)
+        with tracing.stage('clean', homes=2):
+            with tracing.span('bulk_upload'):
+                pass
+        with tempfile.TemporaryDirectory() as trace_dir:
+            trace_path = tracing.finish_run(trace_dir)
+            self.assertIsNone(tracing.get_tracer())
+            with open(trace_path) as f:
+                trace = json.load(f)
+            files = sorted(os.listdir(trace_dir))
+        names = [x['name'] for x in trace['traceEvents'] if x['ph'] == 'X']
+        self.assertEqual(names, ['clean', 'bulk_upload'])
+        self.assertEqual(trace['traceEvents'][0]['args']['homes'], 2)
+        self.assertEqual(trace['otherData']['summary'][0]['name'], 'clean')
+        self.assertEqual(files, [f'{tracer.run_id}.clean.prof', f'{tracer.run_id}.summary.txt',
+                                 f'{tracer.run_id}.trace.json'])
+
+    def test_finish_without_run(self):
+        self.assertIsNone(tracing.finish_run())
+
+
+if __name__ == '__main__':
+    unittest.main()